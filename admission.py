@@ -0,0 +1,74 @@
+import logging
+import time
+from typing import Callable, Optional, Sequence
+from metrics import metrics
+
+# Shedding levels, each one includes the measures of the levels below it
+NORMAL = 0
+SKIP_MUTED = 1    # fan-out skips users with notifications disabled
+DEFER_BULK = 2    # channel fan-out is parked until load drops
+BUSY_REPLIES = 3  # DMs get a "busy" reply instead of a translation
+
+LEVEL_NAMES = ('normal', 'skip_muted', 'defer_bulk', 'busy_replies')
+
+
+class AdmissionController:
+    """Picks a shedding level from backend queue depth and latency.
+
+    The level rises as soon as either signal crosses a threshold and falls
+    one step at a time after the signals have stayed below it for
+    `recovery` seconds, so it does not flap at the boundary.
+    """
+
+    def __init__(self, depth_fn: Callable[[], int], latency_fn: Callable[[], float],
+                 depth_thresholds: Sequence[int], latency_thresholds: Sequence[float],
+                 recovery: float):
+        self.depth_fn = depth_fn
+        self.latency_fn = latency_fn
+        self.depth_thresholds = depth_thresholds
+        self.latency_thresholds = latency_thresholds
+        self.recovery = recovery
+        self.level = NORMAL
+        self._calm_since: Optional[float] = None
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def level_name(self) -> str:
+        return LEVEL_NAMES[self.level]
+
+    def _pressure(self) -> int:
+        depth = self.depth_fn()
+        latency = self.latency_fn()
+        level = NORMAL
+        for candidate, (max_depth, max_latency) in enumerate(
+                zip(self.depth_thresholds, self.latency_thresholds), start=1):
+            if depth >= max_depth or latency >= max_latency:
+                level = candidate
+        return level
+
+    def update(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        target = self._pressure()
+
+        if target > self.level:
+            self._set_level(target)
+            self._calm_since = None
+        elif target < self.level:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recovery:
+                self._set_level(self.level - 1)
+                self._calm_since = now
+        else:
+            self._calm_since = None
+
+        metrics.set_gauge("admission.level", self.level)
+        return self.level
+
+    def _set_level(self, level: int) -> None:
+        self.logger.warning(
+            "Load shedding level %s -> %s (queue depth %d, backend latency %.2fs)",
+            LEVEL_NAMES[self.level], LEVEL_NAMES[level], self.depth_fn(), self.latency_fn()
+        )
+        self.level = level
+        metrics.incr(f"admission.entered.{LEVEL_NAMES[level]}")
@@ -0,0 +1,232 @@
+import asyncio
+import ipaddress
+import logging
+import re
+import socket
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional
+import httpx
+from telegram import MessageEntity
+from metrics import metrics
+
+# Paragraph ends, then sentence ends, are preferred places to cut an excerpt
+_SENTENCE_END = re.compile(r'[.!?。！？](?:\s|$)')
+_MAX_REDIRECTS = 5
+
+
+def first_link(post) -> Optional[str]:
+    """First http(s) URL in a post's text or caption, from plain links or text links.
+
+    Only the form is checked here; ArticleFetcher refuses hosts that are not public.
+    """
+    kinds = [MessageEntity.URL, MessageEntity.TEXT_LINK]
+    entities = post.parse_entities(kinds) if post.text else post.parse_caption_entities(kinds)
+    for entity, text in entities.items():
+        url = entity.url if entity.type == MessageEntity.TEXT_LINK else text
+        if not url.lower().startswith(('http://', 'https://')):
+            url = f"http://{url}"
+        return url
+    return None
+
+
+def make_excerpt(text: str, max_chars: int) -> str:
+    """Leading part of an article, cut at a paragraph or sentence end when there is one."""
+    text = text.strip()
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    cut = head.rfind('\n')
+    if cut < max_chars // 2:
+        ends = [match.end() for match in _SENTENCE_END.finditer(head)]
+        cut = ends[-1] if ends and ends[-1] >= max_chars // 2 else -1
+    return (head[:cut] if cut > 0 else head).rstrip() + ' …'
+
+
+class Article:
+    """Extracted excerpt of a linked page; translations are shared by every post linking it."""
+
+    __slots__ = ('url', 'excerpt', 'fetched', 'translations')
+
+    def __init__(self, url: str, excerpt: Optional[str]):
+        self.url = url
+        # None when the page could not be fetched or had no main text
+        self.excerpt = excerpt
+        self.fetched = time.monotonic()
+        # target language -> task resolving to the translated excerpt
+        self.translations: Dict[str, asyncio.Future] = {}
+
+    async def translated(self, target_language: str,
+                         translate: Callable[[str, str], Awaitable[Optional[str]]]) -> Optional[str]:
+        """Excerpt in `target_language`, translated at most once per language."""
+        if not self.excerpt:
+            return None
+        task = self.translations.get(target_language)
+        if task is None:
+            metrics.incr("articles.translations")
+            task = self.translations[target_language] = asyncio.ensure_future(
+                translate(self.excerpt, target_language)
+            )
+            task.add_done_callback(partial(self._forget_failed, target_language))
+        return await asyncio.shield(task)
+
+    def _forget_failed(self, target_language: str, task: asyncio.Future) -> None:
+        # Only successes are kept; the next post linking the page tries again
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            if self.translations.get(target_language) is task:
+                del self.translations[target_language]
+
+
+class ArticleFetcher:
+    """Fetches linked pages and extracts their main text, cached by URL.
+
+    At most `concurrency` pages are fetched at once, each within `timeout`
+    seconds and `max_bytes`. Failures are cached too, so a dead link is not
+    retried for every post and subscriber. Concurrent requests for the same
+    URL share one fetch.
+
+    Links come from channels anyone can post to, so the host is resolved and
+    refused unless every address is public, before the request and again at
+    each redirect. `allow_private` lifts that for a local test server.
+    """
+
+    def __init__(self, concurrency: int, timeout: float, max_bytes: int, excerpt_chars: int,
+                 ttl: float, max_entries: int):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.excerpt_chars = excerpt_chars
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.allow_private = False
+        self.entries: 'OrderedDict[str, Article]' = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.logger = logging.getLogger(__name__)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _cached(self, url: str) -> Optional[Article]:
+        article = self.entries.get(url)
+        if article is None:
+            return None
+        if time.monotonic() - article.fetched > self.ttl:
+            del self.entries[url]
+            return None
+        self.entries.move_to_end(url)
+        return article
+
+    async def get(self, url: str) -> Article:
+        article = self._cached(url)
+        if article is not None:
+            metrics.incr("articles.cache_hits")
+            return article
+
+        future = self._inflight.get(url)
+        if future is not None:
+            metrics.incr("articles.cache_hits")
+            return await asyncio.shield(future)
+
+        metrics.incr("articles.cache_misses")
+        future = self._inflight[url] = asyncio.get_running_loop().create_future()
+        try:
+            article = await self._fetch(url)
+            self.entries[url] = article
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            future.set_result(article)
+            return article
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[url]
+
+    async def _fetch(self, url: str) -> Article:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout, follow_redirects=False,
+                headers={'User-Agent': 'Mozilla/5.0 (compatible; TranslationMediator)'}
+            )
+        start = time.perf_counter()
+        try:
+            async with self._semaphore:
+                # Overall deadline as well: httpx timeouts apply per read, not per page
+                html = await asyncio.wait_for(self._download(url), self.timeout)
+            if html is None:
+                return Article(url, None)
+            text = await asyncio.to_thread(self._extract, html, url)
+            metrics.incr("articles.extracted" if text else "articles.empty")
+            return Article(url, make_excerpt(text, self.excerpt_chars) if text else None)
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            metrics.incr("articles.fetch_errors")
+            self.logger.warning("Could not fetch %s: %s", url, str(e) or type(e).__name__)
+            return Article(url, None)
+        except Exception as e:
+            metrics.incr("articles.extract_errors")
+            self.logger.warning("Could not extract %s: %s", url, e)
+            return Article(url, None)
+        finally:
+            metrics.observe("articles.fetch", time.perf_counter() - start)
+
+    async def _download(self, url: str) -> Optional[str]:
+        # Redirects are followed here rather than by httpx so each hop is checked
+        target = httpx.URL(url)
+        for _ in range(_MAX_REDIRECTS + 1):
+            address = await self._public_address(target)
+            if address is None:
+                metrics.incr("articles.blocked")
+                self.logger.warning("Not fetching %s: not a public address", target)
+                return None
+            # Connect to the address just checked, so a second DNS answer cannot
+            # point the request elsewhere; Host and TLS still name the site
+            request = self._client.build_request(
+                'GET', target.copy_with(host=address), headers={'Host': target.netloc.decode('ascii')},
+                extensions={'sni_hostname': target.host}
+            )
+            response = await self._client.send(request, stream=True)
+            try:
+                if response.is_redirect:
+                    target = target.join(response.headers['location'])
+                    continue
+                response.raise_for_status()
+                if 'html' not in response.headers.get('content-type', ''):
+                    return None
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) >= self.max_bytes:
+                        break
+                return body[:self.max_bytes].decode(response.encoding or 'utf-8', errors='replace')
+            finally:
+                await response.aclose()
+        raise httpx.TooManyRedirects(f"More than {_MAX_REDIRECTS} redirects")
+
+    async def _public_address(self, url: httpx.URL) -> Optional[str]:
+        """An address of the URL's host to connect to; None unless every address is public."""
+        if not url.host:
+            return None
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(url.host, url.port, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise httpx.ConnectError(f"Could not resolve {url.host}: {e}") from e
+        addresses = [ipaddress.ip_address(info[4][0]) for info in infos]
+        if not addresses:
+            return None
+        # is_global excludes loopback, private, link-local, shared and reserved ranges
+        if not self.allow_private and not all(a.is_global and not a.is_multicast for a in addresses):
+            return None
+        return str(addresses[0])
+
+    @staticmethod
+    def _extract(html: str, url: str) -> Optional[str]:
+        # Imported here: trafilatura (and lxml) are only needed when the stage is on
+        import trafilatura
+        return trafilatura.extract(html, url=url, include_comments=False, include_tables=False)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+from metrics import metrics
+
+
+class _Batch:
+    __slots__ = ('texts', 'waiters', 'chars', 'timer')
+
+    def __init__(self):
+        # Identical texts share one slot in the backend request
+        self.texts: Dict[str, List[asyncio.Future]] = {}
+        self.waiters = 0
+        self.chars = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class BatchDispatcher:
+    """Collects texts that share a key into one backend call.
+
+    The first text for a key opens a batch; it is sent `window` seconds later,
+    or as soon as it holds `max_size` distinct texts or `max_chars`
+    characters. `send(key, texts)` returns one result per text, in order, and
+    each caller gets back the result for its own text.
+    """
+
+    def __init__(self, send: Callable[[Hashable, List[str]], Awaitable[List[Optional[str]]]],
+                 window: float, max_size: int, max_chars: int):
+        self.send = send
+        self.window = window
+        self.max_size = max_size
+        self.max_chars = max_chars
+        self._open: Dict[Hashable, _Batch] = {}
+        self._sending = set()
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    async def submit(self, key: Hashable, text: str) -> Optional[str]:
+        batch = self._open.get(key)
+        if batch is not None and text not in batch.texts and batch.chars + len(text) > self.max_chars:
+            # Would not fit: send what is there and start a new batch
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = self._open[key] = _Batch()
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+
+        future = asyncio.get_running_loop().create_future()
+        if text not in batch.texts:
+            batch.texts[text] = []
+            batch.chars += len(text)
+        batch.texts[text].append(future)
+        batch.waiters += 1
+        if len(batch.texts) >= self.max_size or batch.chars >= self.max_chars:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key: Hashable) -> None:
+        batch = self._open.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        # The request serves every waiter, so it does not inherit the deadline
+        # of whichever caller happened to flush it
+        task = asyncio.get_running_loop().create_task(self._send(key, batch), context=contextvars.Context())
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, key: Hashable, batch: _Batch) -> None:
+        texts = list(batch.texts)
+        metrics.observe("translate.batch_size", len(texts))
+        metrics.incr("translate.batched_requests", batch.waiters)
+        try:
+            results = await self.send(key, texts)
+        except asyncio.CancelledError:
+            for futures in batch.texts.values():
+                for future in futures:
+                    future.cancel()
+            raise
+        except Exception as e:
+            for futures in batch.texts.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for text, result in zip(texts, results):
+            for future in batch.texts[text]:
+                if not future.done():
+                    future.set_result(result)
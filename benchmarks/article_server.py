@@ -0,0 +1,121 @@
+"""Local stand-in web server for linked articles.
+
+Serves generated news pages (navigation, article body, footer) so the
+article extraction stage can be exercised without the internet:
+
+  /article/<n>   HTML article; the body language follows ?lang= (default en)
+  /slow/<n>      answers after --slow-seconds (longer than any sane timeout)
+  /missing/<n>   404
+  /redirect/<n>  302 to /article/<n>
+  /file/<n>      application/octet-stream
+
+Usage: python benchmarks/article_server.py [--port 8090] [--latency lognormal:0.2,0.5]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from translate_server import latency_sampler  # noqa: E402
+
+SENTENCES = [
+    "The city council approved the new transport plan after a long debate on Tuesday evening.",
+    "Officials said construction of the first line would begin early next year.",
+    "Residents have asked for more frequent buses on routes that serve the outer districts.",
+    "The plan also sets aside funding for cycle lanes and wider pavements in the centre.",
+    "Critics argue that the budget does not account for rising material costs.",
+    "A spokesperson for the mayor said the figures had been reviewed by independent auditors.",
+    "Work on the northern section is expected to take about three years to complete.",
+    "Local businesses along the route will be offered support during the construction period.",
+]
+
+
+def article_html(n: int, lang: str, paragraphs: int = 8) -> str:
+    body = ''.join(
+        f"<p>{lang}: {SENTENCES[(n + i) % len(SENTENCES)]} {SENTENCES[(n + i + 3) % len(SENTENCES)]}</p>"
+        for i in range(paragraphs)
+    )
+    return (
+        f"<!DOCTYPE html><html lang=\"{lang}\"><head><meta charset=\"utf-8\"><title>Story {n}</title></head>"
+        "<body><nav><a href=\"/\">Home</a> <a href=\"/world\">World</a> <a href=\"/sport\">Sport</a></nav>"
+        f"<article><h1>{lang}: Story number {n}</h1><p class=\"byline\">By Staff Reporter</p>{body}</article>"
+        "<aside><h3>Most read</h3><ul><li><a href=\"/article/1\">Another story</a></li></ul></aside>"
+        "<footer>Copyright Example News. All rights reserved.</footer></body></html>"
+    )
+
+
+class ArticleHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = staticmethod(lambda: 0.0)
+    slow_seconds = 60.0
+    stats: Counter = None
+
+    def log_message(self, format, *args):
+        return
+
+    def _reply(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        kind = url.path.strip('/').split('/')[0]
+        self.stats[kind] += 1
+        time.sleep(max(0.0, self.latency()))
+        if kind == 'article':
+            n = int(url.path.rstrip('/').rsplit('/', 1)[-1] or 0)
+            lang = parse_qs(url.query).get('lang', ['en'])[0]
+            self._reply(200, article_html(n, lang).encode(), 'text/html; charset=utf-8')
+        elif kind == 'slow':
+            time.sleep(self.slow_seconds)
+            self._reply(200, article_html(0, 'en').encode(), 'text/html; charset=utf-8')
+        elif kind == 'file':
+            self._reply(200, b'\0' * 1024, 'application/octet-stream')
+        elif kind == 'redirect':
+            self.send_response(302)
+            self.send_header('Location', url.path.replace('/redirect/', '/article/', 1))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self._reply(404, b'Not Found', 'text/plain')
+
+
+def start_server(latency: str = 'fixed:0', slow_seconds: float = 60.0, host: str = '127.0.0.1', port: int = 0):
+    """Serve on a daemon thread; returns the server, whose `stats` counts requests per path kind."""
+    handler = type('ArticleStandIn', (ArticleHandler,), {
+        'latency': staticmethod(latency_sampler(latency)), 'slow_seconds': slow_seconds, 'stats': Counter()
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.stats = handler.stats
+    threading.Thread(target=server.serve_forever, name='article-server', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', default='fixed:0')
+    parser.add_argument('--slow-seconds', type=float, default=60.0)
+    args = parser.parse_args()
+
+    server = start_server(args.latency, args.slow_seconds, args.host, args.port)
+    print(f"Article stand-in listening on http://{args.host}:{server.server_address[1]}/article/1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Linked-article stage end to end, against a local stand-in web server.
+
+Pushes channel posts carrying links through the bot handlers with
+ARTICLE_EXTRACTION on. Links are spread over a few popular pages shared
+across channels plus a long tail, with some dead (404, non-HTML) and some
+hanging (slower than ARTICLE_FETCH_TIMEOUT) ones. Reports how many pages
+were actually fetched against the number of linked posts, cache hits,
+excerpt translations and fetch latency, and prints one delivered message.
+Then checks the cache-hit, 404, non-HTML, timeout and non-public-address
+paths directly and fails if any of them misbehaves.
+
+Usage: python benchmarks/bench_articles.py [--posts 500] [--channels 20] [--pages 100]
+                                           [--latency lognormal:0.2,0.5] [--timeout 2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update  # noqa: E402
+from article_server import start_server  # noqa: E402
+from fakes import FakeBotAPI, FakeTranslator, build_application, channel_id_for  # noqa: E402
+
+LANGUAGES = ['vi', 'en', 'ja', 'ko']
+
+
+class RecordingBotAPI(FakeBotAPI):
+    """FakeBotAPI that keeps the last message text sent with an article excerpt."""
+
+    last_text = None
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if url.endswith('/sendMessage') and request_data:
+            text = request_data.parameters.get('text', '')
+            if '📰' in text:
+                self.last_text = text
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+def link_for(base, rng, pages):
+    roll = rng.random()
+    if roll < 0.03:
+        return f"{base}/missing/{rng.randrange(pages)}"
+    if roll < 0.05:
+        return f"{base}/file/{rng.randrange(pages)}"
+    if roll < 0.06:
+        return f"{base}/slow/{rng.randrange(pages)}"
+    # Zipf-like: a few stories are linked from many channels
+    n = min(int(rng.paretovariate(1.2)), pages)
+    return f"{base}/article/{n}?lang={rng.choice(['en', 'ja'])}"
+
+
+def channel_post(update_id, chat_id, url):
+    text = f"en: Read this story {update_id}\n{url}"
+    offset = text.index(url)
+    return {'update_id': update_id, 'channel_post': {
+        'message_id': update_id, 'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'channel', 'title': 'News'},
+        'text': text, 'entities': [{'type': 'url', 'offset': offset, 'length': len(url)}]
+    }}
+
+
+async def check_paths(fetcher, base, stats, timeout):
+    from metrics import metrics
+
+    def counter(name):
+        return metrics.counters.get(name, 0)
+
+    first = await fetcher.get(f"{base}/article/9999")
+    fetched, hits = sum(stats.values()), counter('articles.cache_hits')
+    again = await fetcher.get(f"{base}/article/9999")
+    assert first.excerpt and again is first, "article not cached"
+    assert sum(stats.values()) == fetched and counter('articles.cache_hits') == hits + 1, "cache hit refetched"
+
+    errors = counter('articles.fetch_errors')
+    assert (await fetcher.get(f"{base}/missing/9999")).excerpt is None, "404 gave an excerpt"
+    assert counter('articles.fetch_errors') == errors + 1, "404 not counted as a fetch error"
+
+    assert (await fetcher.get(f"{base}/file/9999")).excerpt is None, "non-HTML page gave an excerpt"
+    assert counter('articles.fetch_errors') == errors + 1, "non-HTML page counted as a fetch error"
+
+    start = time.perf_counter()
+    assert (await fetcher.get(f"{base}/slow/9999")).excerpt is None, "slow page gave an excerpt"
+    assert time.perf_counter() - start < timeout + 1.0, "slow page outlived the fetch timeout"
+    assert counter('articles.fetch_errors') == errors + 2, "timeout not counted as a fetch error"
+
+    fetcher.allow_private = False
+    fetched = sum(stats.values())
+    assert (await fetcher.get(f"{base}/article/9998")).excerpt is None, "loopback address fetched"
+    assert sum(stats.values()) == fetched and counter('articles.blocked') == 1, "loopback address not refused"
+    fetcher.allow_private = True
+
+
+async def run(args, base, stats):
+    # Imported after ARTICLE_EXTRACTION is set so config picks it up
+    from metrics import metrics
+
+    rng = random.Random(1)
+    api = RecordingBotAPI()
+    application, handler = build_application(api, FakeTranslator(), token='0:articles')
+    handler.articles.timeout = args.timeout
+    # The stand-in server is on loopback, which the fetcher refuses by default
+    handler.articles.allow_private = True
+    channels = [channel_id_for(f"@news{i}") for i in range(args.channels)]
+    for uid in range(1, args.subscribers + 1):
+        handler.storage.update_user_preferences(uid, target_language=LANGUAGES[uid % len(LANGUAGES)])
+        for chat_id in rng.sample(channels, 3):
+            handler.storage.add_channel_subscription(uid, str(chat_id))
+    await application.initialize()
+
+    start = time.perf_counter()
+    for i in range(1, args.posts + 1):
+        data = channel_post(i, rng.choice(channels), link_for(base, rng, args.pages))
+        await application.process_update(Update.de_json(data, application.bot))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*handler.background_tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    await check_paths(handler.articles, base, stats, args.timeout)
+
+    await handler.articles.close()
+    await application.shutdown()
+    handler.translator.executor.shutdown()
+    return elapsed, metrics, api.last_text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=100.0, help='posts per second offered')
+    parser.add_argument('--channels', type=int, default=20)
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--pages', type=int, default=100, help='distinct article pages')
+    parser.add_argument('--latency', default='lognormal:0.2,0.5', help='web server latency distribution')
+    parser.add_argument('--timeout', type=float, default=2.0, help='per-page fetch timeout')
+    args = parser.parse_args()
+
+    os.environ['ARTICLE_EXTRACTION'] = '1'
+    server = start_server(args.latency, slow_seconds=args.timeout * 5)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        elapsed, metrics, sample = asyncio.run(run(args, base, server.stats))
+
+    counters = metrics.counters
+    fetch = metrics.histograms['articles.fetch'].summary()
+    fetched = sum(server.stats.values())
+    print(f"{args.posts} linked posts in {elapsed:.1f}s ({args.posts / elapsed:.0f}/s), "
+          f"web server latency {args.latency}")
+    print(f"pages fetched {fetched} ({dict(server.stats)})  cache hits {counters.get('articles.cache_hits', 0)}  "
+          f"misses {counters.get('articles.cache_misses', 0)}")
+    print(f"extracted {counters.get('articles.extracted', 0)}  empty {counters.get('articles.empty', 0)}  "
+          f"fetch errors {counters.get('articles.fetch_errors', 0)}  "
+          f"extract errors {counters.get('articles.extract_errors', 0)}")
+    print(f"excerpt translations {counters.get('articles.translations', 0)}  "
+          f"fetch p50 {fetch['p50'] * 1000:.0f}ms  p99 {fetch['p99'] * 1000:.0f}ms")
+    print("\nSample delivered message:\n" + (sample or '(none)'))
+    print("\ncache hit, 404, non-HTML, timeout and loopback paths OK")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Translation throughput with and without micro-batching, over real HTTP.
+
+Sends short texts with a known source language to a few target languages
+through TranslationService against the local translate stand-in
+(benchmarks/translate_server.py), once with the batch dispatcher and once
+without, and compares throughput, latency and backend requests.
+
+Usage: python benchmarks/bench_batching.py [--requests 2000] [--rate 500] [--latency lognormal:0.1,0.3]
+                                           [--window 0.02] [--max-size 16]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import Histogram  # noqa: E402
+from translate_server import Profile, start_server  # noqa: E402
+
+PAIRS = [('ja', 'vi'), ('ja', 'en'), ('en', 'vi'), ('ko', 'vi')]
+
+
+async def run(batched, args):
+    # Imported after TRANSLATE_SERVICE_URL is set so config picks it up
+    from batching import BatchDispatcher
+    from scheduler import INTERACTIVE
+    from translator import TranslationService
+
+    service = TranslationService()
+    service.batcher = None
+    if batched:
+        service.batcher = BatchDispatcher(service._send_batch, args.window, args.max_size, 4000)
+    rng = random.Random(1)
+    latency = Histogram(size=args.requests)
+    failed = 0
+
+    async def one(i):
+        nonlocal failed
+        src, dest = rng.choice(PAIRS)
+        start = time.perf_counter()
+        result = await service.translate_text_async(f"{src}: message {i}", dest, src, lane=INTERACTIVE)
+        latency.observe(time.perf_counter() - start)
+        if result is None:
+            failed += 1
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(args.requests):
+        tasks.append(asyncio.create_task(one(i)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    service.executor.shutdown()
+    return elapsed, latency.summary(), failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=500.0, help='requests per second offered')
+    parser.add_argument('--latency', default='lognormal:0.1,0.3', help='backend latency distribution')
+    parser.add_argument('--window', type=float, default=0.02)
+    parser.add_argument('--max-size', type=int, default=16)
+    args = parser.parse_args()
+
+    profile = Profile(args.latency)
+    server = start_server(profile)
+    os.environ['TRANSLATE_SERVICE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{args.requests} requests offered at {args.rate:.0f}/s, backend latency {args.latency}")
+    for batched in (False, True):
+        before = profile.stats['requests']
+        elapsed, summary, failed = asyncio.run(run(batched, args))
+        name = f"batched (window {args.window * 1000:.0f}ms, max {args.max_size})" if batched else "unbatched"
+        print(f"{name:<30} {args.requests / elapsed:6.0f}/s  p50 {summary['p50'] * 1000:7.1f}ms  "
+              f"p99 {summary['p99'] * 1000:7.1f}ms  backend requests {profile.stats['requests'] - before}  "
+              f"{failed} failed")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
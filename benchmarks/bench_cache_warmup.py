@@ -0,0 +1,109 @@
+"""Translation cache hit rate right after a restart, cold versus warm.
+
+A first run sends Zipf-distributed direct messages (common phrases recur)
+through the bot handlers against the rate-limited translate stand-in
+(benchmarks/translate_server.py) and saves the cache's hot set like the
+bot does at shutdown. The restart is then replayed twice with fresh
+handlers: once with an empty cache and once warmed from the snapshot.
+Reports hit rate, warm hits, backend requests and throttled (429) answers
+for the first messages after each start.
+
+Usage: python benchmarks/bench_cache_warmup.py [--phrases 2000] [--before 3000] [--after 600]
+                                               [--rate 100] [--rate-limit 40]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update  # noqa: E402
+from fakes import build_application  # noqa: E402
+from translate_server import Profile, start_server  # noqa: E402
+
+LANGUAGES = ['ja', 'ko', 'en']
+SNAPSHOT = 'translation_cache.jsonl.gz'
+
+
+def zipf_phrases(phrases, count, seed):
+    rng = random.Random(seed)
+    weights = [1.0 / rank for rank in range(1, phrases + 1)]
+    return [f"{LANGUAGES[n % len(LANGUAGES)]}: phrase {n}"
+            for n in rng.choices(range(phrases), weights=weights, k=count)]
+
+
+async def run(texts, args, warm=False, save=False):
+    # Imported after TRANSLATE_SERVICE_URL is set so config picks it up
+    from metrics import metrics
+
+    metrics.counters.clear()
+    application, handler = build_application(token='0:warmup')
+    await application.initialize()
+    if warm:
+        await handler.translator.warm_cache(SNAPSHOT, 10.0, 5000)
+
+    async def one(i, text):
+        # A different user per message, so the per-user rate limiter stays out of the way
+        data = {'update_id': i, 'message': {
+            'message_id': i, 'date': int(time.time()), 'chat': {'id': i, 'type': 'private'},
+            'from': {'id': i, 'is_bot': False, 'first_name': f"user{i}"}, 'text': text
+        }}
+        await application.process_update(Update.de_json(data, application.bot))
+
+    tasks = []
+    for i, text in enumerate(texts, 1):
+        tasks.append(asyncio.create_task(one(i, text)))
+        await asyncio.sleep(1.0 / args.rate)
+    await asyncio.gather(*tasks)
+    if save:
+        await handler.translator.save_cache(SNAPSHOT, 5000)
+    await application.shutdown()
+    handler.storage.flush()
+    handler.translator.executor.shutdown()
+    return dict(metrics.counters)
+
+
+def report(name, counters, profile, before):
+    hits = sum(v for k, v in counters.items() if k.startswith('translate_cache.') and k.endswith('.hits'))
+    misses = sum(v for k, v in counters.items() if k.startswith('translate_cache.') and k.endswith('.misses'))
+    warm_hits = sum(v for k, v in counters.items() if k.endswith('.warm_hits'))
+    print(f"{name:<12} hit rate {hits / max(1, hits + misses):6.1%}  warm hits {warm_hits:5}  "
+          f"backend requests {profile.stats['requests'] - before['requests']:5}  "
+          f"throttled {profile.stats['throttled'] - before['throttled']:4}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--phrases', type=int, default=2000, help='distinct phrases')
+    parser.add_argument('--before', type=int, default=3000, help='messages before the restart')
+    parser.add_argument('--after', type=int, default=600, help='messages measured after the restart')
+    parser.add_argument('--rate', type=float, default=100.0, help='messages per second')
+    parser.add_argument('--rate-limit', type=float, default=40.0, help='backend requests per second')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    profile = Profile('fixed:0.05', rate_limit=args.rate_limit, burst=20)
+    server = start_server(profile)
+    os.environ['TRANSLATE_SERVICE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        asyncio.run(run(zipf_phrases(args.phrases, args.before, seed=1), args, save=True))
+        print(f"{args.after} messages after a restart ({args.phrases} phrases, Zipf), "
+              f"backend limited to {args.rate_limit:.0f} requests/s")
+        after = zipf_phrases(args.phrases, args.after, seed=2)
+        for name, warm in (("cold start", False), ("warm start", True)):
+            before = dict(profile.stats)
+            counters = asyncio.run(run(after, args, warm=warm))
+            report(name, counters, profile, before)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Update throughput at different concurrency limits, with per-chat ordering checked.
+
+Feeds direct messages from many users through the full handler stack (fake
+Bot API and translation backend from benchmarks/fakes.py) using
+ChatOrderedUpdateProcessor at each limit, and counts chats whose updates
+finished out of arrival order. PTB's own unordered processor is run at the
+highest limit for comparison.
+
+Usage: python benchmarks/bench_concurrency.py [--limits 1,4,16,64] [--users 100] [--messages 5]
+                                              [--api-latency 0.05] [--translate-latency 0.01]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update  # noqa: E402
+from telegram.ext import SimpleUpdateProcessor, TypeHandler  # noqa: E402
+from fakes import FakeBotAPI, FakeTranslator, build_application  # noqa: E402
+from update_processor import ChatOrderedUpdateProcessor, chat_key  # noqa: E402
+
+LANGUAGES = ['vi', 'en', 'ja', 'ko']
+
+
+def workload(users, messages, seed=1):
+    """Each user sends `messages` numbered texts; users are interleaved at random."""
+    rng = random.Random(seed)
+    queue = [user_id for user_id in range(1, users + 1) for _ in range(messages)]
+    rng.shuffle(queue)
+    updates = []
+    for update_id, user_id in enumerate(queue, 1):
+        updates.append({'update_id': update_id, 'message': {
+            'message_id': update_id, 'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+            'text': f"{rng.choice(LANGUAGES)}: message {update_id}"
+        }})
+    return updates
+
+
+async def run(processor, updates, args):
+    application, handler = build_application(
+        FakeBotAPI(latency=args.api_latency), FakeTranslator(latency=args.translate_latency), processor=processor
+    )
+
+    finished = {}
+    done = asyncio.Event()
+
+    async def mark_finished(update, context):
+        finished.setdefault(chat_key(update), []).append(update.update_id)
+        if sum(len(ids) for ids in finished.values()) == len(updates):
+            done.set()
+
+    application.add_handler(TypeHandler(Update, mark_finished), group=1)
+
+    await application.initialize()
+    await application.start()
+    start = time.perf_counter()
+    for data in updates:
+        await application.update_queue.put(Update.de_json(data, application.bot))
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    await application.stop()
+    await application.shutdown()
+    handler.storage.flush()
+    handler.translator.executor.shutdown()
+
+    out_of_order = sum(1 for ids in finished.values() if ids != sorted(ids))
+    return elapsed, out_of_order, len(finished)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--limits', default='1,4,16,64')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=5, help='messages per user')
+    parser.add_argument('--api-latency', type=float, default=0.05, help='fake Bot API latency in seconds')
+    parser.add_argument('--translate-latency', type=float, default=0.01, help='fake backend latency in seconds')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    updates = workload(args.users, args.messages)
+    limits = [int(limit) for limit in args.limits.split(',')]
+    runs = [(f"ordered {limit}", ChatOrderedUpdateProcessor(concurrency=limit)) for limit in limits]
+    if max(limits) > 1:
+        runs.append((f"unordered {max(limits)}", SimpleUpdateProcessor(max(limits))))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        baseline = None
+        print(f"{len(updates)} updates from {args.users} chats")
+        for name, processor in runs:
+            elapsed, out_of_order, chats = asyncio.run(run(processor, updates, args))
+            throughput = len(updates) / elapsed
+            baseline = baseline or throughput
+            print(f"{name:<14} {throughput:7.0f} updates/s  x{throughput / baseline:5.1f}  "
+                  f"{out_of_order}/{chats} chats out of order")
+
+
+if __name__ == '__main__':
+    main()
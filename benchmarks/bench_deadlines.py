@@ -0,0 +1,118 @@
+"""Direct-message latency with and without per-update deadlines.
+
+Sends direct messages through the bot handlers against the local translate
+stand-in (benchmarks/translate_server.py) configured to fail or hang a
+fraction of requests, so googletrans timeouts and our retries run for real.
+Runs once with deadlines off and once with the 'message' budget, and
+reports handler latency, fallback replies and deadline-exceeded counts per
+stage.
+
+Usage: python benchmarks/bench_deadlines.py [--messages 300] [--rate 3] [--budget 6] [--hang-rate 0.02]
+                                            [--error-rate 0.05] [--translate-timeout 5]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update  # noqa: E402
+from fakes import FakeBotAPI, build_application  # noqa: E402
+from translate_server import Profile, start_server  # noqa: E402
+
+LANGUAGES = ['ja', 'ko', 'en']
+
+
+class RecordingBotAPI(FakeBotAPI):
+    """FakeBotAPI that counts fallback ("took too long") replies."""
+
+    fallbacks = 0
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if url.endswith('/sendMessage') and request_data and '⌛' in request_data.parameters.get('text', ''):
+            self.fallbacks += 1
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+def direct_message(update_id, user_id, text):
+    return {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+        'text': text
+    }}
+
+
+async def run(budget, args):
+    # Imported after TRANSLATE_SERVICE_URL is set so config picks it up
+    import config
+    from metrics import Histogram, metrics
+
+    config.UPDATE_DEADLINES['message'] = budget
+    metrics.counters.clear()
+    rng = random.Random(1)
+    api = RecordingBotAPI()
+    application, handler = build_application(api, token='0:deadlines')
+    await application.initialize()
+
+    latency = Histogram(size=args.messages)
+
+    async def one(i):
+        # One message per user, so the rate limiter stays out of the way
+        update = Update.de_json(direct_message(i, i, f"{rng.choice(LANGUAGES)}: message {i}"), application.bot)
+        start = time.perf_counter()
+        await application.process_update(update)
+        latency.observe(time.perf_counter() - start)
+
+    tasks = []
+    for i in range(1, args.messages + 1):
+        tasks.append(asyncio.create_task(one(i)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    await application.shutdown()
+    handler.storage.flush()
+    # Worker threads may still be inside requests the deadline gave up on
+    handler.translator.executor.shutdown(wait=False, cancel_futures=True)
+    return latency, api.fallbacks, dict(metrics.counters)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=300)
+    parser.add_argument('--rate', type=float, default=3.0, help='messages per second offered')
+    parser.add_argument('--budget', type=float, default=6.0, help="deadline for 'message' updates (s)")
+    parser.add_argument('--latency', default='lognormal:0.2,0.5', help='backend latency distribution')
+    parser.add_argument('--hang-rate', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--translate-timeout', type=float, default=5.0, help='googletrans HTTP timeout (s)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    server = start_server(Profile(args.latency, args.error_rate, args.hang_rate))
+    os.environ['TRANSLATE_SERVICE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ['TRANSLATE_TIMEOUT'] = str(args.translate_timeout)
+
+    print(f"{args.messages} DMs at {args.rate:.0f}/s, backend {args.latency}, "
+          f"{args.hang_rate:.0%} hang, {args.error_rate:.0%} fail, HTTP timeout {args.translate_timeout}s")
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        for budget in (0, args.budget):
+            latency, fallbacks, counters = asyncio.run(run(budget, args))
+            summary = latency.summary()
+            name = f"deadline {budget:.0f}s" if budget else "no deadline"
+            stages = {name.rsplit('.', 1)[-1]: count for name, count in counters.items()
+                      if name.startswith('deadline.exceeded.stage.')}
+            print(f"{name:<12} p50 {summary['p50']:5.2f}s  p99 {summary['p99']:5.2f}s  max {summary['max']:5.2f}s  "
+                  f"fallback replies {fallbacks}  exceeded by stage {stages}  "
+                  f"retries skipped {counters.get('deadline.retries_skipped', 0)}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Channel post to subscriber delivery latency, broken down by stage.
+
+Publishes channel posts to subscribers spread over several languages
+through the bot handlers (fake Bot API and translation backend from
+benchmarks/fakes.py) with real outbound pacing, then prints where the
+time went: receive, detect, translate, queue and send, end-to-end latency
+per language, the slowest channels, and a line of the delivery trace file.
+
+Usage: python benchmarks/bench_delivery_latency.py [--posts 40] [--channels 8] [--subscribers 100]
+                                                   [--send-rate 25] [--translate-latency 0.2]
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update  # noqa: E402
+from fakes import FakeBotAPI, FakeTranslator, build_application, channel_id_for  # noqa: E402
+
+LANGUAGES = ['vi', 'en', 'ja', 'ko']
+
+
+async def run(args):
+    # Imported after DELIVERY_TRACE_FILE is set so config picks it up
+    from metrics import metrics
+
+    rng = random.Random(1)
+    application, handler = build_application(
+        FakeBotAPI(latency=args.api_latency), FakeTranslator(latency=args.translate_latency),
+        send_rate=args.send_rate
+    )
+    channels = [channel_id_for(f"@latency{i}") for i in range(args.channels)]
+    for uid in range(1, args.subscribers + 1):
+        handler.storage.update_user_preferences(uid, target_language=LANGUAGES[uid % len(LANGUAGES)])
+        for chat_id in rng.sample(channels, min(2, len(channels))):
+            handler.storage.add_channel_subscription(uid, str(chat_id))
+    await application.initialize()
+
+    start = time.perf_counter()
+    for i in range(1, args.posts + 1):
+        data = {'update_id': i, 'channel_post': {
+            'message_id': i, 'date': int(time.time()),
+            'chat': {'id': rng.choice(channels), 'type': 'channel', 'title': 'Latency'},
+            'text': f"{rng.choice(['ja', 'en', 'ko'])}: post {i}"
+        }}
+        await application.process_update(Update.de_json(data, application.bot))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*handler.background_tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    await application.shutdown()
+    handler.delivery_latency.close()
+    handler.storage.flush()
+    handler.translator.executor.shutdown()
+    return elapsed, metrics, handler.delivery_latency
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=40)
+    parser.add_argument('--rate', type=float, default=2.0, help='posts per second published')
+    parser.add_argument('--channels', type=int, default=8)
+    parser.add_argument('--subscribers', type=int, default=100)
+    parser.add_argument('--send-rate', type=float, default=25.0, help='outbound messages per second')
+    parser.add_argument('--api-latency', type=float, default=0.05, help='fake Bot API latency in seconds')
+    parser.add_argument('--translate-latency', type=float, default=0.2, help='fake backend latency in seconds')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.environ['DELIVERY_TRACE_FILE'] = os.path.join(workdir, 'delivery_trace.jsonl.gz')
+        elapsed, metrics, latency = asyncio.run(run(args))
+
+        snapshot = metrics.snapshot()['histograms']
+        print(f"{args.posts} posts to {args.subscribers} subscribers in {elapsed:.1f}s, "
+              f"sends paced at {args.send_rate:.0f}/s")
+        for name in ('receive', 'detect', 'translate', 'queue', 'send'):
+            s = snapshot.get(f"delivery.stage.{name}")
+            if s:
+                print(f"  {name:<10} n={s['count']:<5} avg {s['avg']:6.2f}s  p50 {s['p50']:6.2f}s  p99 {s['p99']:6.2f}s")
+        for name, s in sorted(snapshot.items()):
+            if name.startswith('delivery.latency'):
+                print(f"  {name:<26} n={s['count']:<5} p50 {s['p50']:6.2f}s  p99 {s['p99']:6.2f}s")
+        print(latency.render(limit=3))
+        with gzip.open(os.environ['DELIVERY_TRACE_FILE'], 'rt') as f:
+            lines = f.read().splitlines()
+        print(f"trace: {len(lines)} lines, e.g. {lines[-1]}")
+
+
+if __name__ == '__main__':
+    main()
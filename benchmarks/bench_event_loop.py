@@ -0,0 +1,104 @@
+"""Event-loop overhead per update: plain asyncio, asyncio patched by nest_asyncio, and uvloop.
+
+Each variant runs in its own process (nest_asyncio patches asyncio globally)
+and measures two things: a bare task round trip (create_task + one yield),
+and direct messages through the full handler stack with zero-latency fakes,
+where everything left is Python and loop scheduling. nest_asyncio and uvloop
+are benchmark-only (`pip install nest_asyncio uvloop`); a variant whose
+package is not installed is reported as skipped.
+
+Usage: python benchmarks/bench_event_loop.py [--updates 2000] [--tasks 200000] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = ['asyncio', 'nest_asyncio', 'uvloop']
+
+
+async def task_round_trips(count):
+    async def yield_once():
+        await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    for _ in range(count // 100):
+        await asyncio.gather(*(asyncio.create_task(yield_once()) for _ in range(100)))
+    return (time.perf_counter() - start) / count
+
+
+def loop_factory(variant):
+    if variant == 'nest_asyncio':
+        import nest_asyncio
+        nest_asyncio.apply()
+    if variant == 'uvloop':
+        import uvloop
+        return uvloop.new_event_loop
+    return asyncio.new_event_loop
+
+
+def measure(factory, args):
+    from bench_concurrency import run, workload
+    from update_processor import ChatOrderedUpdateProcessor
+
+    logging.getLogger().setLevel(logging.ERROR)
+    args.api_latency = args.translate_latency = 0.0
+    updates = workload(args.updates // 5, 5)
+    with asyncio.Runner(loop_factory=factory) as runner:
+        per_task = runner.run(task_round_trips(args.tasks))
+    with asyncio.Runner(loop_factory=factory) as runner:
+        elapsed, out_of_order, _ = runner.run(
+            run(ChatOrderedUpdateProcessor(concurrency=args.concurrency), updates, args)
+        )
+    return {'per_task': per_task, 'per_update': elapsed / len(updates), 'out_of_order': out_of_order}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--tasks', type=int, default=200000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--variant', choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        try:
+            factory = loop_factory(args.variant)
+        except ImportError as e:
+            print(json.dumps({'skipped': f"{e.name} is not installed"}))
+            return
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            print(json.dumps(measure(factory, args)))
+        return
+
+    print(f"{'variant':<14} {'task round trip':>16} {'per update':>12}")
+    baseline = None
+    for variant in VARIANTS:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--variant', variant, '--updates', str(args.updates),
+             '--tasks', str(args.tasks), '--concurrency', str(args.concurrency)],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"{variant:<14} failed ({result.stderr.strip()[-200:]})")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        if 'skipped' in stats:
+            print(f"{variant:<14} skipped ({stats['skipped']})")
+            continue
+        baseline = baseline or stats['per_update']
+        print(f"{variant:<14} {stats['per_task'] * 1e6:14.2f}us {stats['per_update'] * 1e6:10.0f}us  "
+              f"x{stats['per_update'] / baseline:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Interactive vs bulk queue wait under a channel fan-out storm.
+
+Runs the same workload against TranslationService with and without slots
+reserved for interactive traffic and prints per-lane wait percentiles.
+
+Usage: python benchmarks/bench_lanes.py [--bulk 2000] [--interactive 200] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import metrics  # noqa: E402
+from scheduler import LaneScheduler, INTERACTIVE, BULK  # noqa: E402
+from translator import TranslationService  # noqa: E402
+
+
+class SlowBackend:
+    """Stands in for googletrans with a fixed per-call latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def translate(self, text, dest='en', src='auto'):
+        time.sleep(self.latency)
+        return type('Translated', (), {'text': f"[{dest}] {text}", 'src': src})()
+
+
+async def run(workers, reserved, args):
+    metrics.histograms.clear()
+    service = TranslationService()
+    service.translator = SlowBackend(args.latency)
+    service.lanes = LaneScheduler(workers, reserved)
+    rng = random.Random(1)
+
+    async def interactive():
+        for _ in range(args.interactive):
+            await asyncio.sleep(rng.expovariate(args.interactive_rate))
+            asyncio.ensure_future(service.translate_text_async("hi", 'vi', 'en', lane=INTERACTIVE))
+
+    start = time.perf_counter()
+    storm = [service.translate_text_async(f"post {i}", 'vi', 'en', lane=BULK) for i in range(args.bulk)]
+    await asyncio.gather(interactive(), *storm)
+    while service.lanes.in_use[INTERACTIVE]:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    service.executor.shutdown()
+    return elapsed, metrics.histograms[f"lane.{INTERACTIVE}.wait"].summary(), \
+        metrics.histograms[f"lane.{BULK}.wait"].summary()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--reserved', type=int, default=3)
+    parser.add_argument('--bulk', type=int, default=2000)
+    parser.add_argument('--interactive', type=int, default=200)
+    parser.add_argument('--interactive-rate', type=float, default=50.0, help='arrivals per second')
+    parser.add_argument('--latency', type=float, default=0.02, help='backend latency in seconds')
+    args = parser.parse_args()
+
+    print(f"{'reserved':>8} {'elapsed':>8} {'int p50':>9} {'int p99':>9} {'bulk p50':>9} {'bulk p99':>9}")
+    for reserved in (0, args.reserved):
+        elapsed, inter, bulk = asyncio.run(run(args.workers, reserved, args))
+        print(f"{reserved:>8} {elapsed:>7.2f}s {inter['p50'] * 1000:>7.1f}ms {inter['p99'] * 1000:>7.1f}ms "
+              f"{bulk['p50'] * 1000:>7.1f}ms {bulk['p99'] * 1000:>7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Time to first message and time to translation with progressive delivery.
+
+Publishes channel posts to subscribers through the bot handlers (fake Bot
+API and translation backend from benchmarks/fakes.py, real outbound
+pacing), once with every subscriber on plain delivery and once with
+progressive delivery on, where the original is sent right away and edited
+into the translation. Reports `delivery.ttfb` and `delivery.latency` (time
+to translation), originals sent, edits and originals left untranslated
+after the timeout.
+
+Usage: python benchmarks/bench_progressive.py [--posts 30] [--subscribers 60] [--translate-latency 1.0]
+                                              [--send-rate 30] [--timeout 60]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update  # noqa: E402
+from fakes import FakeBotAPI, FakeTranslator, build_application, channel_id_for  # noqa: E402
+
+LANGUAGES = ['vi', 'en', 'ko']
+
+
+async def run(progressive, args):
+    # Imported after PROGRESSIVE_TRANSLATION_TIMEOUT is set so config picks it up
+    from metrics import metrics
+
+    metrics.counters.clear()
+    metrics.histograms.clear()
+    rng = random.Random(1)
+    api = FakeBotAPI(latency=args.api_latency)
+    application, handler = build_application(
+        api, FakeTranslator(latency=args.translate_latency), send_rate=args.send_rate
+    )
+    channels = [channel_id_for(f"@signals{i}") for i in range(args.channels)]
+    for uid in range(1, args.subscribers + 1):
+        handler.storage.update_user_preferences(
+            uid, target_language=LANGUAGES[uid % len(LANGUAGES)], progressive_enabled=progressive
+        )
+        handler.storage.add_channel_subscription(uid, str(rng.choice(channels)))
+    await application.initialize()
+
+    for i in range(1, args.posts + 1):
+        data = {'update_id': i, 'channel_post': {
+            'message_id': i, 'date': int(time.time()),
+            'chat': {'id': rng.choice(channels), 'type': 'channel', 'title': 'Signals'},
+            'text': f"ja: signal {i}"
+        }}
+        await application.process_update(Update.de_json(data, application.bot))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*handler.background_tasks, return_exceptions=True)
+
+    await application.shutdown()
+    handler.delivery_latency.close()
+    handler.storage.flush()
+    handler.translator.executor.shutdown()
+    return metrics.snapshot(), api.calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=30)
+    parser.add_argument('--rate', type=float, default=1.0, help='posts per second published')
+    parser.add_argument('--channels', type=int, default=4)
+    parser.add_argument('--subscribers', type=int, default=60)
+    parser.add_argument('--send-rate', type=float, default=30.0, help='outbound messages per second')
+    parser.add_argument('--api-latency', type=float, default=0.05, help='fake Bot API latency in seconds')
+    parser.add_argument('--translate-latency', type=float, default=1.0, help='fake backend latency in seconds')
+    parser.add_argument('--timeout', type=float, default=60.0, help='PROGRESSIVE_TRANSLATION_TIMEOUT')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    os.environ['PROGRESSIVE_TRANSLATION_TIMEOUT'] = str(args.timeout)
+    print(f"{args.posts} posts to {args.subscribers} subscribers, backend {args.translate_latency:.1f}s, "
+          f"sends paced at {args.send_rate:.0f}/s, translation timeout {args.timeout:.0f}s")
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        for name, progressive in (("plain", False), ("progressive", True)):
+            snapshot, calls = asyncio.run(run(progressive, args))
+            histograms, counters = snapshot['histograms'], snapshot['counters']
+            # No translation at all is delivered when every one of them times out
+            missing = {'p50': float('nan'), 'p99': float('nan')}
+            ttfb, latency = histograms['delivery.ttfb'], histograms.get('delivery.latency', missing)
+            print(f"  {name:<12} first message p50 {ttfb['p50']:5.2f}s  p99 {ttfb['p99']:5.2f}s   "
+                  f"translation p50 {latency['p50']:5.2f}s  p99 {latency['p99']:5.2f}s   "
+                  f"originals {counters.get('progressive.originals', 0)}  "
+                  f"edited {counters.get('progressive.edited', 0)}  "
+                  f"timed out {counters.get('progressive.timed_out', 0)}  "
+                  f"Bot API calls {calls['sendMessage'] + calls['editMessageText']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Memory and lookup benchmark: legacy dict-of-dicts layout vs compact UserRecord storage.
+
+Usage: python benchmarks/bench_storage.py [--users 1000000] [--channels 5000]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Storage  # noqa: E402
+
+LANGUAGES = ['en', 'vi', 'ja', 'ko', 'zh']
+
+
+class LegacyStorage:
+    """The pre-compact layout: str user ids -> dict, subscriptions as lists."""
+
+    def __init__(self, user_data):
+        self.user_data = user_data
+
+    def get_user_preferences(self, user_id):
+        return self.user_data.get(str(user_id), {
+            'target_language': 'en',
+            'subscribed_channels': [],
+            'notifications_enabled': True
+        })
+
+    def is_subscribed(self, user_id, channel_id):
+        return channel_id in self.get_user_preferences(user_id)['subscribed_channels']
+
+    def get_channel_subscribers(self, channel_id):
+        return [uid for uid, prefs in self.user_data.items()
+                if channel_id in prefs.get('subscribed_channels', [])]
+
+
+def make_user_data(users, channels, seed=1):
+    rng = random.Random(seed)
+    data = {}
+    for uid in range(users):
+        subs = [f"-100{rng.randrange(channels)}" for _ in range(rng.randint(0, 3))]
+        data[str(100000 + uid)] = {
+            # json.load never interns values, so build fresh strings the same way
+            'target_language': ''.join(rng.choice(LANGUAGES)),
+            'subscribed_channels': list(dict.fromkeys(subs)),
+            'notifications_enabled': True
+        }
+    return data
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def timeit(fn, keys):
+    start = time.perf_counter()
+    for key in keys:
+        fn(*key)
+    return (time.perf_counter() - start) / len(keys) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--channels', type=int, default=5000)
+    parser.add_argument('--lookups', type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(2)
+    tmp = tempfile.mkdtemp()
+
+    legacy, legacy_bytes = measure(lambda: LegacyStorage(make_user_data(args.users, args.channels)))
+
+    def build_compact():
+        storage = Storage(os.path.join(tmp, 'users.json'), os.path.join(tmp, 'channels.json'))
+        storage.load_users(make_user_data(args.users, args.channels))
+        return storage
+
+    # The raw JSON dict is garbage once loaded, so only the resident records are counted
+    compact, compact_bytes = measure(build_compact)
+
+    user_keys = [(100000 + rng.randrange(args.users * 2),) for _ in range(args.lookups)]
+    member_keys = [(uid, f"-100{rng.randrange(args.channels)}") for (uid,) in user_keys]
+    route_keys = [(f"-100{rng.randrange(args.channels)}",) for _ in range(20)]
+
+    rows = [
+        ('resident memory (MB)', legacy_bytes / 2**20, compact_bytes / 2**20),
+        ('get_user_preferences (ns)', timeit(legacy.get_user_preferences, user_keys),
+         timeit(compact.get_user_preferences, user_keys)),
+        ('is_subscribed (ns)', timeit(legacy.is_subscribed, member_keys),
+         timeit(compact.is_subscribed, member_keys)),
+        ('target language (ns)',
+         timeit(lambda uid: legacy.get_user_preferences(uid).get('target_language', 'en'), user_keys),
+         timeit(compact.get_target_language, user_keys)),
+        ('channel routing (us)', timeit(legacy.get_channel_subscribers, route_keys) / 1000,
+         timeit(compact.get_channel_subscribers, route_keys) / 1000),
+    ]
+
+    print(f"users={args.users} channels={args.channels}")
+    print(f"{'metric':<28}{'legacy':>14}{'compact':>14}{'ratio':>10}")
+    for name, old, new in rows:
+        print(f"{name:<28}{old:>14.2f}{new:>14.2f}{old / new if new else float('inf'):>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
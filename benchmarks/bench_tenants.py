@@ -0,0 +1,159 @@
+"""Several bots in one process sharing a translation service.
+
+Fairness: a noisy bot floods direct messages from many users while a quiet
+bot gets a trickle, both on one TranslationService with a small worker pool
+(fake backend from benchmarks/fakes.py). Reports the quiet bot's message
+latency with per-bot turns in the translation queue and with both bots
+running as the same tenant, i.e. plain arrival order.
+
+Sharing: both bots have subscribers to the same channels and receive the
+same posts. Reports backend calls with one shared service against a
+service per bot.
+
+Usage: python benchmarks/bench_tenants.py [--flood 1500] [--quiet 60] [--workers 4] [--concurrency 16]
+                                          [--latency 0.02] [--posts 40] [--channels 4]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update  # noqa: E402
+from fakes import FakeTranslator, build_application, channel_id_for  # noqa: E402
+from config import USER_DATA_FILE, CHANNEL_DATA_FILE  # noqa: E402
+from metrics import Histogram  # noqa: E402
+from scheduler import LaneScheduler  # noqa: E402
+from storage import Storage  # noqa: E402
+from tenants import DEFAULT_TENANT, tenant_file  # noqa: E402
+from translator import TranslationService  # noqa: E402
+from update_processor import ChatOrderedUpdateProcessor  # noqa: E402
+
+LANGUAGES = ['vi', 'en', 'ja', 'ko']
+
+
+def direct_message(update_id, user_id, text):
+    return {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+        'text': text
+    }}
+
+
+def make_service(args):
+    service = TranslationService()
+    service.translator = FakeTranslator(latency=args.latency)
+    service.lanes = LaneScheduler(args.workers, 1)
+    return service
+
+
+class Bot:
+    def __init__(self, name, tenant, service, concurrency):
+        storage = Storage(tenant_file(name, USER_DATA_FILE), tenant_file(name, CHANNEL_DATA_FILE))
+        self.application, self.handler = build_application(
+            processor=ChatOrderedUpdateProcessor(concurrency, tenant=tenant), token=f"0:{name}",
+            translator=service, storage=storage, tenant=tenant
+        )
+
+    async def process(self, data):
+        # Through the update processor, as polling would, so handlers run as the tenant
+        app = self.application
+        update = Update.de_json(data, app.bot)
+        await app.update_processor.process_update(update, app.process_update(update))
+
+    async def close(self):
+        await asyncio.gather(*self.handler.background_tasks, return_exceptions=True)
+        await self.application.shutdown()
+        self.handler.storage.flush()
+        self.handler.delivery_latency.close()
+
+
+async def fairness(fair, args):
+    service = make_service(args)
+    noisy = Bot('noisy', 'noisy' if fair else DEFAULT_TENANT, service, args.concurrency)
+    quiet = Bot('quiet', 'quiet' if fair else DEFAULT_TENANT, service, args.concurrency)
+    for bot in (noisy, quiet):
+        await bot.application.initialize()
+    latency = Histogram(size=args.quiet)
+
+    async def one_quiet(i):
+        start = time.perf_counter()
+        await quiet.process(direct_message(i, 10 ** 6 + i, f"ja: quiet {i}"))
+        latency.observe(time.perf_counter() - start)
+
+    # One message per user and distinct texts, so neither the per-user rate
+    # limiter nor the cache takes load off the backend
+    flood = [asyncio.create_task(noisy.process(direct_message(i, i, f"ko: flood {i}")))
+             for i in range(1, args.flood + 1)]
+    trickle = []
+    for i in range(1, args.quiet + 1):
+        trickle.append(asyncio.create_task(one_quiet(i)))
+        await asyncio.sleep(1.0 / args.quiet_rate)
+    await asyncio.gather(*flood, *trickle)
+    for bot in (noisy, quiet):
+        await bot.close()
+    service.executor.shutdown()
+    return latency.summary()
+
+
+async def sharing(shared, args):
+    services = [make_service(args)]
+    if not shared:
+        services.append(make_service(args))
+    bots = [Bot(name, name, services[i % len(services)], args.concurrency)
+            for i, name in enumerate(('alpha', 'beta'))]
+    channels = [channel_id_for(f"@tenants{i}") for i in range(args.channels)]
+    for bot in bots:
+        for uid in range(1, 21):
+            bot.handler.storage.update_user_preferences(uid, target_language=LANGUAGES[uid % len(LANGUAGES)])
+            bot.handler.storage.add_channel_subscription(uid, str(channels[uid % len(channels)]))
+        await bot.application.initialize()
+
+    for i in range(1, args.posts + 1):
+        data = {'update_id': i, 'channel_post': {
+            'message_id': i, 'date': int(time.time()),
+            'chat': {'id': channels[i % len(channels)], 'type': 'channel', 'title': 'Tenants'},
+            'text': f"ja: post {i}"
+        }}
+        await asyncio.gather(*(bot.process(data) for bot in bots))
+    for bot in bots:
+        await bot.close()
+    calls = sum(sum(service.translator.calls.values()) for service in services)
+    for service in services:
+        service.executor.shutdown()
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--flood', type=int, default=1500, help='DMs the noisy bot gets at once')
+    parser.add_argument('--quiet', type=int, default=60, help='DMs the quiet bot gets')
+    parser.add_argument('--quiet-rate', type=float, default=20.0, help='quiet DMs per second')
+    parser.add_argument('--concurrency', type=int, default=16, help='updates each bot handles at once')
+    parser.add_argument('--workers', type=int, default=4, help='backend calls in flight')
+    parser.add_argument('--latency', type=float, default=0.02, help='fake backend latency in seconds')
+    parser.add_argument('--posts', type=int, default=40)
+    parser.add_argument('--channels', type=int, default=4)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        print(f"quiet bot, {args.quiet} DMs while the noisy bot has {args.flood} queued, "
+              f"{args.workers} workers at {args.latency * 1000:.0f}ms")
+        for name, fair in (("same tenant", False), ("per-bot turns", True)):
+            s = asyncio.run(fairness(fair, args))
+            print(f"  {name:<14} p50 {s['p50']:6.2f}s  p99 {s['p99']:6.2f}s  max {s['max']:6.2f}s")
+        print(f"{args.posts} posts to two bots subscribed to the same channels")
+        for name, shared in (("service per bot", False), ("shared service", True)):
+            print(f"  {name:<16} backend calls {asyncio.run(sharing(shared, args))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""TranslationService against the local translate stand-in, over real HTTP.
+
+Starts benchmarks/translate_server.py in-process with the given behaviour and
+drives the real googletrans client through TranslationService, so timeouts,
+retries, throttling, the adaptive concurrency limit and the connection pool
+are all exercised offline. --fixed N pins the limit at N for comparison.
+
+Usage: python benchmarks/bench_translate_backend.py [--requests 500] [--latency lognormal:0.05,0.5]
+                                                    [--error-rate 0.02] [--rate-limit 100] [--capacity 8]
+                                                    [--fixed 32]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import Histogram, metrics  # noqa: E402
+from translate_server import Profile, start_server  # noqa: E402
+
+
+async def run(args):
+    # Imported after TRANSLATE_SERVICE_URL is set so config picks it up
+    from limiter import AdaptiveLimit
+    from translator import TranslationService
+    from scheduler import BULK
+
+    service = TranslationService()
+    if args.fixed:
+        service.limit = AdaptiveLimit(args.fixed, args.fixed, args.fixed)
+        service.lanes.set_capacity(args.fixed)
+    latency = Histogram(size=args.requests)
+    limits = []
+
+    async def sample_limit():
+        while True:
+            limits.append(service.limit.limit)
+            await asyncio.sleep(0.1)
+    failed = 0
+
+    async def one(i):
+        nonlocal failed
+        start = time.perf_counter()
+        result = await service.translate_text_async(f"ja: message {i}", 'vi', lane=BULK)
+        latency.observe(time.perf_counter() - start)
+        if result is None:
+            failed += 1
+
+    sampler = asyncio.create_task(sample_limit())
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+    service.executor.shutdown()
+    return elapsed, latency.summary(), failed, limits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--latency', default='lognormal:0.05,0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--hang-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0)
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--capacity', type=int, default=0, help='server concurrency; 0 = unlimited')
+    parser.add_argument('--timeout', type=float, default=None, help='client timeout (TRANSLATE_TIMEOUT)')
+    parser.add_argument('--fixed', type=int, default=0, help='fixed in-flight limit instead of the adaptive one')
+    args = parser.parse_args()
+
+    profile = Profile(args.latency, args.error_rate, args.hang_rate, args.rate_limit, args.burst,
+                      capacity=args.capacity)
+    server = start_server(profile)
+    os.environ['TRANSLATE_SERVICE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+    if args.timeout is not None:
+        os.environ['TRANSLATE_TIMEOUT'] = str(args.timeout)
+
+    elapsed, summary, failed, limits = asyncio.run(run(args))
+    server.shutdown()
+    print(f"requests   {args.requests} in {elapsed:.2f}s ({args.requests / elapsed:.0f}/s), {failed} failed")
+    print(f"latency    p50 {summary['p50'] * 1000:.1f}ms  p90 {summary['p90'] * 1000:.1f}ms  "
+          f"p99 {summary['p99'] * 1000:.1f}ms  max {summary['max'] * 1000:.1f}ms")
+    print(f"limit      {'fixed' if args.fixed else 'adaptive'}: final {limits[-1]}, "
+          f"mean {sum(limits) / len(limits):.1f}, range {min(limits)}-{max(limits)}, "
+          f"{metrics.get('limiter.decreases')} decreases")
+    print("outcomes   " + ', '.join(f"{name[8:]} {value}" for name, value in sorted(metrics.counters.items())
+                                   if name.startswith('limiter.') and name != 'limiter.decreases'))
+    print(f"server     {profile.stats}")
+
+
+if __name__ == '__main__':
+    main()
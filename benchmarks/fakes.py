@@ -0,0 +1,150 @@
+"""In-process stand-ins for the Telegram Bot API and the translation backend.
+
+Used by the replay and load benchmarks so the full handler stack can run
+without network access.
+"""
+import asyncio
+import json
+import time
+import zlib
+from collections import Counter
+from telegram.ext import Application
+from telegram.request import BaseRequest
+
+BOT_USER = {
+    'id': 1, 'is_bot': True, 'first_name': 'TranslationBot', 'username': 'translation_bot',
+    'can_join_groups': True, 'can_read_all_group_messages': False, 'supports_inline_queries': False
+}
+
+
+def channel_id_for(username: str) -> int:
+    """Stable fake numeric id for a public @username."""
+    return -1000000000000 - zlib.crc32(username.lower().encode())
+
+
+def build_application(api=None, backend=None, send_rate=None, per_chat_interval=0.0, processor=None,
+                      application_class=None, token='0:bench', **handler_kwargs):
+    """The bot's handlers on an Application that talks to `api` (a FakeBotAPI by default).
+
+    Backend calls go to `backend` (e.g. a FakeTranslator) when given, else to
+    the configured translate service. Sends are paced at `send_rate` per second,
+    or not at all when it is None. `handler_kwargs` go to CommandHandler.
+    Returns (application, handler); the application is not initialized.
+    """
+    # Imported here so config picks up environment set by the caller
+    from bot import register_handlers
+    from handlers import CommandHandler
+    from sender import PacedSender
+
+    builder = Application.builder().token(token).request(api or FakeBotAPI()).updater(None)
+    if application_class is not None:
+        builder = builder.application_class(application_class)
+    if processor is not None:
+        builder = builder.concurrent_updates(processor)
+    application = builder.build()
+    handler = CommandHandler(**handler_kwargs)
+    if backend is not None:
+        handler.translator.translator = backend
+    if send_rate is None:
+        handler.sender = PacedSender(rate=10 ** 9, burst=1, per_chat_interval=0.0)
+    else:
+        handler.sender = PacedSender(rate=send_rate, per_chat_interval=per_chat_interval)
+    register_handlers(application, handler)
+    return application, handler
+
+
+class FakeBotAPI(BaseRequest):
+    """Answers Bot API calls locally with plausible results after `latency` seconds."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_id = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def read_timeout(self):
+        return None
+
+    def _message(self, params):
+        self._message_id += 1
+        chat_id = params.get('chat_id', 0)
+        return {
+            'message_id': params.get('message_id', self._message_id),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id) if str(chat_id).lstrip('-').isdigit() else 0, 'type': 'private'},
+            'text': params.get('text', '')
+        }
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        endpoint = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if endpoint == 'getMe':
+            result = BOT_USER
+        elif endpoint == 'getChat':
+            chat_ref = str(params.get('chat_id'))
+            chat_id = channel_id_for(chat_ref) if chat_ref.startswith('@') else int(chat_ref)
+            result = {
+                'id': chat_id, 'type': 'channel', 'title': f"Channel {chat_ref}",
+                'username': chat_ref[1:] if chat_ref.startswith('@') else None,
+                'accent_color_id': 0, 'max_reaction_count': 11
+            }
+        elif endpoint in ('sendMessage', 'editMessageText'):
+            result = self._message(params)
+        elif endpoint == 'copyMessage':
+            self._message_id += 1
+            result = {'message_id': self._message_id}
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def prefix_language(text: str) -> str:
+    """Fake detection: text starting with "<code>:" is in that language, anything else is English."""
+    prefix, sep, _ = text.partition(':')
+    return prefix if sep and 2 <= len(prefix) <= 5 and prefix.isalpha() else 'en'
+
+
+class _Detected:
+    __slots__ = ('lang', 'confidence')
+
+    def __init__(self, lang):
+        self.lang = lang
+        self.confidence = 1.0
+
+
+class _Translated:
+    __slots__ = ('text', 'src', 'dest')
+
+    def __init__(self, text, src, dest):
+        self.text = text
+        self.src = src
+        self.dest = dest
+
+
+class FakeTranslator:
+    """Blocking googletrans stand-in; detection follows prefix_language()."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+
+    def detect(self, text):
+        self.calls['detect'] += 1
+        time.sleep(self.latency)
+        return _Detected(prefix_language(text))
+
+    def translate(self, text, dest='en', src='auto'):
+        self.calls['translate'] += 1
+        time.sleep(self.latency)
+        src = prefix_language(text) if src == 'auto' else src
+        return _Translated(f"[{dest}] {text}", src, dest)
@@ -0,0 +1,232 @@
+"""Replay a recorded update stream against the full bot handler stack.
+
+Record production traffic with RECORD_UPDATES_FILE=updates.jsonl.gz, then
+replay it offline. The Bot API and googletrans are replaced by the local
+fakes in benchmarks/fakes.py; user data lives in a temporary directory.
+
+Usage: python benchmarks/replay_updates.py updates.jsonl.gz [--speed 1|10|0]
+       python benchmarks/replay_updates.py synthetic.jsonl.gz --generate 20000
+
+--speed 0 replays as fast as the handlers accept updates.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update  # noqa: E402
+from telegram.ext import Application  # noqa: E402
+from fakes import FakeBotAPI, FakeTranslator, build_application, channel_id_for  # noqa: E402
+from metrics import Histogram  # noqa: E402
+from recorder import read_recording  # noqa: E402
+
+LANGUAGES = ['vi', 'en', 'ja', 'ko']
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        # No procfs: fall back to the peak, which is all getrusage offers
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+class ReplayApplication(Application):
+    """Application that reports when each update has been fully handled."""
+
+    async def process_update(self, update):
+        try:
+            await super().process_update(update)
+        finally:
+            self.replay_done(update.update_id)
+
+
+def generate(path, count, users, channels, rate, seed=1):
+    """Write a synthetic recording: onboarding commands, then a mix of posts, DMs and clicks."""
+    rng = random.Random(seed)
+    usernames = [f"@channel{i}" for i in range(channels)]
+    update_id = 0
+    offset = 0.0
+
+    def private(user_id, text, command=False):
+        message = {
+            'message_id': update_id, 'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+            'text': text
+        }
+        if command:
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'message': message}
+
+    def click(user_id, data):
+        return {'callback_query': {
+            'id': str(update_id), 'chat_instance': 'replay', 'data': data,
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+            'message': {'message_id': 1, 'date': int(time.time()),
+                        'chat': {'id': user_id, 'type': 'private'}, 'text': 'settings'}
+        }}
+
+    def channel_post(username, text):
+        return {'channel_post': {
+            'message_id': update_id, 'date': int(time.time()),
+            'chat': {'id': channel_id_for(username), 'type': 'channel', 'title': username[1:]},
+            'text': text
+        }}
+
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        def write(data):
+            nonlocal update_id, offset
+            update_id += 1
+            data['update_id'] = update_id
+            offset += rng.expovariate(rate)
+            f.write(json.dumps([round(offset, 3), data], separators=(',', ':')) + '\n')
+
+        for user_id in range(1, users + 1):
+            write(private(user_id, '/start', command=True))
+            write(click(user_id, f"setlang:{rng.choice(LANGUAGES)}"))
+            for username in rng.sample(usernames, min(3, channels)):
+                write(private(user_id, f"/sub {username}", command=True))
+
+        for i in range(max(0, count - update_id)):
+            roll = rng.random()
+            if roll < 0.6:
+                lang = rng.choice(LANGUAGES)
+                write(channel_post(rng.choice(usernames), f"{lang}: post {i}\nsecond line\nthird line"))
+            elif roll < 0.9:
+                write(private(rng.randint(1, users), f"{rng.choice(LANGUAGES)}: hello {i}"))
+            elif roll < 0.97:
+                write(private(rng.randint(1, users), '/list', command=True))
+            else:
+                write(click(rng.randint(1, users), f"setlang:{rng.choice(LANGUAGES)}"))
+    print(f"Wrote {update_id} synthetic updates to {path}")
+
+
+async def replay(args):
+    # Imported here so config and storage pick up the temporary working directory
+    from config import SEND_PER_CHAT_INTERVAL
+
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    bot_api = FakeBotAPI(latency=args.api_latency)
+    translator = FakeTranslator(latency=args.translate_latency)
+    application, handler = build_application(
+        bot_api, translator, send_rate=args.send_rate if args.send_rate > 0 else None,
+        per_chat_interval=SEND_PER_CHAT_INTERVAL, application_class=ReplayApplication, token='0:replay'
+    )
+
+    handler_errors = 0
+
+    async def on_error(update, context):
+        nonlocal handler_errors
+        handler_errors += 1
+
+    application.add_error_handler(on_error)
+
+    scheduled = {}
+    latency = Histogram(size=10 ** 6)
+    remaining = 0
+    drained = asyncio.Event()
+
+    def replay_done(update_id):
+        nonlocal remaining
+        latency.observe(time.perf_counter() - scheduled.pop(update_id))
+        remaining -= 1
+        if remaining == 0 and feeding_done:
+            drained.set()
+
+    application.replay_done = replay_done
+
+    await application.initialize()
+    await application.start()
+    rss_start = rss_mb()
+    rss_samples = []
+
+    feeding_done = False
+    count = 0
+    start = time.perf_counter()
+    for offset, data in read_recording(args.recording):
+        if args.speed > 0:
+            delay = start + offset / args.speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        update = Update.de_json(data, application.bot)
+        scheduled[update.update_id] = time.perf_counter()
+        remaining += 1
+        count += 1
+        await application.update_queue.put(update)
+        if count % 1000 == 0:
+            rss_samples.append(rss_mb())
+            # Do not let --speed 0 build an unbounded backlog in the queue
+            while application.update_queue.qsize() > 1000:
+                await asyncio.sleep(0.01)
+    feeding_done = True
+    if remaining:
+        await drained.wait()
+    while handler.background_tasks:
+        await asyncio.gather(*handler.background_tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    rss_end = rss_mb()
+
+    await application.stop()
+    await application.shutdown()
+    handler.translator.executor.shutdown()
+
+    summary = latency.summary()
+    print(f"updates        {count} in {elapsed:.2f}s ({count / elapsed:.0f}/s)")
+    print(f"latency        p50 {summary['p50'] * 1000:.1f}ms  p90 {summary['p90'] * 1000:.1f}ms  "
+          f"p99 {summary['p99'] * 1000:.1f}ms  max {summary['max'] * 1000:.1f}ms")
+    print(f"errors         {handler_errors} raised by handlers, {errors.count} logged")
+    print(f"rss            {rss_start:.1f}MB -> {rss_end:.1f}MB ({rss_end - rss_start:+.1f}MB), "
+          f"peak sample {max(rss_samples + [rss_end]):.1f}MB")
+    print(f"bot api calls  {dict(bot_api.calls.most_common())}")
+    print(f"backend calls  {dict(translator.calls)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('recording')
+    parser.add_argument('--speed', type=float, default=1.0, help='1 = real time, N = N times faster, 0 = max')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='fake Bot API latency in seconds')
+    parser.add_argument('--translate-latency', type=float, default=0.0, help='fake backend latency in seconds')
+    parser.add_argument('--send-rate', type=float, default=0.0,
+                        help='outbound messages per second as in production; 0 = unpaced')
+    parser.add_argument('--generate', type=int, metavar='N', help='write N synthetic updates first')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--channels', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=50.0, help='synthetic arrivals per second')
+    args = parser.parse_args()
+
+    args.recording = os.path.abspath(args.recording)
+    if args.generate:
+        generate(args.recording, args.generate, args.users, args.channels, args.rate)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        asyncio.run(replay(args))
+
+
+if __name__ == '__main__':
+    main()
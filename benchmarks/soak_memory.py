@@ -0,0 +1,157 @@
+"""Long-run memory soak: pushes synthetic updates through the bot handlers.
+
+Reports RSS and the size of every budgeted structure (CommandHandler.memory)
+as it goes, and exits non-zero if a structure ends over its budget or RSS
+grows by more than --rss-growth-mb after warm-up.
+
+Usage: python benchmarks/soak_memory.py [--updates 1000000] [--users 100000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update  # noqa: E402
+from fakes import FakeTranslator, build_application, channel_id_for  # noqa: E402
+from replay_updates import rss_mb  # noqa: E402
+
+LANGUAGES = ['vi', 'en', 'ja', 'ko']
+
+
+class Workload:
+    """Endless mix of channel posts, edits, DMs, forwards and commands from a large user space."""
+
+    def __init__(self, users, channels, rng):
+        self.users = users
+        self.channels = [channel_id_for(f"@soak{i}") for i in range(channels)]
+        self.rng = rng
+        self.update_id = 0
+        self.posts = []
+
+    def _private(self, user_id, text, **extra):
+        message = {
+            'message_id': self.update_id, 'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'soak'},
+            'text': text, **extra
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'message': message}
+
+    def next(self):
+        self.update_id += 1
+        rng = self.rng
+        roll = rng.random()
+        # Most DMs come from users the bot has never seen, which is what grows per-user state
+        user_id = rng.randint(1, self.users * 10)
+        if roll < 0.5:
+            chat_id = rng.choice(self.channels)
+            message_id = self.update_id
+            self.posts.append((chat_id, message_id))
+            if len(self.posts) > 1000:
+                self.posts.pop(0)
+            data = {'channel_post': {
+                'message_id': message_id, 'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'channel', 'title': 'Soak'},
+                'text': f"{rng.choice(LANGUAGES)}: post {message_id}\nline two"
+            }}
+        elif roll < 0.55 and self.posts:
+            chat_id, message_id = rng.choice(self.posts)
+            data = {'edited_channel_post': {
+                'message_id': message_id, 'date': int(time.time()), 'edit_date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'channel', 'title': 'Soak'},
+                'text': f"en: post {message_id} (edited)\nline two"
+            }}
+        elif roll < 0.85:
+            data = self._private(user_id, f"{rng.choice(LANGUAGES)}: hello {self.update_id}")
+        elif roll < 0.95:
+            data = self._private(user_id, f"ja: forwarded {self.update_id}", forward_origin={
+                'type': 'channel', 'date': int(time.time()), 'message_id': 1,
+                'chat': {'id': rng.choice(self.channels), 'type': 'channel', 'title': 'Other'}
+            })
+        else:
+            data = self._private(rng.randint(1, self.users), '/list')
+        data['update_id'] = self.update_id
+        return data
+
+
+def seed_users(storage, users, channels, rng):
+    """Pre-load subscribed users directly; going through /sub would rewrite the JSON file each time."""
+    channel_ids = [str(channel_id_for(f"@soak{i}")) for i in range(channels)]
+    storage.load_users({
+        str(uid): {
+            'target_language': rng.choice(LANGUAGES),
+            'subscribed_channels': rng.sample(channel_ids, 2) if uid % 500 == 0 else [],
+            'notifications_enabled': uid % 7 != 0,
+            'digest_enabled': uid % 11 == 0
+        }
+        for uid in range(1, users + 1)
+    })
+
+
+async def soak(args):
+    rng = random.Random(1)
+    application, handler = build_application(backend=FakeTranslator(), token='0:soak')
+    seed_users(handler.storage, args.users, args.channels, rng)
+    await application.initialize()
+
+    workload = Workload(args.users, args.channels, rng)
+    baseline = None
+    start = time.perf_counter()
+    for i in range(1, args.updates + 1):
+        await application.process_update(Update.de_json(workload.next(), application.bot))
+        if len(handler.background_tasks) > 200:
+            await asyncio.gather(*handler.background_tasks, return_exceptions=True)
+        if i % args.digest_every == 0:
+            await handler.flush_digests(application.bot)
+        if i % args.report_every == 0:
+            rss = rss_mb()
+            if baseline is None:
+                baseline = rss
+            sizes = handler.memory.sizes()
+            print(f"{i:>9} updates {i / (time.perf_counter() - start):>6.0f}/s  rss {rss:7.1f}MB  " +
+                  " ".join(f"{name}={size}" for name, (size, _) in sizes.items()), flush=True)
+
+    await asyncio.gather(*handler.background_tasks, return_exceptions=True)
+    rss_end = rss_mb()
+    await application.shutdown()
+    handler.translator.executor.shutdown()
+
+    failures = [f"{name} over budget ({size}/{budget})"
+                for name, (size, budget) in handler.memory.sizes().items() if size > budget]
+    growth = rss_end - (baseline if baseline is not None else rss_end)
+    if growth > args.rss_growth_mb:
+        failures.append(f"RSS grew {growth:.1f}MB after warm-up (budget {args.rss_growth_mb}MB)")
+    if baseline is not None:
+        print(f"RSS after warm-up {baseline:.1f}MB, at end {rss_end:.1f}MB")
+    else:
+        print(f"RSS at end {rss_end:.1f}MB (run shorter than --report-every, no growth check)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=100000, help='pre-loaded users in storage')
+    parser.add_argument('--channels', type=int, default=100)
+    parser.add_argument('--report-every', type=int, default=50000)
+    parser.add_argument('--digest-every', type=int, default=20000, help='updates between digest flushes')
+    parser.add_argument('--rss-growth-mb', type=float, default=64.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        sys.exit(asyncio.run(soak(args)))
+
+
+if __name__ == '__main__':
+    main()
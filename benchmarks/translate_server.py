@@ -0,0 +1,198 @@
+"""Local stand-in for the Google Translate endpoint googletrans talks to.
+
+Serves the batchexecute RPC with the same wire format, so the real
+googletrans client, httpx connection pool, timeouts and our retry code run
+unchanged. Latency, errors, throttling and payload limits are configurable.
+
+Usage: python benchmarks/translate_server.py [--port 8089] [--latency lognormal:0.15,0.5]
+                                             [--error-rate 0.01] [--rate-limit 50 --burst 20] [--capacity 8]
+Then start the bot or a benchmark with TRANSLATE_SERVICE_URL=http://127.0.0.1:8089
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import prefix_language  # noqa: E402
+
+RPC_PATH = '/_/TranslateWebserverUi/data/batchexecute'
+RPC_ID = 'MkEWBc'
+
+
+def latency_sampler(spec: str):
+    """Parse 'fixed:S', 'uniform:A,B', 'exponential:MEAN' or 'lognormal:MEDIAN,SIGMA' (seconds)."""
+    kind, _, values = spec.partition(':')
+    params = [float(v) for v in values.split(',')] if values else []
+    rng = random.Random()
+    if kind == 'fixed':
+        return lambda: params[0]
+    if kind == 'uniform':
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == 'exponential':
+        return lambda: rng.expovariate(1.0 / params[0])
+    if kind == 'lognormal':
+        return lambda: rng.lognormvariate(math.log(params[0]), params[1])
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+class Profile:
+    """Behaviour of the stand-in server plus counters of what it did."""
+
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0, hang_rate: float = 0.0,
+                 rate_limit: float = 0.0, burst: int = 10, max_chars: int = 5000, capacity: int = 0):
+        self.latency = latency_sampler(latency)
+        # Requests served at once; the rest queue, so latency grows with load
+        self.capacity = threading.BoundedSemaphore(capacity) if capacity else None
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.max_chars = max_chars
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'ok': 0, 'throttled': 0, 'errors': 0, 'hung': 0,
+                      'too_large': 0, 'max_in_flight': 0}
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def take_token(self) -> bool:
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def rpc_response(text: str, src: str, dest: str) -> bytes:
+    """Body in the shape googletrans.Translator.translate parses."""
+    parsed = [
+        [None, None, src],
+        [[[None, None, None, True, None, [[text, None]]]], dest],
+        src
+    ]
+    envelope = json.dumps([["wrb.fr", RPC_ID, json.dumps(parsed), None, None, None, "generic"],
+                           ["di", 12], ["af.httprm", 11, "", 1]], separators=(',', ':'))
+    return f")]}}'\n\n{len(envelope)}\n{envelope}\n".encode()
+
+
+class TranslateHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    profile: Profile = None
+
+    def log_message(self, format, *args):
+        return
+
+    def _reply(self, status: int, body: bytes = b'', content_type: str = 'application/json') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._reply(200, json.dumps(self.profile.stats).encode())
+        else:
+            self._reply(404)
+
+    def do_POST(self):
+        profile = self.profile
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.startswith(RPC_PATH):
+            self._reply(404)
+            return
+
+        profile.count('requests')
+        if not profile.take_token():
+            profile.count('throttled')
+            self._reply(429, b'Too Many Requests', 'text/plain')
+            return
+
+        with profile._lock:
+            profile.in_flight += 1
+            profile.stats['max_in_flight'] = max(profile.stats['max_in_flight'], profile.in_flight)
+        try:
+            roll = random.random()
+            if roll < profile.hang_rate:
+                # Far longer than any sane client timeout
+                profile.count('hung')
+                time.sleep(300)
+                return
+            if profile.capacity is not None:
+                with profile.capacity:
+                    time.sleep(max(0.0, profile.latency()))
+            else:
+                time.sleep(max(0.0, profile.latency()))
+            if roll < profile.hang_rate + profile.error_rate:
+                profile.count('errors')
+                self._reply(500, b'Internal Server Error', 'text/plain')
+                return
+
+            request = json.loads(parse_qs(body.decode())['f.req'][0])
+            text, src, dest = json.loads(request[0][0][1])[0][:3]
+            if len(text) > profile.max_chars:
+                profile.count('too_large')
+                self._reply(413, b'Payload Too Large', 'text/plain')
+                return
+
+            if src == 'auto':
+                src = prefix_language(text)
+            profile.count('ok')
+            self._reply(200, rpc_response(f"[{dest}] {text}", src, dest), 'application/json; charset=utf-8')
+        finally:
+            with profile._lock:
+                profile.in_flight -= 1
+
+
+def start_server(profile: Profile, host: str = '127.0.0.1', port: int = 0):
+    """Serve `profile` on a daemon thread; returns the server (server.server_address has the port)."""
+    handler = type('ProfiledTranslateHandler', (TranslateHandler,), {'profile': profile})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='translate-server', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', default='fixed:0', help="fixed:S | uniform:A,B | exponential:MEAN | "
+                                                            "lognormal:MEDIAN,SIGMA")
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction answered with HTTP 500')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='fraction that never answer')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests/s before HTTP 429; 0 = off')
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--max-chars', type=int, default=5000, help='longer texts get HTTP 413')
+    parser.add_argument('--capacity', type=int, default=0, help='requests served at once, others queue; 0 = no cap')
+    args = parser.parse_args()
+
+    profile = Profile(args.latency, args.error_rate, args.hang_rate, args.rate_limit, args.burst, args.max_chars,
+                      args.capacity)
+    server = start_server(profile, args.host, args.port)
+    print(f"Translate stand-in listening on http://{args.host}:{server.server_address[1]} (GET /stats for counters)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
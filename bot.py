@@ -1,16 +1,182 @@
+import asyncio
 import logging
-import nest_asyncio
 import os
 import signal
-import sys
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
-from config import TOKEN
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, TypeHandler
+from config import (
+    TOKEN, PROFILE_DEFAULT_SECONDS, RECORD_UPDATES_FILE, SHUTDOWN_DRAIN_SECONDS, EVENT_LOOP,
+    TRANSLATE_CACHE_SNAPSHOT_FILE, TRANSLATE_CACHE_SNAPSHOT_ENTRIES, TRANSLATE_CACHE_SNAPSHOT_INTERVAL,
+    TRANSLATE_CACHE_WARMUP_SECONDS, BOT_TOKENS_SPEC, USER_DATA_FILE, CHANNEL_DATA_FILE, UPDATE_STATE_FILE
+)
 from handlers import CommandHandler as BotCommandHandler
+from instrumentation import InstrumentedRequest, profiler
+from offsets import OffsetTracker
+from recorder import UpdateRecorder
+from storage import Storage
+from tenants import parse_bot_tokens, tenant_context, tenant_file
+from translator import TranslationService
+from update_processor import ChatOrderedUpdateProcessor
 from utils import setup_logging
 from keep_alive import keep_alive
 
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
+logger = logging.getLogger(__name__)
+
+
+def register_handlers(application: Application, handler: BotCommandHandler) -> None:
+    """Attach every bot handler; shared by the bot and the replay benchmark."""
+    # Register command handlers
+    logger.info("Registering command handlers...")
+    application.add_handler(CommandHandler("start", handler.start))
+    application.add_handler(CommandHandler("help", handler.help))
+    application.add_handler(CommandHandler("subscribe", handler.subscribe))
+    application.add_handler(CommandHandler("sub", handler.subscribe))  # Short version
+    application.add_handler(CommandHandler("unsubscribe", handler.unsubscribe))
+    application.add_handler(CommandHandler("unsub", handler.unsubscribe))  # Short version
+    application.add_handler(CommandHandler("list", handler.list_subscriptions))
+    application.add_handler(CommandHandler("settings", handler.settings))
+    application.add_handler(CommandHandler("stats", handler.stats))  # Admin only
+    application.add_handler(CommandHandler("profile", handler.profile))  # Admin only
+    logger.info("Command handlers registered successfully")
+
+    # Register message handler for both private messages and channel posts
+    logger.info("Registering message handlers...")
+    # Must come first: the generic handler below would also match channel edits
+    application.add_handler(MessageHandler(
+        filters.UpdateType.EDITED_CHANNEL_POST,
+        handler.handle_edited_channel_post
+    ))
+    application.add_handler(MessageHandler(
+        (filters.TEXT & ~filters.COMMAND) | filters.ChatType.CHANNEL,
+        handler.handle_message
+    ))
+    logger.info("Message handlers registered successfully")
+
+    # Register callback query handlers
+    logger.info("Registering callback query handlers...")
+    application.add_handler(CallbackQueryHandler(
+        handler.handle_subscribe_button,
+        pattern="^subscribe:"
+    ))
+    application.add_handler(CallbackQueryHandler(
+        handler.handle_unsubscribe_button,
+        pattern="^unsubscribe:"
+    ))
+    application.add_handler(CallbackQueryHandler(
+        handler.handle_language_button,
+        pattern="^setlang:"
+    ))
+    application.add_handler(CallbackQueryHandler(
+        handler.handle_digest_button,
+        pattern="^setdigest:"
+    ))
+    application.add_handler(CallbackQueryHandler(
+        handler.handle_progressive_button,
+        pattern="^setprogressive:"
+    ))
+    application.add_handler(CallbackQueryHandler(
+        handler.handle_subscribe_help,
+        pattern="^subscribe_help$"
+    ))
+    application.add_handler(CallbackQueryHandler(
+        handler.handle_back_to_sub,
+        pattern="^back_to_sub$"
+    ))
+    application.add_handler(CallbackQueryHandler(
+        handler.handle_translate_only,
+        pattern="^translate_only$"
+    ))
+    logger.info("Callback query handlers registered successfully")
+
+
+def loop_factory(name: str = EVENT_LOOP):
+    """Event loop constructor for asyncio.Runner: 'asyncio' or 'uvloop' (if installed)."""
+    if name == 'uvloop':
+        try:
+            import uvloop
+        except ImportError:
+            logger.warning("EVENT_LOOP=uvloop but uvloop is not installed; using asyncio")
+        else:
+            return uvloop.new_event_loop
+    return asyncio.new_event_loop
+
+
+class TenantBot:
+    """One bot token in the process: its application, handlers and files.
+
+    The translation service is passed in and shared by every bot.
+    """
+
+    def __init__(self, name: str, token: str, translator: TranslationService):
+        self.name = name
+        storage = Storage(tenant_file(name, USER_DATA_FILE), tenant_file(name, CHANNEL_DATA_FILE))
+        self.handler = BotCommandHandler(translator, storage, tenant=name)
+        self.recorder = UpdateRecorder(tenant_file(name, RECORD_UPDATES_FILE)) if RECORD_UPDATES_FILE else None
+        self.offsets = OffsetTracker(tenant_file(name, UPDATE_STATE_FILE))
+        self.background_tasks = []
+
+        self.application = (
+            Application.builder()
+            .token(token)
+            .request(InstrumentedRequest())
+            # Concurrent handlers; each chat's updates still run in arrival order
+            .concurrent_updates(ChatOrderedUpdateProcessor(tenant=name))
+            .build()
+        )
+        register_handlers(self.application, self.handler)
+        # Group -2 runs first: drops duplicates, paces the backlog, sets updates
+        # aside once shutdown starts; group 1 records the update as processed
+        self.application.add_handler(TypeHandler(Update, self.offsets.gate), group=-2)
+        self.application.add_handler(TypeHandler(Update, self.offsets.mark_done), group=1)
+        if self.recorder is not None:
+            # Group -1 runs before the real handlers and does not stop them
+            self.application.add_handler(TypeHandler(Update, self.recorder.record), group=-1)
+
+    async def start(self) -> None:
+        app, handler = self.application, self.handler
+        await app.initialize()
+        await handler.migrate_channel_refs(app.bot)
+        await self.offsets.resume(app)
+        for coro in (handler.run_digest_loop(app.bot), handler.run_admission_loop()):
+            self.background_tasks.append(asyncio.create_task(coro, context=tenant_context(self.name)))
+        # Updates that arrived while the bot was down are kept and caught up on
+        await app.updater.start_polling()
+        await app.start()
+        logger.info("Bot %s is running", self.name)
+
+    async def stop(self) -> None:
+        app = self.application
+        if app.updater.running:
+            await app.updater.stop()
+        if app.running:
+            await app.stop()
+            await self.post_stop()
+        await app.shutdown()
+
+    async def post_stop(self) -> None:
+        # Intake has stopped and queued updates were set aside by the offset gate;
+        # finish in-flight work within the deadline, then persist everything
+        app, handler = self.application, self.handler
+        deadline = asyncio.get_running_loop().time() + SHUTDOWN_DRAIN_SECONDS
+        for task in self.background_tasks:
+            task.cancel()
+        await handler.drain(SHUTDOWN_DRAIN_SECONDS)
+        self.offsets.set_aside_posts(handler.take_deferred_posts())
+        # Deliver whatever is still buffered instead of losing it
+        try:
+            await asyncio.wait_for(
+                handler.flush_digests(app.bot), max(0.0, deadline - asyncio.get_running_loop().time())
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown deadline reached before all digests of %s were sent", self.name)
+        self.offsets.save()
+        handler.storage.flush()
+        if handler.articles is not None:
+            await handler.articles.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        handler.delivery_latency.close()
+
 
 async def main():
     # Initialize logging first
@@ -25,95 +191,62 @@ async def main():
     logger.info("Initializing Telegram bot...")
 
     try:
-        # Initialize the bot
-        logger.info("Creating Application instance with token...")
-        application = Application.builder().token(TOKEN).build()
-        handler = BotCommandHandler()
-        logger.info("Bot handler initialized successfully")
-
-        # Register command handlers
-        logger.info("Registering command handlers...")
-        application.add_handler(CommandHandler("start", handler.start))
-        application.add_handler(CommandHandler("help", handler.help))
-        application.add_handler(CommandHandler("subscribe", handler.subscribe))
-        application.add_handler(CommandHandler("sub", handler.subscribe))  # Short version
-        application.add_handler(CommandHandler("unsubscribe", handler.unsubscribe))
-        application.add_handler(CommandHandler("unsub", handler.unsubscribe))  # Short version
-        application.add_handler(CommandHandler("list", handler.list_subscriptions))
-        application.add_handler(CommandHandler("settings", handler.settings))
-        logger.info("Command handlers registered successfully")
-
-        # Register message handler for both private messages and channel posts
-        logger.info("Registering message handlers...")
-        application.add_handler(MessageHandler(
-            (filters.TEXT & ~filters.COMMAND) | filters.ChatType.CHANNEL,
-            handler.handle_message
-        ))
-        logger.info("Message handlers registered successfully")
-
-        # Register callback query handlers
-        logger.info("Registering callback query handlers...")
-        application.add_handler(CallbackQueryHandler(
-            handler.handle_subscribe_button,
-            pattern="^subscribe:"
-        ))
-        application.add_handler(CallbackQueryHandler(
-            handler.handle_unsubscribe_button,
-            pattern="^unsubscribe:"
-        ))
-        application.add_handler(CallbackQueryHandler(
-            handler.handle_language_button,
-            pattern="^setlang:"
-        ))
-        application.add_handler(CallbackQueryHandler(
-            handler.handle_subscribe_help,
-            pattern="^subscribe_help$"
-        ))
-        application.add_handler(CallbackQueryHandler(
-            handler.handle_back_to_sub,
-            pattern="^back_to_sub$"
-        ))
-        application.add_handler(CallbackQueryHandler(
-            handler.handle_translate_only,
-            pattern="^translate_only$"
-        ))
-        logger.info("Callback query handlers registered successfully")
+        # Every bot shares one translation engine, cache and backend limit
+        translator = TranslationService()
+        logger.info("Creating Application instances...")
+        bots = [TenantBot(name, token, translator) for name, token in parse_bot_tokens(BOT_TOKENS_SPEC, TOKEN).items()]
+        logger.info("Bot handlers initialized successfully")
+        background_tasks = []
 
         # Start the bot
         logger.info("Starting bot polling...")
 
-        # Set up signal handlers for graceful shutdown
         PID_FILE = "/tmp/my_bot.pid" # Assuming a PID file location
 
-        def signal_handler(sig, frame):
-            logger.info("Received shutdown signal, cleaning up...")
-            # Remove PID file
-            if os.path.exists(PID_FILE):
-                os.remove(PID_FILE)
-            logger.info("Cleanup complete, exiting")
-            sys.exit(0)
-
-        # Register signal handlers
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
+        # SIGINT/SIGTERM stop intake and shut down through post_stop instead of
+        # exiting on the spot; SIGUSR1 starts the sampling profiler
+        loop = asyncio.get_running_loop()
+        stop_requested = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_requested.set)
+        loop.add_signal_handler(signal.SIGUSR1, profiler.start, PROFILE_DEFAULT_SECONDS)
 
+        # The same lifecycle as run_polling, but on this loop instead of one of its own
         try:
-            application.run_polling(drop_pending_updates=True)
+            # Reload the last hot set without holding up startup
+            background_tasks.append(asyncio.create_task(translator.warm_cache(
+                TRANSLATE_CACHE_SNAPSHOT_FILE, TRANSLATE_CACHE_WARMUP_SECONDS, TRANSLATE_CACHE_SNAPSHOT_ENTRIES
+            )))
+            background_tasks.append(asyncio.create_task(translator.run_cache_snapshots(
+                TRANSLATE_CACHE_SNAPSHOT_FILE, TRANSLATE_CACHE_SNAPSHOT_INTERVAL, TRANSLATE_CACHE_SNAPSHOT_ENTRIES
+            )))
+            for bot in bots:
+                await bot.start()
+            logger.info("%d bot(s) running on %s", len(bots), type(loop).__module__)
+            await stop_requested.wait()
+            logger.info("Stop requested, shutting down...")
         except Exception as e:
-            logger.error(f"Error in polling: {e}")
+            logger.error("Error in polling: %s", e)
         finally:
+            for task in background_tasks:
+                task.cancel()
+            await asyncio.gather(*(bot.stop() for bot in bots), return_exceptions=True)
+            try:
+                await translator.save_cache(TRANSLATE_CACHE_SNAPSHOT_FILE, TRANSLATE_CACHE_SNAPSHOT_ENTRIES)
+            except Exception as e:
+                logger.error("Could not save translation cache: %s", e)
             # Always clean up PID file
             if os.path.exists(PID_FILE):
                 os.remove(PID_FILE)
 
     except Exception as e:
-        logger.error(f"Error starting bot: {str(e)}")
+        logger.error("Error starting bot: %s", e)
         raise
 
 if __name__ == '__main__':
-    import asyncio
     try:
-        asyncio.run(main())
+        with asyncio.Runner(loop_factory=loop_factory()) as runner:
+            runner.run(main())
     except KeyboardInterrupt:
         print("Bot stopped by user")
     except Exception as e:
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from metrics import metrics
+
+
+class ChatInfo:
+    __slots__ = ('id', 'title', 'username', 'fetched')
+
+    def __init__(self, chat_id: int, title: Optional[str], username: Optional[str]):
+        self.id = chat_id
+        self.title = title
+        self.username = f"@{username}" if username else None
+        self.fetched = time.monotonic()
+
+
+class ChatCache:
+    """TTL cache in front of get_chat, addressable by numeric id or @username.
+
+    Concurrent lookups of the same chat share one Bot API call.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[str, ChatInfo]' = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _key(chat_ref) -> str:
+        return str(chat_ref).lower()
+
+    def get(self, chat_ref) -> Optional[ChatInfo]:
+        key = self._key(chat_ref)
+        info = self.entries.get(key)
+        if info is None:
+            return None
+        if time.monotonic() - info.fetched > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return info
+
+    def put(self, info: ChatInfo) -> None:
+        for key in (self._key(info.id), self._key(info.username) if info.username else None):
+            if key:
+                self.entries[key] = info
+                self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def resolve(self, bot, chat_ref) -> ChatInfo:
+        """Return chat metadata, calling get_chat only on a miss. Bot API errors propagate."""
+        info = self.get(chat_ref)
+        if info is not None:
+            metrics.incr("chat_cache.hits")
+            return info
+
+        key = self._key(chat_ref)
+        future = self._inflight.get(key)
+        if future is not None:
+            metrics.incr("chat_cache.hits")
+            return await asyncio.shield(future)
+
+        metrics.incr("chat_cache.misses")
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            chat = await bot.get_chat(chat_ref)
+            info = ChatInfo(chat.id, chat.title, chat.username)
+            self.put(info)
+            future.set_result(info)
+            return info
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a lookup nobody else waited on does not warn
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def resolve_many(self, bot, chat_refs: Iterable, concurrency: int) -> Dict[str, Optional[ChatInfo]]:
+        """Resolve a batch with bounded parallelism; unresolvable refs map to None."""
+        semaphore = asyncio.Semaphore(concurrency)
+        results: Dict[str, Optional[ChatInfo]] = {}
+
+        async def resolve_one(chat_ref):
+            async with semaphore:
+                try:
+                    results[chat_ref] = await self.resolve(bot, chat_ref)
+                except Exception as e:
+                    self.logger.warning("Could not resolve chat %s: %s", chat_ref, e)
+                    results[chat_ref] = None
+
+        await asyncio.gather(*(resolve_one(chat_ref) for chat_ref in chat_refs))
+        return results
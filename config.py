@@ -7,9 +7,196 @@ load_dotenv()
 # Telegram Bot Token
 TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', 'your-token-here')
 
+# Several bots in one process: BOT_TOKENS="name=token,name2=token2". Each bot has
+# its own handlers and keeps its users, channels and update offsets under
+# TENANT_DATA_DIR/<name>/; all of them share one translation engine, cache and
+# backend limit, with waiting work served round-robin between bots. Without
+# BOT_TOKENS, TELEGRAM_BOT_TOKEN runs a single bot with its files in the working
+# directory.
+BOT_TOKENS_SPEC = os.getenv('BOT_TOKENS', '')
+TENANT_DATA_DIR = 'tenants'
+
 # Rate limiting (messages per minute)
 RATE_LIMIT = 30
 
+# Telegram user ids allowed to run admin commands (/stats, /profile), comma separated
+ADMIN_USER_IDS = {
+    int(uid) for uid in os.getenv('ADMIN_USER_IDS', '').split(',') if uid.strip()
+}
+
+# Instrumentation: updates slower than this (seconds) are logged with a stage breakdown
+SLOW_UPDATE_THRESHOLD = float(os.getenv('SLOW_UPDATE_THRESHOLD', '2.0'))
+PROFILE_DIR = 'profiles'
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_DEFAULT_SECONDS = 30
+PROFILE_MAX_SECONDS = 300
+
+# Logging: records go through a queue to a background thread that writes a
+# rotating log file ('size' or 'time' rotation) in 'text' or 'json' format
+LOG_DIR = 'logs'
+LOG_FILE = 'telegram_bot.log'
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_ROTATION = os.getenv('LOG_ROTATION', 'size')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+LOG_QUEUE_SIZE = 10000
+# High-volume records (logged with extra=SAMPLED) are limited to a burst per window
+LOG_SAMPLE_BURST = 10
+LOG_SAMPLE_WINDOW = 60
+
+# Digest mode: buffered channel posts are sent as one message per interval (seconds)
+DIGEST_INTERVAL = int(os.getenv('DIGEST_INTERVAL', '1800'))
+DIGEST_MAX_POSTS = 50
+DIGEST_MAX_BUFFERED_POSTS = 20000
+
+# Linked articles (opt-in, ARTICLE_EXTRACTION=1): the first link in a channel post
+# is fetched (ARTICLE_FETCH_CONCURRENCY at once, ARTICLE_FETCH_TIMEOUT seconds,
+# ARTICLE_MAX_BYTES each), its main text extracted with trafilatura, and an
+# excerpt of up to ARTICLE_EXCERPT_CHARS translated and attached to the post.
+# Pages and translated excerpts are cached by URL for ARTICLE_CACHE_TTL seconds.
+ARTICLE_EXTRACTION = os.getenv('ARTICLE_EXTRACTION', '0') == '1'
+ARTICLE_FETCH_CONCURRENCY = 4
+ARTICLE_FETCH_TIMEOUT = 8.0
+ARTICLE_MAX_BYTES = 2 * 1024 * 1024
+ARTICLE_EXCERPT_CHARS = 600
+ARTICLE_CACHE_TTL = 6 * 3600
+ARTICLE_CACHE_MAX_ENTRIES = 2000
+
+# Per-channel language profile: once LANGUAGE_PROFILE_MIN_SAMPLES of the last
+# LANGUAGE_PROFILE_WINDOW detections agree by LANGUAGE_PROFILE_CONFIDENCE, channel
+# posts skip detection except for every LANGUAGE_PROFILE_SPOT_CHECK-th one
+LANGUAGE_PROFILE_WINDOW = 20
+LANGUAGE_PROFILE_MIN_SAMPLES = 5
+LANGUAGE_PROFILE_CONFIDENCE = 0.9
+LANGUAGE_PROFILE_SPOT_CHECK = 10
+
+# Translation backend: parallel worker slots, of which some are reserved for
+# interactive traffic (commands, buttons, DMs) so channel fan-out cannot starve it
+TRANSLATION_WORKERS = int(os.getenv('TRANSLATION_WORKERS', '8'))
+TRANSLATION_INTERACTIVE_RESERVED = int(os.getenv('TRANSLATION_INTERACTIVE_RESERVED', '3'))
+# The number of slots adapts between these bounds, starting at TRANSLATION_WORKERS:
+# +1 per round of successful requests, x TRANSLATION_BACKOFF on 429/5xx/timeouts,
+# x0.9 when responses get TRANSLATION_LATENCY_TOLERANCE times slower than usual
+TRANSLATION_MIN_WORKERS = 2
+TRANSLATION_MAX_WORKERS = int(os.getenv('TRANSLATION_MAX_WORKERS', '32'))
+TRANSLATION_BACKOFF = 0.7
+TRANSLATION_LATENCY_TOLERANCE = 2.0
+# Micro-batching: requests with the same source and target language arriving
+# within TRANSLATE_BATCH_WINDOW seconds are sent together, up to
+# TRANSLATE_BATCH_MAX_SIZE texts / TRANSLATE_BATCH_MAX_CHARS characters
+# (Google rejects requests over 5000). TRANSLATE_BATCH_MAX_SIZE=1 turns it off.
+TRANSLATE_BATCH_WINDOW = float(os.getenv('TRANSLATE_BATCH_WINDOW', '0.02'))
+TRANSLATE_BATCH_MAX_SIZE = int(os.getenv('TRANSLATE_BATCH_MAX_SIZE', '16'))
+TRANSLATE_BATCH_MAX_CHARS = 4000
+# Translation cache: translations and detected languages are reused for
+# TRANSLATE_CACHE_TTL seconds, up to TRANSLATE_CACHE_MAX_ENTRIES entries and
+# TRANSLATE_CACHE_MAX_CHARS characters of text (0 entries turns it off). The
+# TRANSLATE_CACHE_SNAPSHOT_ENTRIES most used are saved every
+# TRANSLATE_CACHE_SNAPSHOT_INTERVAL seconds and at shutdown, and loaded again in
+# the background at startup for at most TRANSLATE_CACHE_WARMUP_SECONDS.
+TRANSLATE_CACHE_MAX_ENTRIES = int(os.getenv('TRANSLATE_CACHE_MAX_ENTRIES', '20000'))
+TRANSLATE_CACHE_MAX_CHARS = 10 * 1000 * 1000
+TRANSLATE_CACHE_TTL = 24 * 3600
+TRANSLATE_CACHE_SNAPSHOT_FILE = 'translation_cache.jsonl.gz'
+TRANSLATE_CACHE_SNAPSHOT_ENTRIES = 5000
+TRANSLATE_CACHE_SNAPSHOT_INTERVAL = 600
+TRANSLATE_CACHE_WARMUP_SECONDS = 10.0
+# Points googletrans at another host instead of Google, e.g. the local stand-in
+# server (benchmarks/translate_server.py) for offline testing
+TRANSLATE_SERVICE_URL = os.getenv('TRANSLATE_SERVICE_URL')
+TRANSLATE_TIMEOUT = float(os.getenv('TRANSLATE_TIMEOUT', '5.0'))
+
+# Deadlines (seconds) per update kind, covering every stage of the update:
+# detection, translation including retries, and sending. Work still running when
+# the budget is spent is cancelled and the user gets a short "took too long"
+# reply, itself given DEADLINE_FALLBACK_TIMEOUT. 0 means no deadline; channel
+# fan-out is paced across all subscribers, so it has none by default.
+UPDATE_DEADLINES = {
+    'message': float(os.getenv('DEADLINE_MESSAGE', '15')),
+    'command': float(os.getenv('DEADLINE_COMMAND', '10')),
+    'callback_query': float(os.getenv('DEADLINE_CALLBACK_QUERY', '15')),
+    'channel_post': float(os.getenv('DEADLINE_CHANNEL_POST', '0')),
+}
+DEADLINE_FALLBACK_TIMEOUT = 5.0
+
+# Load shedding: thresholds for levels 1-3 (skip muted users, defer channel
+# fan-out, busy replies to DMs) on queued backend calls and backend latency (s)
+SHED_QUEUE_DEPTH = (50, 200, 500)
+SHED_LATENCY = (3.0, 6.0, 12.0)
+SHED_RECOVERY_SECONDS = 30
+SHED_DEFERRED_MAX_POSTS = 1000
+SHED_RESUME_BATCH = 10
+
+# Speculative translation of forwarded messages behind the "Translate this message" button
+SPECULATIVE_MAX_ENTRIES = 1000
+SPECULATIVE_TTL = 300
+
+# Outbound pacing (Telegram allows ~30 messages/s overall and ~1/s per chat)
+SEND_RATE_PER_SECOND = 25
+SEND_BURST = 5
+SEND_PER_CHAT_INTERVAL = 1.0
+SEND_MAX_TRACKED_CHATS = 10000
+
+# Channel posts remembered so edits can be applied to the delivered translations
+EDIT_TRACKING_MAX_POSTS = 5000
+EDIT_TRACKING_TTL = 48 * 3600
+
+# Channel metadata from get_chat; @usernames are resolved to numeric ids once
+CHAT_CACHE_TTL = 3600
+CHAT_CACHE_MAX_ENTRIES = 10000
+CHAT_RESOLVE_CONCURRENCY = 5
+
+# Memory budgets (entry counts) for long-lived structures; /stats memory and
+# benchmarks/soak_memory.py report sizes against them
+RATE_LIMIT_MAX_USERS = 100000
+MEMORY_MAX_USERS = int(os.getenv('MEMORY_MAX_USERS', '1000000'))
+MEMORY_MAX_CHANNELS = 100000
+MEMORY_MAX_BACKGROUND_TASKS = 10000
+MEMORY_MAX_METRIC_SERIES = 1000
+
+# Delivery latency from a channel publishing a post to subscribers receiving the
+# translation, per stage, language and channel (the DELIVERY_LATENCY_MAX_CHANNELS
+# most recently active ones); /stats delivery shows them. If DELIVERY_TRACE_FILE
+# is set, one gzipped JSON line of stage times is appended per post and language.
+DELIVERY_LATENCY_MAX_CHANNELS = 1000
+DELIVERY_LATENCY_SAMPLES = 256
+DELIVERY_TRACE_FILE = os.getenv('DELIVERY_TRACE_FILE')
+
+# Progressive delivery (opt-in per user in /settings): the original post is sent
+# right away and edited into the translation when it is ready. A translation not
+# ready PROGRESSIVE_TRANSLATION_TIMEOUT seconds after the original was sent is
+# not edited in; the original stays.
+PROGRESSIVE_TRANSLATION_TIMEOUT = float(os.getenv('PROGRESSIVE_TRANSLATION_TIMEOUT', '60'))
+
+# Append every incoming update to this gzipped JSON-lines file for offline replay
+# (benchmarks/replay_updates.py). Off unless set; recordings contain message text.
+RECORD_UPDATES_FILE = os.getenv('RECORD_UPDATES_FILE')
+
+# Graceful shutdown and restart: in-flight work gets SHUTDOWN_DRAIN_SECONDS to
+# finish; the update offset and unhandled updates are kept in UPDATE_STATE_FILE.
+# Messages and channel posts sent before the start time (minus a grace period)
+# are replayed at CATCHUP_RATE per second. Telegram starts update ids over from a
+# random value after a week without updates, so an older saved offset is dropped.
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv('SHUTDOWN_DRAIN_SECONDS', '20'))
+UPDATE_STATE_FILE = 'update_state.json'
+CATCHUP_RATE = 20
+CATCHUP_GRACE_SECONDS = 10
+UPDATE_ID_RESET_SECONDS = 7 * 24 * 3600
+
+# Updates handled at the same time; updates from one chat still run in order.
+# UPDATE_MAX_PENDING bounds updates in progress or waiting for their chat's turn.
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '16'))
+UPDATE_MAX_PENDING = 1000
+
+# Event loop the bot runs on: 'asyncio', or 'uvloop' when it is installed
+# (pip install uvloop)
+EVENT_LOOP = os.getenv('EVENT_LOOP', 'asyncio')
+
+# Storage changes within this many seconds are written together
+STORAGE_SAVE_DELAY = 2.0
+
 # Storage file paths
 USER_DATA_FILE = 'user_data.json'
 CHANNEL_DATA_FILE = 'channel_data.json'
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+from telegram import Update
+from config import UPDATE_DEADLINES, DEADLINE_FALLBACK_TIMEOUT
+from metrics import metrics
+from utils import send_timeout_message
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """Time budget of one update, shared by every stage that works on it."""
+
+    __slots__ = ('kind', 'expires', 'stage')
+
+    def __init__(self, kind: str, budget: float):
+        self.kind = kind
+        self.expires = time.monotonic() + budget
+        # Innermost stage that was cancelled, i.e. running when the budget ran out
+        self.stage: Optional[str] = None
+
+    def remaining(self) -> float:
+        return self.expires - time.monotonic()
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar('update_deadline', default=None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the update being handled, or None when it has no deadline.
+
+    Context variables follow the update into worker threads started with a
+    copied context, so blocking code (e.g. retries) can check it too.
+    """
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def note_cancelled(stage: str) -> None:
+    # Called by instrumentation.stage() when a stage is cancelled; cancellation
+    # unwinds from the innermost stage, which is the one charged if the
+    # deadline turns out to be the cause
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.stage is None:
+        deadline.stage = stage
+
+
+def with_deadline(kind: str):
+    """Run a handler within the UPDATE_DEADLINES budget for its update kind.
+
+    Work still running when the budget is spent is cancelled, the stage it
+    was in is counted, and users get a fallback reply instead.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            budget = UPDATE_DEADLINES.get(kind, 0)
+            if not budget or _current_deadline.get() is not None:
+                # No deadline, or a nested handler call: keep the outer budget
+                return await func(*args, **kwargs)
+
+            deadline = Deadline(kind, budget)
+            token = _current_deadline.set(deadline)
+            try:
+                async with asyncio.timeout(budget) as scope:
+                    return await func(*args, **kwargs)
+            except TimeoutError:
+                if not scope.expired():
+                    # Raised by the handler's own code, not by this deadline
+                    raise
+                stage = deadline.stage or 'handler'
+                metrics.incr("deadline.exceeded")
+                metrics.incr(f"deadline.exceeded.{kind}")
+                metrics.incr(f"deadline.exceeded.stage.{stage}")
+                logger.warning("%s ran out of its %.1fs budget in %s", func.__name__, budget, stage)
+            finally:
+                _current_deadline.reset(token)
+
+            update = next((arg for arg in args if isinstance(arg, Update)), None)
+            if update is not None:
+                try:
+                    await asyncio.wait_for(send_timeout_message(update), DEADLINE_FALLBACK_TIMEOUT)
+                except Exception as e:
+                    logger.error("Could not send deadline fallback reply: %s", e)
+            return None
+
+        return wrapper
+    return decorator
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+PostKey = Tuple[str, int]
+
+
+class DeliveredPost:
+    """A channel post and the translated copies we sent for it."""
+
+    __slots__ = ('channel_title', 'source_lang', 'source_verified', 'has_media', 'segments',
+                 'translations', 'deliveries', 'excerpts', 'created')
+
+    def __init__(self, channel_title: str, source_lang: str, source_verified: bool,
+                 has_media: bool, segments: List[str]):
+        self.channel_title = channel_title
+        self.source_lang = source_lang
+        # False when source_lang is only the channel's usual language, not checked for this post
+        self.source_verified = source_verified
+        self.has_media = has_media
+        self.segments = segments
+        # target language -> translated segments, aligned with self.segments
+        self.translations: Dict[str, List[str]] = {}
+        # (user id, message id, target language) of every copy sent
+        self.deliveries: List[Tuple[int, int, str]] = []
+        # target language -> translated excerpt of the linked article, if any
+        self.excerpts: Dict[str, str] = {}
+        self.created = time.monotonic()
+
+
+class DeliveryStore:
+    """Maps channel posts to delivered messages, bounded by count and age."""
+
+    def __init__(self, max_posts: int, ttl: float):
+        self.max_posts = max_posts
+        self.ttl = ttl
+        self.posts: 'OrderedDict[PostKey, DeliveredPost]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.posts)
+
+    def put(self, key: PostKey, post: DeliveredPost) -> None:
+        self.posts[key] = post
+        self.posts.move_to_end(key)
+        self._expire()
+
+    def discard(self, key: PostKey) -> None:
+        self.posts.pop(key, None)
+
+    def get(self, key: PostKey) -> Optional[DeliveredPost]:
+        self._expire()
+        return self.posts.get(key)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        while self.posts:
+            key, oldest = next(iter(self.posts.items()))
+            if len(self.posts) <= self.max_posts and oldest.created >= cutoff:
+                break
+            del self.posts[key]
+
+
+def split_segments(text: str) -> List[str]:
+    return text.split('\n')
+
+
+def reuse_translations(old_segments: List[str], new_segments: List[str],
+                       old_translated: List[str]) -> List[Optional[str]]:
+    """Align new segments with old ones; unchanged segments keep their translation.
+
+    Changed or inserted segments are left as None for the caller to translate.
+    """
+    result: List[Optional[str]] = [None] * len(new_segments)
+    matcher = SequenceMatcher(a=old_segments, b=new_segments, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            result[j1:j2] = old_translated[i1:i2]
+    return result
@@ -0,0 +1,144 @@
+import gzip
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from metrics import Histogram, metrics
+
+logger = logging.getLogger(__name__)
+
+FLUSH_EVERY = 100
+
+
+class PostTimeline:
+    """Wall-clock times (epoch seconds) of one channel post on its way to subscribers."""
+
+    __slots__ = ('channel_id', 'message_id', 'published', 'received', 'started', 'detected')
+
+    def __init__(self, channel_id: str, message_id: int, published: float, received: float,
+                 started: Optional[float] = None):
+        self.channel_id = channel_id
+        self.message_id = message_id
+        # Telegram's post date, whole seconds
+        self.published = published
+        self.received = received
+        # Fan-out start; until then the post was parked or behind the channel's previous post
+        self.started = started if started is not None else received
+        self.detected: Optional[float] = None
+
+
+class DeliveryLatency:
+    """Delivery latency from a channel publishing a post to each subscriber receiving it.
+
+    Stages per delivery: receive (publish to the update reaching the bot),
+    detect, translate (including the article excerpt), queue (parked under
+    load, behind the channel's previous post, other languages and earlier
+    recipients of the same post) and send (pacing wait plus the Bot API call).
+    End-to-end latency (until the translation is in front of the subscriber)
+    goes to `delivery.latency`, per language to `delivery.latency.lang.<code>`
+    and per channel to a histogram here, kept for the `max_channels` most
+    recently active channels. Time to the first message about the post goes to
+    `delivery.ttfb`; it is shorter than the latency for subscribers who get
+    the original first (progressive delivery) and the same for everyone else. Post dates have
+    one-second resolution, so short latencies read up to a second high.
+    """
+
+    def __init__(self, max_channels: int, samples: int, trace_path: Optional[str] = None):
+        self.max_channels = max_channels
+        self.samples = samples
+        self.channels: 'OrderedDict[str, Histogram]' = OrderedDict()
+        self.trace_path = trace_path
+        self._trace = gzip.open(trace_path, 'at', encoding='utf-8') if trace_path else None
+        self._pending = 0
+
+    def __len__(self) -> int:
+        return len(self.channels)
+
+    def _channel(self, channel_id: str) -> Histogram:
+        histogram = self.channels.get(channel_id)
+        if histogram is None:
+            histogram = self.channels[channel_id] = Histogram(self.samples)
+            if len(self.channels) > self.max_channels:
+                self.channels.popitem(last=False)
+        else:
+            self.channels.move_to_end(channel_id)
+        return histogram
+
+    def record_originals(self, timeline: PostTimeline, sent: List[float]) -> None:
+        """Record when the originals sent ahead of the translation arrived."""
+        for at in sent:
+            metrics.observe("delivery.ttfb", max(0.0, at - timeline.published))
+
+    def record(self, timeline: PostTimeline, language: str, translating: float, translated: float,
+               sends: List[Tuple[float, float]], progressive: int = 0) -> None:
+        """Record the (queued, sent) times of one post's deliveries in `language`.
+
+        `translating` and `translated` bound the translation for that language;
+        languages are handled one after another, so time before `translating`
+        was spent waiting on the others. The first `progressive` deliveries
+        edited an original already sent (see record_originals).
+        """
+        if not sends:
+            return
+        detected = timeline.detected if timeline.detected is not None else timeline.started
+        # Per post and language: the work every recipient waited on
+        metrics.observe("delivery.stage.receive", max(0.0, timeline.received - timeline.published))
+        metrics.observe("delivery.stage.detect", detected - timeline.started)
+        metrics.observe("delivery.stage.translate", translated - translating)
+
+        channel = self._channel(timeline.channel_id)
+        for i, (queued, sent) in enumerate(sends):
+            latency = max(0.0, sent - timeline.published)
+            if i >= progressive:
+                metrics.observe("delivery.ttfb", latency)
+            metrics.observe(
+                "delivery.stage.queue",
+                (timeline.started - timeline.received) + (translating - detected) + (queued - translated)
+            )
+            metrics.observe("delivery.stage.send", sent - queued)
+            metrics.observe("delivery.latency", latency)
+            metrics.observe(f"delivery.latency.lang.{language}", latency)
+            channel.observe(latency)
+
+        if self._trace is not None:
+            self._write_trace(timeline, language, detected, translating, translated, sends)
+
+    def _write_trace(self, timeline: PostTimeline, language: str, detected: float, translating: float,
+                     translated: float, sends: List[Tuple[float, float]]) -> None:
+        # One line per post and language: publish time, then seconds after it
+        # for received, fan-out start, detected, translation start and end,
+        # first queued, median and last sent, and the number of deliveries
+        published = timeline.published
+        sent = sorted(sent for _, sent in sends)
+        line = [
+            timeline.channel_id, timeline.message_id, language, published,
+            *(round(t - published, 3) for t in (
+                timeline.received, timeline.started, detected, translating, translated,
+                sends[0][0], sent[len(sent) // 2], sent[-1]
+            )),
+            len(sends)
+        ]
+        self._trace.write(json.dumps(line, separators=(',', ':')))
+        self._trace.write('\n')
+        self._pending += 1
+        if self._pending >= FLUSH_EVERY:
+            self._trace.flush()
+            self._pending = 0
+
+    def render(self, limit: int = 20) -> str:
+        """Channels with the slowest p99 delivery latency."""
+        rows: List[Tuple[float, str, Dict[str, float]]] = []
+        for channel_id, histogram in self.channels.items():
+            summary = histogram.summary()
+            rows.append((summary['p99'], channel_id, summary))
+        rows.sort(reverse=True)
+        lines = [f"channels tracked: {len(self.channels)}"]
+        for _, channel_id, s in rows[:limit]:
+            lines.append(f"{channel_id}: n={s['count']} p50={s['p50']:.1f}s p99={s['p99']:.1f}s max={s['max']:.1f}s")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+            logger.info("Delivery trace written to %s", self.trace_path)
@@ -0,0 +1,80 @@
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+PostKey = Tuple[str, int]
+
+
+class DigestPost:
+    __slots__ = ('channel_id', 'channel_title', 'text', 'has_media')
+
+    def __init__(self, channel_id: str, channel_title: str, text: str, has_media: bool):
+        self.channel_id = channel_id
+        self.channel_title = channel_title
+        self.text = text
+        self.has_media = has_media
+
+
+class DigestBuffer:
+    """Channel posts waiting to be delivered to digest users.
+
+    Each post is stored once no matter how many users are waiting for it;
+    users only hold the keys of their pending posts. Past `max_posts` the
+    oldest buffered post is dropped for everyone.
+    """
+
+    def __init__(self, max_posts_per_user: int, max_posts: int):
+        self.max_posts_per_user = max_posts_per_user
+        self.max_posts = max_posts
+        self.posts: Dict[PostKey, DigestPost] = {}
+        self.pending: Dict[int, Deque[PostKey]] = {}
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def add(self, key: PostKey, post: DigestPost, user_id: int) -> None:
+        if key not in self.posts:
+            if len(self.posts) >= self.max_posts:
+                del self.posts[next(iter(self.posts))]
+                self.dropped += 1
+            self.posts[key] = post
+        queue = self.pending.get(user_id)
+        if queue is None:
+            queue = self.pending[user_id] = deque(maxlen=self.max_posts_per_user)
+        elif len(queue) == queue.maxlen:
+            self.dropped += 1
+        queue.append(key)
+
+    def drain(self) -> Tuple[Dict[PostKey, DigestPost], Dict[int, Deque[PostKey]]]:
+        posts, pending = self.posts, self.pending
+        self.posts, self.pending = {}, {}
+        return posts, pending
+
+
+def group_recipients(pending: Dict[int, Deque[PostKey]],
+                     languages: Dict[int, str]) -> Dict[Tuple[str, Tuple[PostKey, ...]], List[int]]:
+    """Group users that would receive an identical digest (same language, same posts)."""
+    groups: Dict[Tuple[str, Tuple[PostKey, ...]], List[int]] = {}
+    for user_id, keys in pending.items():
+        groups.setdefault((languages[user_id], tuple(keys)), []).append(user_id)
+    return groups
+
+
+def split_message(entries: List[str], header: str, separator: str = "\n\n") -> List[str]:
+    """Pack digest entries into as few messages as Telegram's length limit allows."""
+    messages = []
+    current: List[str] = []
+    length = len(header)
+    for entry in entries:
+        entry = entry[:MAX_MESSAGE_LENGTH - len(header) - len(separator)]
+        if current and length + len(separator) + len(entry) > MAX_MESSAGE_LENGTH:
+            messages.append(header + "\n\n" + separator.join(current))
+            current, length = [], len(header)
+        current.append(entry)
+        length += len(separator) + len(entry)
+    if current:
+        messages.append(header + "\n\n" + separator.join(current))
+    return messages
@@ -3,16 +3,206 @@ from telegram.ext import ContextTypes, CallbackQueryHandler
 from telegram.error import BadRequest
 from storage import Storage
 from translator import TranslationService
-from utils import RateLimiter, send_error_message, validate_channel_id
+from utils import RateLimiter, send_error_message, validate_channel_id, is_admin, get_forward_chat, SAMPLED
+from instrumentation import timed_handler, stage, profiler
+from deadline import with_deadline
+from metrics import metrics
+from config import (
+    PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS, DIGEST_INTERVAL, DIGEST_MAX_POSTS,
+    EDIT_TRACKING_MAX_POSTS, EDIT_TRACKING_TTL, SHED_QUEUE_DEPTH, SHED_LATENCY,
+    SHED_RECOVERY_SECONDS, SHED_DEFERRED_MAX_POSTS, SHED_RESUME_BATCH, SPECULATIVE_MAX_ENTRIES,
+    SPECULATIVE_TTL, CHAT_CACHE_TTL, CHAT_CACHE_MAX_ENTRIES, CHAT_RESOLVE_CONCURRENCY,
+    DIGEST_MAX_BUFFERED_POSTS, RATE_LIMIT_MAX_USERS, SEND_MAX_TRACKED_CHATS, MEMORY_MAX_USERS,
+    MEMORY_MAX_CHANNELS, MEMORY_MAX_BACKGROUND_TASKS, MEMORY_MAX_METRIC_SERIES,
+    LANGUAGE_PROFILE_WINDOW, LANGUAGE_PROFILE_MIN_SAMPLES, LANGUAGE_PROFILE_CONFIDENCE,
+    LANGUAGE_PROFILE_SPOT_CHECK, ARTICLE_EXTRACTION, ARTICLE_FETCH_CONCURRENCY, ARTICLE_FETCH_TIMEOUT,
+    ARTICLE_MAX_BYTES, ARTICLE_EXCERPT_CHARS, ARTICLE_CACHE_TTL, ARTICLE_CACHE_MAX_ENTRIES,
+    DELIVERY_LATENCY_MAX_CHANNELS, DELIVERY_LATENCY_SAMPLES, DELIVERY_TRACE_FILE, TRANSLATE_CACHE_MAX_ENTRIES,
+    PROGRESSIVE_TRANSLATION_TIMEOUT
+)
+from digest import DigestBuffer, DigestPost, group_recipients, split_message
+from deliveries import DeliveredPost, DeliveryStore, split_segments, reuse_translations
+from sender import PacedSender
+from scheduler import INTERACTIVE, BULK
+from admission import AdmissionController, SKIP_MUTED, DEFER_BULK, BUSY_REPLIES
+from speculative import SpeculativeCache
+from chat_cache import ChatCache, ChatInfo
+from memory import MemoryBudgets
+from language_profile import ChannelLanguageProfiles
+from articles import ArticleFetcher, first_link
+from delivery_latency import DeliveryLatency, PostTimeline
+from tenants import DEFAULT_TENANT, tenant_context, tenant_file
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+import asyncio
 import logging
+import time
 
 class CommandHandler:
-    def __init__(self):
-        self.storage = Storage()
-        self.translator = TranslationService()
+    def __init__(self, translator: Optional[TranslationService] = None, storage: Optional[Storage] = None,
+                 tenant: str = DEFAULT_TENANT):
+        # Bots hosted in one process share the translator; everything else is per bot
+        self.tenant = tenant
+        self.storage = storage or Storage()
+        self.translator = translator or TranslationService()
         self.rate_limiter = RateLimiter(max_requests=30)
+        self.digest = DigestBuffer(max_posts_per_user=DIGEST_MAX_POSTS, max_posts=DIGEST_MAX_BUFFERED_POSTS)
+        self.deliveries = DeliveryStore(max_posts=EDIT_TRACKING_MAX_POSTS, ttl=EDIT_TRACKING_TTL)
+        self.sender = PacedSender()
+        self.background_tasks: Set[asyncio.Task] = set()
+        # Background work that must run one at a time per key, see _in_turn:
+        # a channel's posts in the order they arrived, a post's fan-out and then its edits
+        self._channel_tails: Dict[Hashable, asyncio.Future] = {}
+        self._post_tails: Dict[Hashable, asyncio.Future] = {}
+        self.admission = AdmissionController(
+            self.translator.queue_depth, self.translator.recent_latency,
+            SHED_QUEUE_DEPTH, SHED_LATENCY, SHED_RECOVERY_SECONDS
+        )
+        # Channel posts parked while overloaded, by (channel id, message id), in
+        # arrival order; channels with a parked post queue new posts behind it
+        self.deferred_posts: 'OrderedDict[Tuple[str, int], Tuple]' = OrderedDict()
+        self._deferred_per_channel: Dict[str, int] = {}
+        self.speculative = SpeculativeCache(max_entries=SPECULATIVE_MAX_ENTRIES, ttl=SPECULATIVE_TTL)
+        self.chat_cache = ChatCache(ttl=CHAT_CACHE_TTL, max_entries=CHAT_CACHE_MAX_ENTRIES)
+        self.language_profiles = ChannelLanguageProfiles(
+            self.storage, LANGUAGE_PROFILE_WINDOW, LANGUAGE_PROFILE_MIN_SAMPLES,
+            LANGUAGE_PROFILE_CONFIDENCE, LANGUAGE_PROFILE_SPOT_CHECK
+        )
+        self.articles = None
+        if ARTICLE_EXTRACTION:
+            self.articles = ArticleFetcher(
+                ARTICLE_FETCH_CONCURRENCY, ARTICLE_FETCH_TIMEOUT, ARTICLE_MAX_BYTES, ARTICLE_EXCERPT_CHARS,
+                ARTICLE_CACHE_TTL, ARTICLE_CACHE_MAX_ENTRIES
+            )
+        self.delivery_latency = DeliveryLatency(
+            DELIVERY_LATENCY_MAX_CHANNELS, DELIVERY_LATENCY_SAMPLES, tenant_file(tenant, DELIVERY_TRACE_FILE)
+        )
+        self.memory = MemoryBudgets()
+        self._register_memory_budgets()
         self.logger = logging.getLogger(__name__)
 
+    def _register_memory_budgets(self) -> None:
+        register = self.memory.register
+        register('storage.users', lambda: len(self.storage.users), MEMORY_MAX_USERS)
+        register('storage.channels', lambda: len(self.storage.subscribers), MEMORY_MAX_CHANNELS)
+        register('storage.channel_data', lambda: len(self.storage.channel_data), MEMORY_MAX_CHANNELS)
+        register('rate_limiter.users', lambda: len(self.rate_limiter), RATE_LIMIT_MAX_USERS)
+        register('digest.posts', lambda: len(self.digest.posts), DIGEST_MAX_BUFFERED_POSTS)
+        register('digest.users', lambda: len(self.digest.pending), MEMORY_MAX_USERS)
+        register('deliveries.posts', lambda: len(self.deliveries), EDIT_TRACKING_MAX_POSTS)
+        register('sender.chats', lambda: len(self.sender._chat_next), SEND_MAX_TRACKED_CHATS)
+        if self.translator.cache is not None:
+            register('translate_cache.entries', lambda: len(self.translator.cache), TRANSLATE_CACHE_MAX_ENTRIES)
+        register('speculative.entries', lambda: len(self.speculative), SPECULATIVE_MAX_ENTRIES)
+        register('chat_cache.entries', lambda: len(self.chat_cache), CHAT_CACHE_MAX_ENTRIES)
+        register('language_profile.channels', lambda: len(self.language_profiles), MEMORY_MAX_CHANNELS)
+        if self.articles is not None:
+            register('articles.entries', lambda: len(self.articles), ARTICLE_CACHE_MAX_ENTRIES)
+        register('delivery_latency.channels', lambda: len(self.delivery_latency), DELIVERY_LATENCY_MAX_CHANNELS)
+        register('deferred_posts', lambda: len(self.deferred_posts), SHED_DEFERRED_MAX_POSTS)
+        register('background_tasks', lambda: len(self.background_tasks), MEMORY_MAX_BACKGROUND_TASKS)
+        register('channel_tails', lambda: len(self._channel_tails), MEMORY_MAX_BACKGROUND_TASKS)
+        register('post_tails', lambda: len(self._post_tails), MEMORY_MAX_BACKGROUND_TASKS)
+        register('metrics.series', lambda: len(metrics.counters) + len(metrics.gauges) + len(metrics.histograms),
+                 MEMORY_MAX_METRIC_SERIES)
+
+    async def _detect_language(self, text: str, lane: str = INTERACTIVE):
+        with stage('detect_language'):
+            return await self.translator.detect_language_async(text, lane=lane)
+
+    async def _detect_channel_language(self, channel_id: str, text: str,
+                                       lane: str = INTERACTIVE) -> Tuple[Optional[str], bool]:
+        """Source language of a channel's text, and whether it was actually detected.
+
+        A confident channel language profile stands in for the detection call;
+        callers then let the backend auto-detect while translating.
+        """
+        language = self.language_profiles.guess(channel_id)
+        if language is not None:
+            metrics.incr("detect.avoided")
+            return language, False
+        language = await self._detect_language(text, lane=lane)
+        if language:
+            self.language_profiles.record(channel_id, language)
+        return language, True
+
+    async def _translate_text(self, text: str, target_lang: str, source_lang: str = None,
+                              lane: str = INTERACTIVE):
+        with stage('translate_text'):
+            return await self.translator.translate_text_async(
+                text, target_lang=target_lang, source_lang=source_lang, lane=lane
+            )
+
+    async def _translate_segments(self, segments: List[str], target_lang: str, source_lang: str = None,
+                                  lane: str = INTERACTIVE):
+        with stage('translate_text'):
+            return await self.translator.translate_segments_async(
+                segments, target_lang=target_lang, source_lang=source_lang, lane=lane
+            )
+
+    def _spawn(self, coro) -> asyncio.Task:
+        # Bulk work runs detached from the update loop, in a fresh context so it
+        # gets its own update trace
+        task = asyncio.create_task(coro, context=tenant_context(self.tenant))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    def _in_turn(self, coro, *lines: Tuple[Dict[Hashable, asyncio.Future], Hashable]):
+        """Wrap `coro` to start once the work queued before it in each of `lines` is done.
+
+        `lines` are (tails, key) pairs. The place in each line is taken now,
+        when this is called, not when the returned coroutine starts.
+        """
+        loop = asyncio.get_running_loop()
+        turns = []
+        for tails, key in lines:
+            done = loop.create_future()
+            turns.append((tails, key, tails.get(key), done))
+            tails[key] = done
+        return self._run_in_turn(coro, turns)
+
+    async def _run_in_turn(self, coro, turns) -> None:
+        try:
+            for _, _, previous, _ in turns:
+                if previous is not None:
+                    try:
+                        await asyncio.shield(previous)
+                    except asyncio.CancelledError:
+                        coro.close()
+                        raise
+            await coro
+        finally:
+            for tails, key, _, done in turns:
+                done.set_result(None)
+                if tails.get(key) is done:
+                    del tails[key]
+
+    async def _resolve_channel(self, bot, channel_ref: str) -> ChatInfo:
+        # Subscriptions are keyed by numeric id; the @username is kept as metadata
+        chat = await self.chat_cache.resolve(bot, channel_ref)
+        self.storage.set_channel_info(str(chat.id), chat.title, chat.username)
+        return chat
+
+    async def migrate_channel_refs(self, bot) -> None:
+        """Rewrite subscriptions stored as @username to numeric channel ids."""
+        refs = self.storage.legacy_channel_refs()
+        if not refs:
+            return
+        self.logger.info("Resolving %d channel usernames to numeric ids", len(refs))
+        resolved = await self.chat_cache.resolve_many(bot, refs, CHAT_RESOLVE_CONCURRENCY)
+        moved = 0
+        for channel_ref, chat in resolved.items():
+            if chat is not None:
+                self.storage.set_channel_info(str(chat.id), chat.title, chat.username)
+                moved += self.storage.rename_channel(channel_ref, str(chat.id))
+        self.logger.info(
+            "Migrated %d subscriptions, %d channel usernames left unresolved",
+            moved, sum(1 for chat in resolved.values() if chat is None)
+        )
+
+    @timed_handler
+    @with_deadline('command')
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             user_id = update.effective_user.id
@@ -33,19 +223,23 @@ class CommandHandler:
             )
             await update.message.reply_text(welcome_message)
         except Exception as e:
-            self.logger.error(f"Error in start command: {str(e)}")
+            self.logger.error("Error in start command: %s", e)
             await send_error_message(update, context, "❌ Không thể khởi động bot / Failed to start bot")
 
+    @timed_handler
+    @with_deadline('command')
     async def help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await self.start(update, context)
 
+    @timed_handler
+    @with_deadline('command')
     async def subscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             user_id = update.effective_user.id
-            self.logger.info(f"Subscribe command received from user {user_id}")
+            self.logger.info("Subscribe command received from user %s", user_id)
 
             if not await self.rate_limiter.check_rate_limit(user_id):
-                self.logger.warning(f"Rate limit exceeded for user {user_id}")
+                self.logger.warning("Rate limit exceeded for user %s", user_id)
                 await send_error_message(
                     update, 
                     context, 
@@ -70,10 +264,10 @@ class CommandHandler:
                 return
 
             channel_id = context.args[0]
-            self.logger.info(f"Attempting to subscribe to channel: {channel_id}")
+            self.logger.info("Attempting to subscribe to channel: %s", channel_id)
 
             if not validate_channel_id(channel_id):
-                self.logger.warning(f"Invalid channel ID format: {channel_id}")
+                self.logger.warning("Invalid channel ID format: %s", channel_id)
                 await send_error_message(
                     update, 
                     context, 
@@ -88,11 +282,11 @@ class CommandHandler:
 
             # Verify channel exists and bot has access
             try:
-                self.logger.info(f"Verifying access to channel {channel_id}")
-                chat = await context.bot.get_chat(channel_id)
-                self.logger.info(f"Successfully verified access to channel: {chat.title}")
+                self.logger.info("Verifying access to channel %s", channel_id)
+                chat = await self._resolve_channel(context.bot, channel_id)
+                self.logger.info("Successfully verified access to channel: %s", chat.title)
             except BadRequest as e:
-                self.logger.error(f"Failed to access channel {channel_id}: {str(e)}")
+                self.logger.error("Failed to access channel %s: %s", channel_id, e)
                 await send_error_message(
                     update, 
                     context, 
@@ -107,26 +301,28 @@ class CommandHandler:
                 )
                 return
 
-            self.logger.info(f"Adding channel subscription for user {user_id}: {channel_id}")
-            self.storage.add_channel_subscription(user_id, channel_id)
+            self.logger.info("Adding channel subscription for user %s: %s", user_id, chat.id)
+            self.storage.add_channel_subscription(user_id, str(chat.id))
 
             success_message = (
-                f"✅ Đăng ký thành công kênh {chat.title} ({channel_id})\n"
-                f"Successfully subscribed to {chat.title} ({channel_id})\n\n"
+                f"✅ Đăng ký thành công kênh {chat.title} ({chat.username or chat.id})\n"
+                f"Successfully subscribed to {chat.title} ({chat.username or chat.id})\n\n"
                 "🔄 Bot sẽ tự động dịch tin nhắn mới\n"
                 "Bot will automatically translate new messages"
             )
             await update.message.reply_text(success_message)
-            self.logger.info(f"Successfully subscribed user {user_id} to channel {channel_id}")
+            self.logger.info("Successfully subscribed user %s to channel %s", user_id, channel_id)
 
         except Exception as e:
-            self.logger.error(f"Error in subscribe command: {str(e)}")
+            self.logger.error("Error in subscribe command: %s", e)
             await send_error_message(
                 update, 
                 context, 
                 "❌ Không thể đăng ký kênh / Failed to subscribe to channel"
             )
 
+    @timed_handler
+    @with_deadline('command')
     async def unsubscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             if not update.effective_message:
@@ -148,7 +344,7 @@ class CommandHandler:
                     for channel in subscribed_channels:
                         keyboard.append([
                             InlineKeyboardButton(
-                                f"❌ {channel}",
+                                f"❌ {self.storage.channel_label(channel)}",
                                 callback_data=f"unsubscribe:{channel}"
                             )
                         ])
@@ -170,6 +366,7 @@ class CommandHandler:
                 )
                 return
 
+            channel_id = self.storage.resolve_channel_ref(channel_id)
             subscribed_channels = self.storage.get_subscribed_channels(user_id)
             if channel_id not in subscribed_channels:
                 await update.effective_message.reply_text(
@@ -179,19 +376,22 @@ class CommandHandler:
                 return
 
             self.storage.remove_channel_subscription(user_id, channel_id)
+            label = self.storage.channel_label(channel_id)
             await update.effective_message.reply_text(
-                f"✅ Đã hủy đăng ký kênh {channel_id}\n"
-                f"Successfully unsubscribed from {channel_id}"
+                f"✅ Đã hủy đăng ký kênh {label}\n"
+                f"Successfully unsubscribed from {label}"
             )
 
         except Exception as e:
-            self.logger.error(f"Error in unsubscribe command: {str(e)}")
+            self.logger.error("Error in unsubscribe command: %s", e)
             await send_error_message(
                 update, 
                 context, 
                 "❌ Không thể hủy đăng ký kênh / Failed to unsubscribe from channel"
             )
 
+    @timed_handler
+    @with_deadline('command')
     async def list_subscriptions(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             user_id = update.effective_user.id
@@ -206,18 +406,20 @@ class CommandHandler:
 
             message = (
                 "📋 Các kênh đã đăng ký / Your subscribed channels:\n\n" + 
-                "\n".join(f"• {channel}" for channel in subscribed_channels)
+                "\n".join(f"• {self.storage.channel_label(channel)}" for channel in subscribed_channels)
             )
             await update.message.reply_text(message)
 
         except Exception as e:
-            self.logger.error(f"Error in list command: {str(e)}")
+            self.logger.error("Error in list command: %s", e)
             await send_error_message(
                 update, 
                 context, 
                 "❌ Không thể hiển thị danh sách kênh / Failed to list subscriptions"
             )
 
+    @timed_handler
+    @with_deadline('callback_query')
     async def handle_subscribe_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             query = update.callback_query
@@ -227,6 +429,8 @@ class CommandHandler:
             # Format: "subscribe:channel_id"
             channel_id = query.data.split(':')[1]
             user_id = query.from_user.id
+            # The prompt is being replaced, its translate button is gone
+            self.speculative.cancel((query.message.chat_id, query.message.message_id))
 
             if not validate_channel_id(channel_id):
                 await query.edit_message_text(
@@ -235,19 +439,19 @@ class CommandHandler:
                 return
 
             try:
-                chat = await context.bot.get_chat(channel_id)
-                self.storage.add_channel_subscription(user_id, channel_id)
+                chat = await self._resolve_channel(context.bot, channel_id)
+                self.storage.add_channel_subscription(user_id, str(chat.id))
 
                 success_message = (
-                    f"✅ Đăng ký thành công kênh {chat.title} ({channel_id})\n"
-                    f"Successfully subscribed to {chat.title} ({channel_id})\n\n"
+                    f"✅ Đăng ký thành công kênh {chat.title} ({chat.username or chat.id})\n"
+                    f"Successfully subscribed to {chat.title} ({chat.username or chat.id})\n\n"
                     "🔄 Bot sẽ tự động dịch tin nhắn mới\n"
                     "Bot will automatically translate new messages"
                 )
                 await query.edit_message_text(success_message)
 
             except BadRequest as e:
-                self.logger.error(f"Failed to access channel {channel_id}: {str(e)}")
+                self.logger.error("Failed to access channel %s: %s", channel_id, e)
                 await query.edit_message_text(
                     "❌ Không thể truy cập kênh. Vui lòng kiểm tra:\n"
                     "1. ID kênh chính xác\n"
@@ -260,36 +464,37 @@ class CommandHandler:
                 )
 
         except Exception as e:
-            self.logger.error(f"Error in subscribe button handler: {str(e)}")
+            self.logger.error("Error in subscribe button handler: %s", e)
             await query.edit_message_text("❌ Có lỗi xảy ra / An error occurred")
 
+    @timed_handler
+    @with_deadline('message')
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             if not update.effective_message:
                 return
 
             message = update.effective_message
-            user_id = update.effective_user.id
+            # Channel posts have no effective user
+            user_id = update.effective_user.id if update.effective_user else None
+            forward_chat = get_forward_chat(message)
 
             # Handle forwarded messages from channels or groups
-            if hasattr(message, 'forward_from_chat') and message.forward_from_chat:
+            if not update.channel_post and forward_chat:
                 try:
-                    source_id = str(message.forward_from_chat.id)
-                    source_title = message.forward_from_chat.title
+                    source_id = str(forward_chat.id)
+                    source_title = forward_chat.title
                     message_text = message.text or message.caption or ""
-                    chat_type = message.forward_from_chat.type
+                    chat_type = forward_chat.type
 
                     self.logger.info(
-                        f"Forward details - Chat ID: {source_id}, "
-                        f"Title: {source_title}, "
-                        f"Type: {chat_type}, "
-                        f"Has text: {bool(message_text)}, "
-                        f"User: {user_id}"
+                        "Forward details - Chat ID: %s, Title: %s, Type: %s, Has text: %s, User: %s",
+                        source_id, source_title, chat_type, bool(message_text), user_id
                     )
 
                     # Check if already subscribed
-                    is_subscribed = source_id in self.storage.get_subscribed_channels(user_id)
-                    self.logger.info(f"User {user_id} subscription status for {source_id}: {is_subscribed}")
+                    is_subscribed = self.storage.is_subscribed(user_id, source_id)
+                    self.logger.info("User %s subscription status for %s: %s", user_id, source_id, is_subscribed)
 
                     if not is_subscribed:
                         # Create subscription keyboard
@@ -315,36 +520,51 @@ class CommandHandler:
 
                             reply_markup = InlineKeyboardMarkup(keyboard)
 
-                            # Show subscription prompt
-                            await message.reply_text(
+                            # Show subscription prompt; it quotes the forwarded message so
+                            # the translate button can find the original text
+                            prompt = await message.reply_text(
                                 f"🔔 Bạn có muốn đăng ký nhận tin nhắn được dịch từ {source_title}?\n"
                                 f"Would you like to subscribe to translated messages from {source_title}?",
-                                reply_markup=reply_markup
+                                reply_markup=reply_markup,
+                                do_quote=True
                             )
-                            self.logger.info(f"Showed subscription prompt for {chat_type} {source_id}")
+                            self.logger.info("Showed subscription prompt for %s %s", chat_type, source_id)
+
+                            # Start translating now so a click on the button is usually instant
+                            if message_text:
+                                self.speculative.start(
+                                    (prompt.chat_id, prompt.message_id),
+                                    self._pretranslate(
+                                        source_id, message_text, self.storage.get_target_language(user_id)
+                                    )
+                                )
+                        return
+
+                    if message_text and self.admission.level >= BUSY_REPLIES:
+                        await self._reply_busy(message)
                         return
 
                     # If already subscribed and has text, translate immediately
                     if message_text:
                         try:
-                            detected_lang = self.translator.detect_language(message_text)
+                            detected_lang, verified = await self._detect_channel_language(source_id, message_text)
                             if detected_lang:
                                 preferences = self.storage.get_user_preferences(user_id)
                                 target_language = preferences.get('target_language', 'en')
                                 if detected_lang != target_language:
-                                    translated_text = self.translator.translate_text(
+                                    translated_text = await self._translate_text(
                                         message_text,
                                         target_lang=target_language,
-                                        source_lang=detected_lang
+                                        source_lang=detected_lang if verified else None
                                     )
                                     if translated_text and translated_text != message_text:
                                         await message.reply_text(
                                             f"🔄 {detected_lang} ➜ {target_language}:\n\n"
                                             f"{translated_text}"
                                         )
-                                        self.logger.info(f"Translated forwarded message for subscribed user {user_id}")
+                                        self.logger.info("Translated forwarded message for subscribed user %s", user_id)
                         except Exception as e:
-                            self.logger.error(f"Translation error for forwarded message: {str(e)}")
+                            self.logger.error("Translation error for forwarded message: %s", e)
                             await send_error_message(
                                 update, 
                                 context, 
@@ -353,7 +573,7 @@ class CommandHandler:
                     return
 
                 except Exception as e:
-                    self.logger.error(f"Error processing forwarded message: {str(e)}")
+                    self.logger.error("Error processing forwarded message: %s", e)
                     await send_error_message(
                         update, 
                         context, 
@@ -362,9 +582,13 @@ class CommandHandler:
                     return
 
             # Handle direct messages
-            if message.text and not message.forward_from_chat:
+            if message.text and not forward_chat and not update.channel_post:
                 if not await self.rate_limiter.check_rate_limit(user_id):
-                    self.logger.warning(f"Rate limit exceeded for user {user_id}")
+                    self.logger.warning("Rate limit exceeded for user %s", user_id)
+                    return
+
+                if self.admission.level >= BUSY_REPLIES:
+                    await self._reply_busy(message)
                     return
 
                 preferences = self.storage.get_user_preferences(user_id)
@@ -372,11 +596,11 @@ class CommandHandler:
                 message_text = message.text
 
                 try:
-                    detected_lang = self.translator.detect_language(message_text)
-                    self.logger.info(f"Direct message - Source lang: {detected_lang}, Target lang: {target_language}")
+                    detected_lang = await self._detect_language(message_text)
+                    self.logger.info("Direct message - Source lang: %s, Target lang: %s", detected_lang, target_language)
 
                     if detected_lang and detected_lang != target_language:
-                        translated_text = self.translator.translate_text(
+                        translated_text = await self._translate_text(
                             message_text,
                             target_lang=target_language,
                             source_lang=detected_lang
@@ -389,7 +613,7 @@ class CommandHandler:
                             )
                             self.logger.info("Successfully translated direct message")
                 except Exception as e:
-                    self.logger.error(f"Translation error for direct message: {str(e)}")
+                    self.logger.error("Translation error for direct message: %s", e)
                     await send_error_message(
                         update, 
                         context, 
@@ -399,84 +623,377 @@ class CommandHandler:
 
             # Handle channel posts
             if update.channel_post:
-                try:
-                    channel_id = str(update.channel_post.chat.id)
-                    message_text = update.channel_post.text or update.channel_post.caption
-                    channel_title = update.channel_post.chat.title or channel_id
+                post = update.channel_post
+                if self.admission.level >= DEFER_BULK or str(post.chat.id) in self._deferred_per_channel:
+                    # Overloaded, or older posts of the channel are still parked:
+                    # park it, run_admission_loop resumes it later
+                    self._defer_post(post, context.bot, time.time())
+                else:
+                    self._spawn_fan_out(post, context.bot, time.time())
 
-                    if not message_text:
-                        return
+        except Exception as e:
+            self.logger.error("Error in message handler: %s", e)
+            await send_error_message(
+                update, 
+                context, 
+                "❌ Có lỗi xảy ra / An error occurred"
+            )
 
-                    self.logger.info(f"Processing channel post from {channel_title} ({channel_id})")
+    def _format_channel_translation(self, channel_title: str, source_lang: str, target_language: str,
+                                    has_media: bool, translated_text: str, excerpt: str = None) -> str:
+        media_info = "📎 [Có đính kèm phương tiện / Contains media]\n\n" if has_media else ""
+        article_info = f"\n\n📰 {excerpt}" if excerpt else ""
+        return (
+            f"📢 Tin nhắn từ kênh {channel_title}:\n"
+            f"🔄 {source_lang} ➜ {target_language}:\n\n"
+            f"{media_info}{translated_text}{article_info}"
+        )
+
+    def _format_channel_original(self, channel_title: str, has_media: bool, message_text: str) -> str:
+        media_info = "📎 [Có đính kèm phương tiện / Contains media]\n\n" if has_media else ""
+        return (
+            f"📢 Tin nhắn từ kênh {channel_title}:\n\n"
+            f"{media_info}{message_text}"
+        )
+
+    async def _send_originals(self, bot, timeline: PostTimeline, text: str,
+                              user_ids: List[Tuple[int, bool]]) -> Dict[int, Tuple[int, float]]:
+        """Send the original post to progressive-delivery users: uid -> (message id, sent at)."""
+        originals = {}
+        for uid, muted in user_ids:
+            try:
+                message = await self.sender.send_message(
+                    bot, uid, text, disable_web_page_preview=True, disable_notification=muted
+                )
+                originals[uid] = (message.message_id, time.time())
+            except Exception as e:
+                self.logger.error("Error sending original post to user %s: %s", uid, e, extra=SAMPLED)
+        self.delivery_latency.record_originals(timeline, [sent for _, sent in originals.values()])
+        metrics.incr("progressive.originals", len(originals))
+        return originals
+
+    async def _translate_excerpt(self, article_task, target_language: str):
+        # Never raises: a missing excerpt only means a shorter message
+        try:
+            article = await article_task
+            return await article.translated(
+                target_language, lambda text, lang: self._translate_text(text, target_lang=lang, lane=BULK)
+            )
+        except Exception as e:
+            self.logger.warning("Could not attach article excerpt: %s", e)
+            return None
+
+    def _defer_post(self, post, bot, received: float) -> None:
+        if len(self.deferred_posts) >= SHED_DEFERRED_MAX_POSTS:
+            metrics.incr("admission.deferred_dropped")
+            self._take_deferred()
+        channel_id = str(post.chat.id)
+        self.deferred_posts[(channel_id, post.message_id)] = (post, bot, received)
+        self._deferred_per_channel[channel_id] = self._deferred_per_channel.get(channel_id, 0) + 1
+        metrics.incr("admission.deferred")
+
+    def _take_deferred(self) -> Tuple:
+        (channel_id, _), parked = self.deferred_posts.popitem(last=False)
+        self._deferred_per_channel[channel_id] -= 1
+        if not self._deferred_per_channel[channel_id]:
+            del self._deferred_per_channel[channel_id]
+        return parked
+
+    def take_deferred_posts(self) -> List:
+        """Remove and return every parked post, oldest first (used at shutdown)."""
+        posts = [post for post, _, _ in self.deferred_posts.values()]
+        self.deferred_posts.clear()
+        self._deferred_per_channel.clear()
+        return posts
+
+    async def _translate_for_language(self, delivered: DeliveredPost, article_task, target_language: str,
+                                      source_lang: Optional[str]):
+        """(segments, excerpt) of a channel post in one language; (None, None) when there is nothing to send."""
+        translated = await self._translate_segments(delivered.segments, target_language, source_lang, lane=BULK)
+        if not translated or not '\n'.join(translated) or translated == delivered.segments:
+            return None, None
+        excerpt = None
+        if article_task is not None:
+            excerpt = await self._translate_excerpt(article_task, target_language)
+        return translated, excerpt
+
+    def _spawn_fan_out(self, post, bot, received: float) -> None:
+        # A channel's posts reach subscribers in the order they arrived (the
+        # handler returns before fan-out is done, so update ordering alone
+        # does not keep it); edits of the post wait for its fan-out, so they
+        # see every delivery
+        channel_id = str(post.chat.id)
+        self._spawn(self._in_turn(
+            self._fan_out_channel_post(post, bot, received),
+            (self._channel_tails, channel_id), (self._post_tails, (channel_id, post.message_id))
+        ))
+
+    @timed_handler
+    @with_deadline('channel_post')
+    async def _fan_out_channel_post(self, post, bot, received: float = None) -> None:
+        started = time.time()
+        try:
+            channel_id = str(post.chat.id)
+            message_text = post.text or post.caption
+            channel_title = post.chat.title or channel_id
 
-                    # Get all users subscribed to this channel
-                    subscribed_users = []
-                    for uid, prefs in self.storage.user_data.items():
-                        if channel_id in prefs.get('subscribed_channels', []):
-                            subscribed_users.append(uid)
+            if not message_text:
+                return
 
-                    self.logger.info(f"Found {len(subscribed_users)} subscribers for channel {channel_id}")
+            self.logger.info("Processing channel post from %s (%s)", channel_title, channel_id)
 
-                    # Process message for each subscribed user
-                    for uid in subscribed_users:
-                        try:
-                            preferences = self.storage.get_user_preferences(int(uid))
-                            target_language = preferences.get('target_language', 'en')
-
-                            # Detect and translate
-                            detected_lang = self.translator.detect_language(message_text)
-                            self.logger.info(f"Channel post - Source lang: {detected_lang}, Target lang: {target_language}")
-
-                            if detected_lang and detected_lang != target_language:
-                                translated_text = self.translator.translate_text(
-                                    message_text,
-                                    target_lang=target_language,
-                                    source_lang=detected_lang
-                                )
+            # Get all users subscribed to this channel
+            subscribed_users = self.storage.get_channel_subscribers(channel_id)
 
-                                if translated_text and translated_text != message_text:
-                                    # Check for media
-                                    has_media = bool(
-                                        update.channel_post.photo or 
-                                        update.channel_post.video or 
-                                        update.channel_post.document or 
-                                        update.channel_post.animation
-                                    )
+            self.logger.info("Found %s subscribers for channel %s", len(subscribed_users), channel_id)
+            if not subscribed_users:
+                return
 
-                                    media_info = "📎 [Có đính kèm phương tiện / Contains media]\n\n" if has_media else ""
+            # Check for media
+            has_media = bool(post.photo or post.video or post.document or post.animation)
+            post_key = (channel_id, post.message_id)
+
+            # Digest users get the post later; everyone else is grouped by target language.
+            # Users with notifications disabled get a silent message, or none when shedding load.
+            # Progressive-delivery users get the original now and the translation as an edit.
+            by_language: Dict[str, List[Tuple[int, bool]]] = {}
+            progressive: List[Tuple[int, bool]] = []
+            buffered = skipped = 0
+            skip_muted = self.admission.level >= SKIP_MUTED
+            for uid in subscribed_users:
+                record = self.storage.get_user(uid)
+                muted = record is not None and not record.notifications_enabled
+                if muted and skip_muted:
+                    skipped += 1
+                elif record is not None and record.digest_enabled:
+                    self.digest.add(post_key, DigestPost(channel_id, channel_title, message_text, has_media), uid)
+                    buffered += 1
+                else:
+                    by_language.setdefault(self.storage.get_target_language(uid), []).append((uid, muted))
+                    if record is not None and record.progressive_enabled:
+                        progressive.append((uid, muted))
+
+            sent = failed = edited = 0
+            if by_language:
+                timeline = PostTimeline(
+                    channel_id, post.message_id, post.date.timestamp(), received or started, started
+                )
+                # Originals go out while the post is detected and translated
+                originals_task = None
+                if progressive:
+                    originals_task = asyncio.ensure_future(self._send_originals(
+                        bot, timeline, self._format_channel_original(channel_title, has_media, message_text),
+                        progressive
+                    ))
+                # The linked page is fetched while the post itself is detected and translated
+                url = first_link(post) if self.articles is not None else None
+                article_task = asyncio.ensure_future(self.articles.get(url)) if url else None
+
+                # Detect and translate once per post and target language
+                detected_lang, verified = await self._detect_channel_language(channel_id, message_text, lane=BULK)
+                timeline.detected = time.time()
+                delivered = DeliveredPost(
+                    channel_title, detected_lang, verified, has_media, split_segments(message_text)
+                )
+                # Registered before the first send; deliveries are added as they succeed
+                self.deliveries.put(post_key, delivered)
+
+                for target_language, user_ids in by_language.items():
+                    self.logger.debug("Channel post - Source lang: %s, Target lang: %s", detected_lang, target_language)
+                    if not detected_lang or detected_lang == target_language:
+                        continue
+
+                    translating_at = time.time()
+                    work = asyncio.ensure_future(self._translate_for_language(
+                        delivered, article_task, target_language, detected_lang if verified else None
+                    ))
+                    try:
+                        originals = await originals_task if originals_task is not None else {}
+                        waiting = [originals[uid][1] for uid, _ in user_ids if uid in originals]
+                        if waiting:
+                            # Progressive users only wait so long; past that they keep the original
+                            budget = max(waiting) + PROGRESSIVE_TRANSLATION_TIMEOUT - time.time()
+                            try:
+                                await asyncio.wait_for(asyncio.shield(work), max(0.0, budget))
+                            except asyncio.TimeoutError:
+                                if len(waiting) == len(user_ids):
+                                    metrics.incr("progressive.timed_out", len(waiting))
+                                    continue
+                        translated, excerpt = await work
+                    finally:
+                        work.cancel()
+                    if translated is None:
+                        continue
+
+                    translated_text = '\n'.join(translated)
+                    delivered.translations[target_language] = translated
+                    if excerpt:
+                        delivered.excerpts[target_language] = excerpt
+                    forward_message = self._format_channel_translation(
+                        channel_title, detected_lang, target_language, has_media, translated_text, excerpt
+                    )
+                    translated_at = time.time()
+
+                    # Progressive users whose original arrived in time get it edited,
+                    # first; the rest (and those whose original failed) get a new message
+                    edits, fresh = [], []
+                    for uid, muted in user_ids:
+                        original = originals.get(uid)
+                        if original is None:
+                            fresh.append((uid, muted))
+                        elif translated_at - original[1] <= PROGRESSIVE_TRANSLATION_TIMEOUT:
+                            edits.append((uid, original[0]))
+                        else:
+                            metrics.incr("progressive.timed_out")
+
+                    sends = []
+                    for uid, message_id in edits:
+                        try:
+                            queued_at = time.time()
+                            await self.sender.edit_message_text(
+                                bot, uid, message_id, forward_message, disable_web_page_preview=True
+                            )
+                            sends.append((queued_at, time.time()))
+                            delivered.deliveries.append((uid, message_id, target_language))
+                            edited += 1
+                        except Exception as e:
+                            failed += 1
+                            self.logger.error("Error editing in translation for user %s: %s", uid, e, extra=SAMPLED)
+                    progressive_sends = len(sends)
+                    for uid, muted in fresh:
+                        try:
+                            queued_at = time.time()
+                            sent_message = await self.sender.send_message(
+                                bot, uid, forward_message, disable_web_page_preview=True,
+                                disable_notification=muted
+                            )
+                            sends.append((queued_at, time.time()))
+                            delivered.deliveries.append((uid, sent_message.message_id, target_language))
+                            sent += 1
+                            self.logger.debug("Successfully sent translation to user %s", uid)
+                        except Exception as e:
+                            failed += 1
+                            self.logger.error("Error processing message for user %s: %s", uid, e, extra=SAMPLED)
+                    self.delivery_latency.record(
+                        timeline, target_language, translating_at, translated_at, sends, progressive=progressive_sends
+                    )
 
-                                    forward_message = (
-                                        f"📢 Tin nhắn từ kênh {channel_title}:\n"
-                                        f"🔄 {detected_lang} ➜ {target_language}:\n\n"
-                                        f"{media_info}{translated_text}"
-                                    )
+                if originals_task is not None:
+                    # Languages that needed no translation never waited on it
+                    await originals_task
+                if not delivered.deliveries:
+                    self.deliveries.discard(post_key)
+
+            if buffered:
+                metrics.incr("digest.deliveries_buffered", buffered)
+            if skipped:
+                metrics.incr("admission.skipped_muted", skipped)
+            if edited:
+                metrics.incr("progressive.edited", edited)
+            self.logger.info(
+                "Channel post fan-out for %s: %d subscribers, %d sent, %d edited in, %d buffered for digest, "
+                "%d skipped, %d failed",
+                channel_id, len(subscribed_users), sent, edited, buffered, skipped, failed
+            )
 
-                                    await context.bot.send_message(
-                                        chat_id=int(uid),
-                                        text=forward_message,
-                                        disable_web_page_preview=True
-                                    )
-                                    self.logger.info(f"Successfully sent translation to user {uid}")
+        except Exception as e:
+            self.logger.error("Error processing channel post: %s", e)
+
+    @timed_handler
+    async def handle_edited_channel_post(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        post = update.edited_channel_post
+        key = (str(post.chat.id), post.message_id)
+        parked = self.deferred_posts.get(key)
+        if parked is not None:
+            # Not fanned out yet: it will go out with the edited text
+            _, bot, received = parked
+            self.deferred_posts[key] = (post, bot, received)
+            metrics.incr("edits.parked")
+            return
+        # One at a time per post, after the post's own fan-out
+        self._spawn(self._in_turn(
+            self._apply_channel_edit(post, context.bot), (self._post_tails, key)
+        ))
+
+    @timed_handler
+    @with_deadline('channel_post')
+    async def _apply_channel_edit(self, post, bot) -> None:
+        try:
+            delivered = self.deliveries.get((str(post.chat.id), post.message_id))
+            new_text = post.text or post.caption
+            if delivered is None or not new_text:
+                return
 
-                        except Exception as e:
-                            self.logger.error(f"Error processing message for user {uid}: {str(e)}")
-                            continue
+            new_segments = split_segments(new_text)
+            if new_segments == delivered.segments:
+                return
 
+            # Retranslate only the segments that changed, once per target language
+            updated: Dict[str, List[str]] = {}
+            retranslated = reused = 0
+            for target_language, old_translated in delivered.translations.items():
+                merged = reuse_translations(delivered.segments, new_segments, old_translated)
+                missing = [i for i, segment in enumerate(merged) if segment is None]
+                if missing:
+                    translated = await self._translate_segments(
+                        [new_segments[i] for i in missing], target_language,
+                        delivered.source_lang if delivered.source_verified else None, lane=BULK
+                    )
+                    if translated is None:
+                        self.logger.warning("Could not retranslate edited post to %s", target_language)
+                        continue
+                    for i, segment in zip(missing, translated):
+                        merged[i] = segment
+                retranslated += len(missing)
+                reused += len(merged) - len(missing)
+                updated[target_language] = merged
+
+            delivered.segments = new_segments
+            delivered.translations = updated
+            delivered.deliveries = [d for d in delivered.deliveries if d[2] in updated]
+
+            texts = {
+                target_language: self._format_channel_translation(
+                    delivered.channel_title, delivered.source_lang, target_language,
+                    delivered.has_media, '\n'.join(segments), delivered.excerpts.get(target_language)
+                )
+                for target_language, segments in updated.items()
+            }
+            edited = failed = 0
+            for uid, message_id, target_language in delivered.deliveries:
+                try:
+                    await self.sender.edit_message_text(
+                        bot, uid, message_id, texts[target_language], disable_web_page_preview=True
+                    )
+                    edited += 1
+                except BadRequest as e:
+                    if 'not modified' not in str(e):
+                        failed += 1
+                        self.logger.error("Error editing message for user %s: %s", uid, e, extra=SAMPLED)
                 except Exception as e:
-                    self.logger.error(f"Error processing channel post: {str(e)}")
+                    failed += 1
+                    self.logger.error("Error editing message for user %s: %s", uid, e, extra=SAMPLED)
+
+            metrics.incr("edits.posts")
+            metrics.incr("edits.segments_retranslated", retranslated)
+            metrics.incr("edits.segments_reused", reused)
+            metrics.incr("edits.messages_edited", edited)
+            self.logger.info(
+                "Edited channel post %s/%s: %d segments retranslated, %d reused, %d messages edited, %d failed",
+                post.chat.id, post.message_id, retranslated, reused, edited, failed
+            )
 
         except Exception as e:
-            self.logger.error(f"Error in message handler: {str(e)}")
-            await send_error_message(
-                update, 
-                context, 
-                "❌ Có lỗi xảy ra / An error occurred"
-            )
+            self.logger.error("Error in edited channel post handler: %s", e)
 
+    @timed_handler
+    @with_deadline('command')
     async def settings(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             user_id = update.effective_user.id
             preferences = self.storage.get_user_preferences(user_id)
+            digest_enabled = preferences.get('digest_enabled', False)
+            progressive_enabled = preferences.get('progressive_enabled', False)
 
             # Language code to full name mapping
             language_names = {
@@ -499,6 +1016,19 @@ class CommandHandler:
                 ],
                 [
                     InlineKeyboardButton("🇨🇳 中文", callback_data="setlang:zh")
+                ],
+                [
+                    InlineKeyboardButton(
+                        "📬 Tắt bản tin / Digest off" if digest_enabled else "📬 Bật bản tin / Digest on",
+                        callback_data="setdigest:off" if digest_enabled else "setdigest:on"
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        "⚡ Tắt gửi bản gốc trước / Original first off" if progressive_enabled
+                        else "⚡ Gửi bản gốc trước / Original first on",
+                        callback_data="setprogressive:off" if progressive_enabled else "setprogressive:on"
+                    )
                 ]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -506,18 +1036,23 @@ class CommandHandler:
             # Get current language code and display full name
             current_lang_code = preferences.get('target_language', 'en')
             current_lang_name = language_names.get(current_lang_code, current_lang_code)
+            digest_status = f"{DIGEST_INTERVAL // 60} min" if digest_enabled else "Off"
 
             settings_message = (
                 "⚙️ Cài đặt hiện tại / Current Settings:\n"
-                f"🔤 Ngôn ngữ dịch / Target Language: {current_lang_name}\n\n"
+                f"🔤 Ngôn ngữ dịch / Target Language: {current_lang_name}\n"
+                f"📬 Bản tin / Digest: {digest_status}\n"
+                f"⚡ Gửi bản gốc trước / Original first: {'On' if progressive_enabled else 'Off'}\n\n"
                 "Chọn ngôn ngữ mới / Select new language:"
             )
             await update.message.reply_text(settings_message, reply_markup=reply_markup)
 
         except Exception as e:
-            self.logger.error(f"Error in settings command: {str(e)}")
+            self.logger.error("Error in settings command: %s", e)
             await send_error_message(update, context, "Failed to show settings")
 
+    @timed_handler
+    @with_deadline('command')
     async def set_language(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             if not context.args or len(context.args) != 1:
@@ -537,18 +1072,18 @@ class CommandHandler:
                 )
                 return
 
-            preferences = self.storage.get_user_preferences(user_id)
-            preferences['target_language'] = new_language
-            self.storage.set_user_preferences(user_id, preferences)
+            self.storage.update_user_preferences(user_id, target_language=new_language)
 
             await update.message.reply_text(
                 f"✅ Target language successfully changed to: {new_language}"
             )
 
         except Exception as e:
-            self.logger.error(f"Error in set_language command: {str(e)}")
+            self.logger.error("Error in set_language command: %s", e)
             await send_error_message(update, context, "Failed to change language")
 
+    @timed_handler
+    @with_deadline('callback_query')
     async def handle_unsubscribe_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             query = update.callback_query
@@ -566,15 +1101,18 @@ class CommandHandler:
                 return
 
             self.storage.remove_channel_subscription(user_id, channel_id)
+            label = self.storage.channel_label(channel_id)
             await query.edit_message_text(
-                f"✅ Đã hủy đăng ký kênh {channel_id}\n"
-                f"Successfully unsubscribed from {channel_id}"
+                f"✅ Đã hủy đăng ký kênh {label}\n"
+                f"Successfully unsubscribed from {label}"
             )
 
         except Exception as e:
-            self.logger.error(f"Error in unsubscribe button handler: {str(e)}")
+            self.logger.error("Error in unsubscribe button handler: %s", e)
             await query.edit_message_text("❌ Có lỗi xảy ra / An error occurred")
 
+    @timed_handler
+    @with_deadline('callback_query')
     async def handle_language_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             query = update.callback_query
@@ -603,9 +1141,7 @@ class CommandHandler:
             # Get full language name
             language_name = language_names.get(new_language, new_language)
 
-            preferences = self.storage.get_user_preferences(user_id)
-            preferences['target_language'] = new_language
-            self.storage.set_user_preferences(user_id, preferences)
+            self.storage.update_user_preferences(user_id, target_language=new_language)
 
             success_message = (
                 f"✅ Đã đổi ngôn ngữ dịch thành: {language_name}\n"
@@ -614,9 +1150,75 @@ class CommandHandler:
             await query.edit_message_text(success_message)
 
         except Exception as e:
-            self.logger.error(f"Error in language button handler: {str(e)}")
+            self.logger.error("Error in language button handler: %s", e)
+            await query.edit_message_text("❌ Có lỗi xảy ra / An error occurred")
+
+    @timed_handler
+    @with_deadline('callback_query')
+    async def handle_digest_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            query = update.callback_query
+            await query.answer()
+
+            # Format: "setdigest:on" / "setdigest:off"
+            enabled = query.data.split(':')[1] == 'on'
+            user_id = query.from_user.id
+
+            # Digest and progressive delivery exclude each other
+            if enabled:
+                self.storage.update_user_preferences(user_id, digest_enabled=True, progressive_enabled=False)
+            else:
+                self.storage.update_user_preferences(user_id, digest_enabled=False)
+
+            if enabled:
+                message = (
+                    f"✅ Đã bật bản tin: tin dịch sẽ được gửi gộp mỗi {DIGEST_INTERVAL // 60} phút\n"
+                    f"Digest enabled: translated posts will be sent together every {DIGEST_INTERVAL // 60} minutes"
+                )
+            else:
+                message = (
+                    "✅ Đã tắt bản tin: tin dịch sẽ được gửi ngay\n"
+                    "Digest disabled: translated posts will be sent immediately"
+                )
+            await query.edit_message_text(message)
+
+        except Exception as e:
+            self.logger.error("Error in digest button handler: %s", e)
+            await query.edit_message_text("❌ Có lỗi xảy ra / An error occurred")
+
+    @timed_handler
+    @with_deadline('callback_query')
+    async def handle_progressive_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            query = update.callback_query
+            await query.answer()
+
+            # Format: "setprogressive:on" / "setprogressive:off"
+            enabled = query.data.split(':')[1] == 'on'
+            user_id = query.from_user.id
+
+            # Digest and progressive delivery exclude each other
+            if enabled:
+                self.storage.update_user_preferences(user_id, progressive_enabled=True, digest_enabled=False)
+                message = (
+                    "✅ Đã bật gửi bản gốc trước: tin gốc được gửi ngay, bản dịch sẽ thay thế khi sẵn sàng\n"
+                    "Original first enabled: posts arrive right away and are replaced by the translation "
+                    "when it is ready"
+                )
+            else:
+                self.storage.update_user_preferences(user_id, progressive_enabled=False)
+                message = (
+                    "✅ Đã tắt gửi bản gốc trước: chỉ gửi bản dịch\n"
+                    "Original first disabled: only translations will be sent"
+                )
+            await query.edit_message_text(message)
+
+        except Exception as e:
+            self.logger.error("Error in progressive delivery button handler: %s", e)
             await query.edit_message_text("❌ Có lỗi xảy ra / An error occurred")
 
+    @timed_handler
+    @with_deadline('callback_query')
     async def handle_subscribe_help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             query = update.callback_query
@@ -641,9 +1243,11 @@ class CommandHandler:
             )
 
         except Exception as e:
-            self.logger.error(f"Error in subscribe help handler: {str(e)}")
+            self.logger.error("Error in subscribe help handler: %s", e)
             await query.edit_message_text("❌ Có lỗi xảy ra / An error occurred")
 
+    @timed_handler
+    @with_deadline('callback_query')
     async def handle_back_to_sub(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             query = update.callback_query
@@ -662,9 +1266,131 @@ class CommandHandler:
             )
 
         except Exception as e:
-            self.logger.error(f"Error in back to subscribe handler: {str(e)}")
+            self.logger.error("Error in back to subscribe handler: %s", e)
             await query.edit_message_text("❌ Có lỗi xảy ra / An error occurred")
 
+    async def flush_digests(self, bot) -> None:
+        """Send every pending digest; identical digests are translated and assembled once."""
+        posts, pending = self.digest.drain()
+        if not pending:
+            return
+
+        languages = {uid: self.storage.get_target_language(uid) for uid in pending}
+        groups = group_recipients(pending, languages)
+        detected: Dict = {}
+        translations: Dict = {}
+        deliveries = sum(len(keys) for keys in pending.values())
+        messages_sent = failed = 0
+
+        for (target_language, keys), user_ids in groups.items():
+            entries = []
+            for key in keys:
+                post = posts.get(key)
+                if post is None:
+                    # Dropped when the buffer hit its budget
+                    continue
+                if key not in detected:
+                    detected[key] = await self._detect_channel_language(post.channel_id, post.text, lane=BULK)
+                source_lang, verified = detected[key]
+                if not source_lang or source_lang == target_language:
+                    continue
+
+                if (key, target_language) not in translations:
+                    translations[key, target_language] = await self._translate_text(
+                        post.text, target_lang=target_language, source_lang=source_lang if verified else None,
+                        lane=BULK
+                    )
+                translated_text = translations[key, target_language]
+                if not translated_text or translated_text == post.text:
+                    continue
+
+                media_info = "📎 [Có đính kèm phương tiện / Contains media]\n" if post.has_media else ""
+                entries.append(
+                    f"📢 {post.channel_title} ({source_lang} ➜ {target_language}):\n"
+                    f"{media_info}{translated_text}"
+                )
+
+            if not entries:
+                continue
+
+            header = f"📬 Bản tin / Digest ({len(entries)})"
+            for text in split_message(entries, header, separator="\n\n———\n\n"):
+                for uid in user_ids:
+                    try:
+                        await self.sender.send_message(bot, uid, text, disable_web_page_preview=True)
+                        messages_sent += 1
+                    except Exception as e:
+                        failed += 1
+                        self.logger.error("Error sending digest to user %s: %s", uid, e, extra=SAMPLED)
+
+        # Each (post, language) pair was translated once, whether or not it succeeded
+        translation_calls = len(translations)
+        metrics.incr("digest.flushes")
+        metrics.incr("digest.deliveries", deliveries)
+        metrics.incr("digest.messages_sent", messages_sent)
+        metrics.incr("digest.sends_saved", max(deliveries - messages_sent - failed, 0))
+        metrics.incr("digest.translations", translation_calls)
+        metrics.incr("digest.translations_saved", max(deliveries - translation_calls, 0))
+        self.logger.info(
+            "Digest flush: %d posts for %d users in %d groups -> %d messages sent (%d saved), "
+            "%d translations (%d saved), %d failed",
+            deliveries, len(pending), len(groups), messages_sent, deliveries - messages_sent - failed,
+            translation_calls, deliveries - translation_calls, failed
+        )
+
+    async def _pretranslate(self, channel_id: str, text: str, target_language: str):
+        # Runs ahead of a possible "Translate this message" click; never raises
+        try:
+            detected_lang, verified = await self._detect_channel_language(channel_id, text, lane=BULK)
+            translated_text = None
+            if detected_lang and detected_lang != target_language:
+                translated_text = await self._translate_text(
+                    text, target_lang=target_language, source_lang=detected_lang if verified else None,
+                    lane=BULK
+                )
+            return target_language, detected_lang, translated_text
+        except Exception as e:
+            self.logger.debug("Speculative translation failed: %s", e)
+            return target_language, None, None
+
+    async def _reply_busy(self, message) -> None:
+        metrics.incr("admission.busy_replies")
+        await message.reply_text(
+            "⏳ Bot đang quá tải, vui lòng thử lại sau ít phút\n"
+            "The bot is busy right now, please try again in a few minutes"
+        )
+
+    async def drain(self, timeout: float) -> None:
+        """Give background fan-out and edits up to `timeout` seconds to finish, then cancel them."""
+        if not self.background_tasks:
+            return
+        self.logger.info("Waiting for %d background tasks to finish", len(self.background_tasks))
+        _, pending = await asyncio.wait(set(self.background_tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.logger.warning("Cancelled %d background tasks still running at shutdown", len(pending))
+
+    async def run_admission_loop(self) -> None:
+        while True:
+            await asyncio.sleep(1)
+            level = self.admission.update()
+            metrics.set_gauge("admission.deferred_posts", len(self.deferred_posts))
+            if level < DEFER_BULK:
+                for _ in range(min(SHED_RESUME_BATCH, len(self.deferred_posts))):
+                    post, bot, received = self._take_deferred()
+                    metrics.incr("admission.resumed")
+                    self._spawn_fan_out(post, bot, received)
+
+    async def run_digest_loop(self, bot) -> None:
+        while True:
+            await asyncio.sleep(DIGEST_INTERVAL)
+            try:
+                await self.flush_digests(bot)
+            except Exception as e:
+                self.logger.error("Error flushing digests: %s", e)
+
     # Helper method to translate text and respond
     async def _translate_and_respond(self, update, message_text):
         """Translate the given message text and send the translation as a reply."""
@@ -677,9 +1403,9 @@ class CommandHandler:
             target_language = preferences.get('target_language', 'en')
 
             # Detect source language
-            detected_lang = self.translator.detect_language(message_text)
+            detected_lang = await self._detect_language(message_text)
             if detected_lang and detected_lang != target_language:
-                translated_text = self.translator.translate_text(
+                translated_text = await self._translate_text(
                     message_text,
                     target_lang=target_language,
                     source_lang=detected_lang
@@ -704,9 +1430,11 @@ class CommandHandler:
                     return True
             return False
         except Exception as e:
-            self.logger.error(f"Error in translate_and_respond: {str(e)}")
+            self.logger.error("Error in translate_and_respond: %s", e)
             return False
 
+    @timed_handler
+    @with_deadline('callback_query')
     async def handle_translate_only(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the 'Translate this message' button click."""
         try:
@@ -739,8 +1467,17 @@ class CommandHandler:
             target_language = preferences.get('target_language', 'en')
 
             try:
+                # Use the translation started when the prompt was shown, if any
+                detected_lang = translated_text = None
+                speculation = self.speculative.take((query.message.chat_id, query.message.message_id))
+                if speculation is not None:
+                    speculated_target, detected_lang, translated_text = await speculation
+                    if speculated_target != target_language:
+                        detected_lang = translated_text = None
+
                 # Detect source language
-                detected_lang = self.translator.detect_language(message_text)
+                if not detected_lang:
+                    detected_lang = await self._detect_language(message_text)
                 if not detected_lang:
                     await query.edit_message_text(
                         "❌ Không thể nhận dạng ngôn ngữ\n"
@@ -748,15 +1485,16 @@ class CommandHandler:
                     )
                     return
 
-                self.logger.info(f"Translating text: source={detected_lang}, target={target_language}")
+                self.logger.info("Translating text: source=%s, target=%s", detected_lang, target_language)
 
                 # Only translate if source and target languages are different
                 if detected_lang != target_language:
-                    translated_text = self.translator.translate_text(
-                        message_text,
-                        target_lang=target_language,
-                        source_lang=detected_lang
-                    )
+                    if not translated_text:
+                        translated_text = await self._translate_text(
+                            message_text,
+                            target_lang=target_language,
+                            source_lang=detected_lang
+                        )
 
                     if translated_text and translated_text != message_text:
                         await query.edit_message_text(
@@ -779,7 +1517,7 @@ class CommandHandler:
                     return
 
             except Exception as e:
-                self.logger.error(f"Translation error: {str(e)}")
+                self.logger.error("Translation error: %s", e)
                 await query.edit_message_text(
                     "❌ Có lỗi xảy ra khi dịch\n"
                     "Translation error occurred"
@@ -787,9 +1525,51 @@ class CommandHandler:
                 return
 
         except Exception as e:
-            self.logger.error(f"Error in translate_only handler: {str(e)}")
+            self.logger.error("Error in translate_only handler: %s", e)
             if query:
                 await query.edit_message_text(
                     "❌ Có lỗi xảy ra\n"
                     "An error occurred"
-                )
\ No newline at end of file
+                )
+
+    @timed_handler
+    @with_deadline('command')
+    async def stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            if not is_admin(update.effective_user.id):
+                return
+            prefix = context.args[0] if context.args else None
+            if prefix == 'memory':
+                report = self.memory.render()
+            elif prefix == 'delivery':
+                report = f"{metrics.render('delivery.')}\n{self.delivery_latency.render()}"
+            else:
+                report = f"load shedding: {self.admission.level_name}\n{metrics.render(prefix)}"
+            await update.message.reply_text(report)
+        except Exception as e:
+            self.logger.error("Error in stats command: %s", e)
+            await send_error_message(update, context, "Failed to show stats")
+
+    @timed_handler
+    @with_deadline('command')
+    async def profile(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            if not is_admin(update.effective_user.id):
+                return
+
+            if context.args and context.args[0] == 'stop':
+                profiler.stop()
+                await update.message.reply_text("⏹ Profiler stopping, file will be written shortly")
+                return
+
+            seconds = PROFILE_DEFAULT_SECONDS
+            if context.args and context.args[0].isdigit():
+                seconds = min(int(context.args[0]), PROFILE_MAX_SECONDS)
+
+            if profiler.start(seconds):
+                await update.message.reply_text(f"⏺ Sampling profiler running for {seconds}s")
+            else:
+                await update.message.reply_text("⚠️ Profiler is already running")
+        except Exception as e:
+            self.logger.error("Error in profile command: %s", e)
+            await send_error_message(update, context, "Failed to start profiler")
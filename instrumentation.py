@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import List, Optional, Tuple
+from telegram.request import HTTPXRequest
+from config import SLOW_UPDATE_THRESHOLD, PROFILE_DIR, PROFILE_SAMPLE_INTERVAL
+from deadline import note_cancelled
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateTrace:
+    __slots__ = ('name', 'start', 'stages')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    def breakdown(self) -> str:
+        totals = {}
+        for name, elapsed in self.stages:
+            totals[name] = totals.get(name, 0.0) + elapsed
+        return ", ".join(f"{name}={elapsed * 1000:.1f}ms" for name, elapsed in totals.items())
+
+
+_current_trace: ContextVar[Optional[UpdateTrace]] = ContextVar('update_trace', default=None)
+
+
+def record_stage(name: str, elapsed: float) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages.append((name, elapsed))
+    metrics.observe(f"stage.{name}", elapsed)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage and attach it to the update being handled."""
+    start = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        note_cancelled(name)
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def timed_handler(func):
+    """Open an update trace around a handler and log it when it runs slow."""
+    name = func.__name__
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _current_trace.get() is not None:
+            # Nested handler call (e.g. help -> start): keep the outer trace
+            return await func(*args, **kwargs)
+
+        trace = UpdateTrace(name)
+        token = _current_trace.set(trace)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+            elapsed = time.perf_counter() - trace.start
+            metrics.observe(f"handler.{name}", elapsed)
+            if elapsed >= SLOW_UPDATE_THRESHOLD:
+                metrics.incr("handler.slow")
+                logger.warning("Slow update in %s: %.1fms (%s)", name, elapsed * 1000, trace.breakdown())
+
+    return wrapper
+
+
+_CAMEL = re.compile(r'(?<!^)(?=[A-Z])')
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """Bot API transport that times every call as a stage named after the method."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        endpoint = _CAMEL.sub('_', url.rsplit('/', 1)[-1]).lower()
+        with stage(endpoint):
+            return await super().do_request(url, method, *args, **kwargs)
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads at a fixed interval for a bounded time.
+
+    Output is written in the collapsed-stack format understood by
+    flamegraph.pl and speedscope. Nothing runs while the profiler is idle.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL, output_dir: str = PROFILE_DIR):
+        self.interval = interval
+        self.output_dir = output_dir
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_output: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float) -> bool:
+        if self.running:
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(duration,), name='sampling-profiler', daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, duration: float) -> None:
+        own_ident = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        deadline = time.monotonic() + duration
+        samples = 0
+        logger.info("Sampling profiler started for %.0fs", duration)
+
+        while time.monotonic() < deadline and not self._stop.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stacks[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(self.interval)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info("Sampling profiler wrote %s samples to %s", samples, path)
+        self.last_output = path
+
+
+profiler = SamplingProfiler()
@@ -46,16 +46,16 @@ def ping_server():
                     logger.error("Could not determine Repl URL, skipping ping")
                     return
     except Exception as e:
-        logger.error(f"Error reading .env file: {e}")
+        logger.error("Error reading .env file: %s", e)
         return
 
     while True:
         try:
-            logger.info(f"Pinging {url} to keep alive")
+            logger.info("Pinging %s to keep alive", url)
             urllib.request.urlopen(url)
             logger.info("Successfully pinged server to keep alive")
         except Exception as e:
-            logger.error(f"Failed to ping server: {e}")
+            logger.error("Failed to ping server: %s", e)
         time.sleep(600)  # 10 minutes in seconds
 
 # Start the server and pinging in separate threads
@@ -0,0 +1,54 @@
+from collections import Counter
+from typing import Dict, Optional
+from metrics import metrics
+
+
+class ChannelLanguageProfiles:
+    """Learns which language each subscribed channel posts in.
+
+    The last `window` detections per channel are kept with the channel data.
+    Once at least `min_samples` of them agree by `confidence` or more, the
+    channel's language is used instead of a detection call, except for every
+    `spot_check_every`-th post, which is detected anyway so a channel that
+    changes language is noticed.
+    """
+
+    def __init__(self, storage, window: int, min_samples: int, confidence: float, spot_check_every: int):
+        self.storage = storage
+        self.window = window
+        self.min_samples = min_samples
+        self.confidence = confidence
+        self.spot_check_every = spot_check_every
+        self._since_check: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._since_check)
+
+    def dominant(self, channel_id: str) -> Optional[str]:
+        recent = self.storage.get_channel_languages(channel_id)
+        if len(recent) < self.min_samples:
+            return None
+        language, count = Counter(recent).most_common(1)[0]
+        return language if count / len(recent) >= self.confidence else None
+
+    def guess(self, channel_id: str) -> Optional[str]:
+        """The channel's language if detection can be skipped for this post, else None."""
+        language = self.dominant(channel_id)
+        if language is None:
+            return None
+        since_check = self._since_check.get(channel_id, 0) + 1
+        if since_check >= self.spot_check_every:
+            self._since_check[channel_id] = 0
+            metrics.incr("language_profile.spot_checks")
+            return None
+        self._since_check[channel_id] = since_check
+        return language
+
+    def record(self, channel_id: str, language: str) -> None:
+        if channel_id not in self.storage.subscribers:
+            # Only channels we deliver from are worth a stored profile
+            return
+        dominant = self.dominant(channel_id)
+        if dominant is not None and dominant != language:
+            metrics.incr("language_profile.mismatches")
+        self.storage.record_channel_language(channel_id, language, self.window)
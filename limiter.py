@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Optional
+from metrics import metrics
+
+OK = 'ok'
+# Outcomes that mean "too much load": the limit goes down
+THROTTLED = 'throttled'
+SERVER_ERROR = 'server_error'
+TIMEOUT = 'timeout'
+# Anything else (bad request, unparseable reply) says nothing about capacity
+FAILED = 'failed'
+
+
+def classify(status: Optional[int]) -> str:
+    """Outcome of one backend request; `status` is None when no response arrived."""
+    if status is None:
+        return TIMEOUT
+    if status == 429:
+        return THROTTLED
+    if status >= 500:
+        return SERVER_ERROR
+    if 200 <= status < 300:
+        return OK
+    return FAILED
+
+
+class AdaptiveLimit:
+    """AIMD limit on requests in flight to the translation backend.
+
+    Every successful request adds 1/limit, so the limit grows by about one
+    per round of requests. A 429, 5xx or timeout multiplies it by `backoff`;
+    responses much slower than usual (a short-term latency average above
+    `latency_tolerance` times a long-term one) by the gentler `slow_backoff`.
+    Only requests started after the previous decrease can cause another one,
+    so a burst of failures from one round counts once.
+
+    Thread-safe: outcomes are reported from the translation worker threads.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, backoff: float = 0.7,
+                 slow_backoff: float = 0.9, latency_tolerance: float = 2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.slow_backoff = slow_backoff
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._short_latency = 0.0
+        self._baseline_latency = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        metrics.set_gauge("limiter.limit", self.limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def observe(self, status: Optional[int], latency: float) -> str:
+        outcome = classify(status)
+        metrics.incr(f"limiter.{outcome}")
+        now = time.monotonic()
+        with self._lock:
+            if outcome == OK:
+                if not self._baseline_latency:
+                    self._short_latency = self._baseline_latency = latency
+                self._short_latency += 0.2 * (latency - self._short_latency)
+                # Slow enough that queueing caused by a rising limit shows up
+                # before the baseline absorbs it
+                self._baseline_latency += 0.002 * (latency - self._baseline_latency)
+                if self._short_latency > self._baseline_latency * self.latency_tolerance:
+                    self._decrease(now - latency, self.slow_backoff)
+                else:
+                    self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            elif outcome != FAILED:
+                self._decrease(now - latency, self.backoff)
+        metrics.set_gauge("limiter.limit", self.limit)
+        return outcome
+
+    def _decrease(self, started: float, factor: float) -> None:
+        if started < self._last_decrease or self._limit <= self.minimum:
+            return
+        self._limit = max(self.minimum, self._limit * factor)
+        self._last_decrease = time.monotonic()
+        metrics.incr("limiter.decreases")
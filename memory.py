@@ -0,0 +1,35 @@
+from typing import Callable, Dict, List, Tuple
+from metrics import metrics
+
+
+class MemoryBudgets:
+    """Entry-count budgets for the long-lived in-process structures.
+
+    Every structure that can grow with traffic registers here with a function
+    returning its current size, so /stats and the soak benchmark can report
+    sizes and flag anything over its budget.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[Callable[[], int], int]] = {}
+
+    def register(self, name: str, size_fn: Callable[[], int], budget: int) -> None:
+        self.entries[name] = (size_fn, budget)
+
+    def sizes(self) -> Dict[str, Tuple[int, int]]:
+        """Current size and budget of every structure; also published as memory.* gauges."""
+        report = {}
+        for name, (size_fn, budget) in self.entries.items():
+            size = size_fn()
+            metrics.set_gauge(f"memory.{name}", size)
+            report[name] = (size, budget)
+        return report
+
+    def over_budget(self) -> List[str]:
+        return [name for name, (size, budget) in self.sizes().items() if size > budget]
+
+    def render(self) -> str:
+        return "\n".join(
+            f"{name}: {size}/{budget}{' OVER' if size > budget else ''}"
+            for name, (size, budget) in sorted(self.sizes().items())
+        )
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class Histogram:
+    """Keeps the most recent observations and reports percentiles over them."""
+
+    __slots__ = ('samples', 'count', 'total')
+
+    def __init__(self, size: int = 1024):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'avg': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': max(self.samples) if self.samples else 0.0
+        }
+
+
+class Metrics:
+    """Process-wide counters, gauges and latency histograms."""
+
+    def __init__(self, histogram_size: int = 1024):
+        self.histogram_size = histogram_size
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.histogram_size)
+            histogram.observe(value)
+
+    def get(self, name: str, default: int = 0) -> int:
+        return self.counters.get(name, default)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'uptime': time.time() - self.started,
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {name: h.summary() for name, h in self.histograms.items()}
+            }
+
+    def render(self, prefix: Optional[str] = None) -> str:
+        snapshot = self.snapshot()
+        lines: List[str] = [f"uptime: {snapshot['uptime']:.0f}s"]
+        for name, value in sorted(snapshot['counters'].items()):
+            if not prefix or name.startswith(prefix):
+                lines.append(f"{name}: {value}")
+        for name, value in sorted(snapshot['gauges'].items()):
+            if not prefix or name.startswith(prefix):
+                lines.append(f"{name}: {value:g}")
+        for name, s in sorted(snapshot['histograms'].items()):
+            if not prefix or name.startswith(prefix):
+                lines.append(
+                    f"{name}: n={s['count']} p50={s['p50'] * 1000:.1f}ms "
+                    f"p99={s['p99'] * 1000:.1f}ms max={s['max'] * 1000:.1f}ms"
+                )
+        return "\n".join(lines)
+
+
+metrics = Metrics()
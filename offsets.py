@@ -0,0 +1,108 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Set
+from telegram import Update
+from telegram.ext import Application, ApplicationHandlerStop, ContextTypes
+from config import UPDATE_STATE_FILE, CATCHUP_RATE, CATCHUP_GRACE_SECONDS, UPDATE_ID_RESET_SECONDS
+from metrics import metrics
+
+
+class OffsetTracker:
+    """Remembers how far update processing got, across restarts.
+
+    `gate` runs before every other handler: it drops updates that were
+    already processed, paces messages and channel posts that piled up while
+    the bot was down, and once the application is stopping it sets remaining updates
+    aside instead of handling them. `mark_done` runs after every other
+    handler. Set-aside updates and the last processed update id are written
+    to UPDATE_STATE_FILE on shutdown and resumed on the next start.
+
+    Updates handled concurrently can finish out of order. That is safe here
+    because Application.stop() waits for every update in progress before
+    post_stop saves, so nothing below the highest finished id is left undone.
+    """
+
+    def __init__(self, path: str = UPDATE_STATE_FILE, catchup_rate: float = CATCHUP_RATE):
+        self.path = path
+        self.catchup_interval = 1.0 / catchup_rate
+        self.last_update_id = 0
+        self.pending: List[Dict] = []
+        self._resuming: Set[int] = set()
+        self._started = time.time()
+        self._next_catchup = 0.0
+        self.logger = logging.getLogger(__name__)
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            state = json.load(f)
+        if time.time() - os.path.getmtime(self.path) < UPDATE_ID_RESET_SECONDS:
+            self.last_update_id = state.get('last_update_id', 0)
+        else:
+            # Update ids restart from a random value after a week of silence
+            self.logger.info("Update state is older than a week, not skipping by update id")
+        self.pending = state.get('pending_updates', [])
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'last_update_id': self.last_update_id, 'pending_updates': self.pending}, f)
+        os.replace(tmp_path, self.path)
+        self.logger.info(
+            "Saved update offset %s with %d updates to resume", self.last_update_id, len(self.pending)
+        )
+
+    async def resume(self, application: Application) -> None:
+        """Queue the updates set aside at the last shutdown ahead of anything new."""
+        pending, self.pending = self.pending, []
+        for data in pending:
+            update = Update.de_json(data, application.bot)
+            self._resuming.add(update.update_id)
+            await application.update_queue.put(update)
+        if pending:
+            self.logger.info("Resuming %d updates left over from the last shutdown", len(pending))
+
+    def set_aside(self, data: Dict) -> None:
+        self.pending.append(data)
+        metrics.incr("updates.set_aside")
+
+    def set_aside_posts(self, posts: Iterable) -> None:
+        """Keep channel posts whose fan-out never started, as synthetic updates with negative ids."""
+        next_id = min([0] + [data['update_id'] for data in self.pending]) - 1
+        for post in posts:
+            self.set_aside({'update_id': next_id, 'channel_post': post.to_dict()})
+            next_id -= 1
+
+    async def gate(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        update_id = update.update_id
+        resumed = update_id in self._resuming
+        self._resuming.discard(update_id)
+
+        if not context.application.running:
+            self.set_aside(update.to_dict())
+            raise ApplicationHandlerStop
+
+        if not resumed and update_id <= self.last_update_id:
+            metrics.incr("updates.duplicate")
+            raise ApplicationHandlerStop
+
+        # Only the message itself was sent while the bot was down; a callback
+        # query's message is the bot's own and can be arbitrarily old
+        message = update.message or update.edited_message or update.channel_post or update.edited_channel_post
+        sent_at = message and (message.edit_date or message.date)
+        if sent_at and sent_at.timestamp() < self._started - CATCHUP_GRACE_SECONDS:
+            # Backlog from while the bot was down: catch up at a bounded rate
+            now = time.monotonic()
+            self._next_catchup = max(self._next_catchup, now) + self.catchup_interval
+            metrics.incr("updates.catchup")
+            if self._next_catchup - self.catchup_interval > now:
+                await asyncio.sleep(self._next_catchup - self.catchup_interval - now)
+
+    async def mark_done(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if update.update_id > self.last_update_id:
+            self.last_update_id = update.update_id
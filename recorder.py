@@ -0,0 +1,61 @@
+import gzip
+import json
+import logging
+import time
+from typing import Iterator, Optional, Tuple
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+FLUSH_EVERY = 100
+
+
+class UpdateRecorder:
+    """Appends every incoming update to a gzipped JSON-lines file for offline replay.
+
+    Each line is `[seconds since the first recorded update, update dict]`.
+    Recordings contain user messages verbatim, so only enable this where
+    that is acceptable.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._started: Optional[float] = None
+        self._pending = 0
+        self.recorded = 0
+
+    async def record(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+        self._file.write(json.dumps(
+            [round(now - self._started, 3), update.to_dict()],
+            ensure_ascii=False, separators=(',', ':')
+        ))
+        self._file.write('\n')
+        self.recorded += 1
+        self._pending += 1
+        if self._pending >= FLUSH_EVERY:
+            self._file.flush()
+            self._pending = 0
+
+    def close(self) -> None:
+        self._file.close()
+        logger.info("Recorded %d updates to %s", self.recorded, self.path)
+
+
+def read_recording(path: str) -> Iterator[Tuple[float, dict]]:
+    """Yield (offset, update dict) pairs; sessions appended to one file are laid end to end."""
+    base = last = 0.0
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            offset, data = json.loads(line)
+            if offset + base < last:
+                # A new recording session started counting from zero
+                base = last
+            last = offset + base
+            yield last, data
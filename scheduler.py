@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+from metrics import metrics
+from tenants import current_tenant
+
+# Users are waiting on these: commands, button clicks, DMs
+INTERACTIVE = 'interactive'
+# Channel fan-out, digests, edits and other background work
+BULK = 'bulk'
+
+
+class LaneScheduler:
+    """Shares a fixed number of backend slots between an interactive and a bulk lane.
+
+    Interactive work may use any free slot. Bulk work may only use the slots
+    left after `reserved` have been set aside for interactive work, so a
+    fan-out storm can never occupy the whole backend. Freed slots go to
+    waiting interactive work first. The capacity can change at runtime
+    (set_capacity); the reservation shrinks with it so bulk keeps a slot.
+    Within a lane, bots sharing the service (tenants) that have work waiting
+    take turns, so one bot's backlog cannot starve the others.
+    """
+
+    def __init__(self, capacity: int, reserved: int):
+        if not 0 <= reserved < capacity:
+            raise ValueError("reserved interactive slots must leave room for bulk work")
+        self.capacity = capacity
+        self.reserved = reserved
+        self.max_reserved = reserved
+        self.in_use: Dict[str, int] = {INTERACTIVE: 0, BULK: 0}
+        # lane -> tenant -> waiting work, in arrival order
+        self.waiters: Dict[str, Dict[str, Deque[asyncio.Future]]] = {INTERACTIVE: {}, BULK: {}}
+        # Tenants with work waiting in each lane, in the order of their next turn
+        self._turns: Dict[str, Deque[str]] = {INTERACTIVE: deque(), BULK: deque()}
+        self._queued: Dict[str, int] = {INTERACTIVE: 0, BULK: 0}
+
+    def _can_run(self, lane: str) -> bool:
+        if self.in_use[INTERACTIVE] + self.in_use[BULK] >= self.capacity:
+            return False
+        return lane == INTERACTIVE or self.in_use[BULK] < self.capacity - self.reserved
+
+    def set_capacity(self, capacity: int) -> None:
+        # Work already running keeps its slot; a lower capacity only delays new work
+        self.capacity = max(1, capacity)
+        self.reserved = min(self.max_reserved, self.capacity - 1)
+        self._wake()
+
+    def queued(self, lane: str) -> int:
+        return self._queued[lane]
+
+    def _wake(self) -> None:
+        for lane in (INTERACTIVE, BULK):
+            turns = self._turns[lane]
+            while turns and self._can_run(lane):
+                tenant = turns.popleft()
+                waiters = self.waiters[lane][tenant]
+                future = waiters.popleft()
+                self._queued[lane] -= 1
+                if waiters:
+                    turns.append(tenant)
+                else:
+                    del self.waiters[lane][tenant]
+                if not future.done():
+                    self.in_use[lane] += 1
+                    future.set_result(None)
+
+    async def _acquire(self, lane: str, tenant: str) -> None:
+        if not self._queued[lane] and self._can_run(lane):
+            self.in_use[lane] += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        waiters = self.waiters[lane].get(tenant)
+        if waiters is None:
+            waiters = self.waiters[lane][tenant] = deque()
+            self._turns[lane].append(tenant)
+        waiters.append(future)
+        self._queued[lane] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as we were cancelled: hand it on
+                self.release(lane)
+            elif future in waiters:
+                # Still queued; if _wake popped it already, it did the bookkeeping too
+                waiters.remove(future)
+                self._queued[lane] -= 1
+                if not waiters:
+                    del self.waiters[lane][tenant]
+                    self._turns[lane].remove(tenant)
+            raise
+
+    def release(self, lane: str) -> None:
+        self.in_use[lane] -= 1
+        self._wake()
+
+    async def acquire(self, lane: str) -> None:
+        """Wait for a slot in `lane`; the caller must release() it when done."""
+        tenant = current_tenant.get()
+        enqueued = time.perf_counter()
+        await self._acquire(lane, tenant)
+        waited = time.perf_counter() - enqueued
+        metrics.observe(f"lane.{lane}.wait", waited)
+        metrics.observe(f"tenant.{tenant}.translate_wait", waited)
+        metrics.set_gauge(f"lane.{lane}.queued", self._queued[lane])
+
+    @asynccontextmanager
+    async def slot(self, lane: str):
+        await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release(lane)
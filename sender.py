@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+from telegram.error import RetryAfter
+from config import SEND_RATE_PER_SECOND, SEND_BURST, SEND_PER_CHAT_INTERVAL, SEND_MAX_TRACKED_CHATS
+from metrics import metrics
+from tenants import current_tenant
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    # PTB may report retry_after as int seconds or as a timedelta
+    value = error.retry_after
+    return value.total_seconds() if hasattr(value, 'total_seconds') else float(value)
+
+
+class PacedSender:
+    """Outbound Bot API calls paced to stay under Telegram's flood limits.
+
+    A global GCRA limiter keeps the bot below SEND_RATE_PER_SECOND (with a
+    small burst allowance) and each chat gets at most one message every
+    SEND_PER_CHAT_INTERVAL seconds. A RetryAfter answer pauses all sends for
+    the requested time and the call is retried once.
+    """
+
+    def __init__(self, rate: float = SEND_RATE_PER_SECOND, burst: int = SEND_BURST,
+                 per_chat_interval: float = SEND_PER_CHAT_INTERVAL):
+        self.interval = 1.0 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self.per_chat_interval = per_chat_interval
+        self._tat = 0.0
+        self._chat_next: Dict[int, float] = {}
+        self.logger = logging.getLogger(__name__)
+
+    async def _wait_turn(self, chat_id: int) -> None:
+        now = time.monotonic()
+        chat_at = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = chat_at + self.per_chat_interval
+        if len(self._chat_next) > SEND_MAX_TRACKED_CHATS:
+            self._chat_next = {cid: at for cid, at in self._chat_next.items() if at > now}
+
+        start = max(chat_at, self._tat - self.tolerance)
+        self._tat = max(self._tat, start) + self.interval
+        wait = start - now
+        if wait > 0:
+            metrics.observe("send.wait", wait)
+            await asyncio.sleep(wait)
+
+    async def _call(self, target_chat: int, func, **kwargs):
+        await self._wait_turn(target_chat)
+        try:
+            result = await func(**kwargs)
+        except RetryAfter as e:
+            delay = retry_after_seconds(e)
+            metrics.incr("send.retry_after")
+            self.logger.warning("Flood control hit, pausing sends for %.1fs", delay)
+            self._tat = max(self._tat, time.monotonic() + delay)
+            await self._wait_turn(target_chat)
+            result = await func(**kwargs)
+        metrics.incr("send.calls")
+        metrics.incr(f"tenant.{current_tenant.get()}.sends")
+        return result
+
+    async def send_message(self, bot, chat_id: int, text: str, **kwargs):
+        return await self._call(chat_id, bot.send_message, chat_id=chat_id, text=text, **kwargs)
+
+    async def edit_message_text(self, bot, chat_id: int, message_id: int, text: str, **kwargs):
+        return await self._call(
+            chat_id, bot.edit_message_text, chat_id=chat_id, message_id=message_id, text=text, **kwargs
+        )
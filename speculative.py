@@ -0,0 +1,61 @@
+import asyncio
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+from metrics import metrics
+from tenants import current_tenant, tenant_context
+
+
+class SpeculativeCache:
+    """Background work started ahead of a likely request, keyed by what will ask for it.
+
+    Every entry is cancelled and dropped after `ttl` seconds or when the cache
+    is full, so unused speculation cannot pile up. Hits, misses and wasted
+    work are counted under `speculative.*`.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: 'OrderedDict[Hashable, Tuple[asyncio.Task, asyncio.TimerHandle]]' = OrderedDict()
+        self.hits = 0
+        self.lookups = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def start(self, key: Hashable, coro) -> None:
+        self.cancel(key)
+        while len(self.entries) >= self.max_entries:
+            oldest = next(iter(self.entries))
+            self._discard(oldest, "speculative.evicted")
+
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(coro, context=tenant_context(current_tenant.get()))
+        expiry = loop.call_later(self.ttl, self._discard, key, "speculative.expired")
+        self.entries[key] = (task, expiry)
+        metrics.incr("speculative.started")
+
+    def take(self, key: Hashable) -> Optional[asyncio.Task]:
+        """Hand the speculative task for `key` to the caller, who now owns it."""
+        self.lookups += 1
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            metrics.incr("speculative.misses")
+        else:
+            task, expiry = entry
+            expiry.cancel()
+            self.hits += 1
+            metrics.incr("speculative.hits" if task.done() else "speculative.hits_pending")
+        metrics.set_gauge("speculative.hit_rate", self.hits / self.lookups)
+        return entry[0] if entry else None
+
+    def cancel(self, key: Hashable) -> None:
+        self._discard(key, "speculative.cancelled")
+
+    def _discard(self, key: Hashable, counter: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            task, expiry = entry
+            expiry.cancel()
+            task.cancel()
+            metrics.incr(counter)
@@ -1,12 +1,89 @@
+import asyncio
 import json
 import os
-from typing import Dict, List, Optional
-from config import USER_DATA_FILE, CHANNEL_DATA_FILE
+import sys
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from config import USER_DATA_FILE, CHANNEL_DATA_FILE, STORAGE_SAVE_DELAY
+from instrumentation import stage
+
+DEFAULT_LANGUAGE = 'en'
+
+
+class UserRecord:
+    """Compact per-user preferences; one instance per known user.
+
+    Subscriptions are an ordered tuple here (small, keeps /list order); the
+    set-based channel -> users index in Storage answers membership checks.
+    """
+
+    __slots__ = ('target_language', 'subscribed_channels', 'notifications_enabled', 'digest_enabled',
+                 'progressive_enabled')
+
+    def __init__(self, target_language: str = DEFAULT_LANGUAGE,
+                 subscribed_channels: Iterable[str] = (),
+                 notifications_enabled: bool = True,
+                 digest_enabled: bool = False,
+                 progressive_enabled: bool = False):
+        self.target_language = sys.intern(target_language)
+        self.subscribed_channels: Tuple[str, ...] = tuple(
+            dict.fromkeys(sys.intern(channel) for channel in subscribed_channels)
+        )
+        self.notifications_enabled = bool(notifications_enabled)
+        self.digest_enabled = bool(digest_enabled)
+        # Get the original post right away, edited into the translation once it is ready
+        self.progressive_enabled = bool(progressive_enabled)
+
+    @classmethod
+    def from_dict(cls, preferences: Dict) -> 'UserRecord':
+        return cls(
+            preferences.get('target_language', DEFAULT_LANGUAGE),
+            preferences.get('subscribed_channels', ()),
+            preferences.get('notifications_enabled', True),
+            preferences.get('digest_enabled', False),
+            preferences.get('progressive_enabled', False)
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            'target_language': self.target_language,
+            'subscribed_channels': list(self.subscribed_channels),
+            'notifications_enabled': self.notifications_enabled,
+            'digest_enabled': self.digest_enabled,
+            'progressive_enabled': self.progressive_enabled
+        }
+
 
 class Storage:
-    def __init__(self):
-        self.user_data: Dict = self._load_data(USER_DATA_FILE)
-        self.channel_data: Dict = self._load_data(CHANNEL_DATA_FILE)
+    """User and channel data, kept in memory and written to JSON files.
+
+    Writes are debounced: changes made within STORAGE_SAVE_DELAY seconds of
+    each other are saved together. Call flush() to write pending changes now.
+    Every change happens under one lock, so updates handled concurrently (and
+    other threads) never see or save a half-applied change; use
+    update_user_preferences() instead of a get/set pair.
+    """
+
+    def __init__(self, user_data_file: str = USER_DATA_FILE,
+                 channel_data_file: str = CHANNEL_DATA_FILE,
+                 save_delay: float = STORAGE_SAVE_DELAY):
+        self.user_data_file = user_data_file
+        self.channel_data_file = channel_data_file
+        self.save_delay = save_delay
+        self._lock = threading.RLock()
+        self._dirty: Set[str] = set()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.users: Dict[int, UserRecord] = {}
+        # Reverse index used to route channel posts: channel id -> user ids
+        self.subscribers: Dict[str, Set[int]] = {}
+        self.load_users(self._load_data(user_data_file))
+        # Channel metadata keyed by numeric id: {'title': ..., 'username': '@name'}
+        self.channel_data: Dict[str, Dict] = self._load_data(channel_data_file)
+        # @username (lowercase) -> numeric channel id
+        self.channel_aliases: Dict[str, str] = {
+            info['username'].lower(): channel_id
+            for channel_id, info in self.channel_data.items() if info.get('username')
+        }
 
     def _load_data(self, filename: str) -> Dict:
         if os.path.exists(filename):
@@ -15,33 +92,192 @@ class Storage:
         return {}
 
     def _save_data(self, data: Dict, filename: str) -> None:
-        with open(filename, 'w') as f:
+        # Write a temp file and swap it in, so a crash mid-write keeps the old file
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, 'w') as f:
             json.dump(data, f, indent=4)
+        os.replace(tmp_filename, filename)
+
+    def _schedule_save(self, kind: str) -> None:
+        self._dirty.add(kind)
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, benchmarks): nothing to debounce against
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self.save_delay, self.flush)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                return
+            with stage('storage_write'):
+                if 'users' in dirty:
+                    self._save_data(self.user_data, self.user_data_file)
+                if 'channels' in dirty:
+                    self._save_data(self.channel_data, self.channel_data_file)
+
+    def load_users(self, data: Dict) -> None:
+        with self._lock:
+            for uid, preferences in data.items():
+                self._put_user(int(uid), UserRecord.from_dict(preferences))
+
+    def _save_users(self) -> None:
+        self._schedule_save('users')
+
+    def _put_user(self, user_id: int, record: UserRecord) -> None:
+        old = self.users.get(user_id)
+        old_channels = old.subscribed_channels if old else ()
+        for channel_id in old_channels:
+            if channel_id not in record.subscribed_channels:
+                self._unindex(user_id, channel_id)
+        for channel_id in record.subscribed_channels:
+            self.subscribers.setdefault(channel_id, set()).add(user_id)
+        self.users[user_id] = record
+
+    def _unindex(self, user_id: int, channel_id: str) -> None:
+        users = self.subscribers.get(channel_id)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del self.subscribers[channel_id]
+
+    @property
+    def user_data(self) -> Dict:
+        # Legacy JSON layout, built on demand for persistence and old callers
+        return {str(uid): record.to_dict() for uid, record in self.users.items()}
+
+    def get_user(self, user_id: int) -> Optional[UserRecord]:
+        return self.users.get(int(user_id))
+
+    def get_target_language(self, user_id: int) -> str:
+        record = self.users.get(int(user_id))
+        return record.target_language if record else DEFAULT_LANGUAGE
 
     def get_user_preferences(self, user_id: int) -> Dict:
-        return self.user_data.get(str(user_id), {
-            'target_language': 'en',
-            'subscribed_channels': [],
-            'notifications_enabled': True
-        })
+        record = self.users.get(int(user_id))
+        if record is None:
+            return {
+                'target_language': DEFAULT_LANGUAGE,
+                'subscribed_channels': [],
+                'notifications_enabled': True,
+                'digest_enabled': False,
+                'progressive_enabled': False
+            }
+        return record.to_dict()
 
     def set_user_preferences(self, user_id: int, preferences: Dict) -> None:
-        self.user_data[str(user_id)] = preferences
-        self._save_data(self.user_data, USER_DATA_FILE)
+        with self._lock:
+            self._put_user(int(user_id), UserRecord.from_dict(preferences))
+            self._save_users()
+
+    def update_user_preferences(self, user_id: int, **changes) -> Dict:
+        """Change some preferences in one step; returns the new preferences."""
+        with self._lock:
+            preferences = self.get_user_preferences(user_id)
+            preferences.update(changes)
+            self.set_user_preferences(user_id, preferences)
+            return preferences
 
     def add_channel_subscription(self, user_id: int, channel_id: str) -> None:
-        if str(user_id) not in self.user_data:
-            self.user_data[str(user_id)] = self.get_user_preferences(user_id)
-        
-        if channel_id not in self.user_data[str(user_id)]['subscribed_channels']:
-            self.user_data[str(user_id)]['subscribed_channels'].append(channel_id)
-            self._save_data(self.user_data, USER_DATA_FILE)
+        user_id = int(user_id)
+        with self._lock:
+            record = self.users.get(user_id)
+            if record is None:
+                record = UserRecord()
+                self.users[user_id] = record
+
+            if channel_id not in record.subscribed_channels:
+                channel_id = sys.intern(channel_id)
+                record.subscribed_channels += (channel_id,)
+                self.subscribers.setdefault(channel_id, set()).add(user_id)
+                self._save_users()
 
     def remove_channel_subscription(self, user_id: int, channel_id: str) -> None:
-        if str(user_id) in self.user_data:
-            if channel_id in self.user_data[str(user_id)]['subscribed_channels']:
-                self.user_data[str(user_id)]['subscribed_channels'].remove(channel_id)
-                self._save_data(self.user_data, USER_DATA_FILE)
+        with self._lock:
+            record = self.users.get(int(user_id))
+            if record is not None and channel_id in record.subscribed_channels:
+                record.subscribed_channels = tuple(
+                    channel for channel in record.subscribed_channels if channel != channel_id
+                )
+                self._unindex(int(user_id), channel_id)
+                self._save_users()
 
     def get_subscribed_channels(self, user_id: int) -> List[str]:
-        return self.get_user_preferences(user_id).get('subscribed_channels', [])
+        record = self.users.get(int(user_id))
+        return list(record.subscribed_channels) if record else []
+
+    def is_subscribed(self, user_id: int, channel_id: str) -> bool:
+        return int(user_id) in self.subscribers.get(channel_id, ())
+
+    def get_channel_subscribers(self, channel_id: str) -> FrozenSet[int]:
+        with self._lock:
+            return frozenset(self.subscribers.get(channel_id, ()))
+
+    def _save_channels(self) -> None:
+        self._schedule_save('channels')
+
+    def set_channel_info(self, channel_id: str, title: Optional[str], username: Optional[str]) -> None:
+        with self._lock:
+            info = self.channel_data.setdefault(channel_id, {})
+            if info.get('title') == title and info.get('username') == username:
+                return
+            old_username = info.get('username')
+            if old_username and self.channel_aliases.get(old_username.lower()) == channel_id:
+                del self.channel_aliases[old_username.lower()]
+            info['title'] = title
+            info['username'] = username
+            if username:
+                self.channel_aliases[username.lower()] = channel_id
+            self._save_channels()
+
+    def get_channel_info(self, channel_id: str) -> Dict:
+        return self.channel_data.get(channel_id, {})
+
+    def get_channel_languages(self, channel_id: str) -> List[str]:
+        return self.channel_data.get(channel_id, {}).get('languages', [])
+
+    def record_channel_language(self, channel_id: str, language: str, window: int) -> None:
+        with self._lock:
+            languages = self.channel_data.setdefault(channel_id, {}).setdefault('languages', [])
+            languages.append(sys.intern(language))
+            del languages[:-window]
+            self._save_channels()
+
+    def resolve_channel_ref(self, channel_ref: str) -> str:
+        """Map a known @username to its numeric id; anything else is returned unchanged."""
+        if channel_ref.startswith('@'):
+            return self.channel_aliases.get(channel_ref.lower(), channel_ref)
+        return channel_ref
+
+    def channel_label(self, channel_id: str) -> str:
+        info = self.channel_data.get(channel_id)
+        if not info:
+            return channel_id
+        return info.get('username') or info.get('title') or channel_id
+
+    def legacy_channel_refs(self) -> List[str]:
+        """Subscriptions still stored as @username instead of a numeric id."""
+        return [channel_id for channel_id in self.subscribers if channel_id.startswith('@')]
+
+    def rename_channel(self, old_id: str, new_id: str) -> int:
+        """Move every subscription from `old_id` to `new_id` with a single write."""
+        with self._lock:
+            user_ids = self.subscribers.pop(old_id, set())
+            new_id = sys.intern(new_id)
+            for user_id in user_ids:
+                record = self.users[user_id]
+                record.subscribed_channels = tuple(dict.fromkeys(
+                    new_id if channel == old_id else channel for channel in record.subscribed_channels
+                ))
+                self.subscribers.setdefault(new_id, set()).add(user_id)
+            if user_ids:
+                self._save_users()
+            return len(user_ids)
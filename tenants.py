@@ -0,0 +1,38 @@
+import contextvars
+import os
+from contextvars import ContextVar
+from typing import Dict, Optional
+from config import TENANT_DATA_DIR
+
+# The bot a single-bot deployment runs as; its files stay where they always were
+DEFAULT_TENANT = 'default'
+
+# Which bot the update being handled belongs to; set by the update processor
+# and carried into background work, so shared services can account per bot
+current_tenant: ContextVar[str] = ContextVar('tenant', default=DEFAULT_TENANT)
+
+
+def parse_bot_tokens(spec: str, default_token: str) -> Dict[str, str]:
+    """'name=token,name2=token2' -> {name: token}; a single default bot when empty."""
+    tokens = {}
+    for item in spec.split(','):
+        if item.strip():
+            name, _, token = item.partition('=')
+            tokens[name.strip()] = token.strip()
+    return tokens or {DEFAULT_TENANT: default_token}
+
+
+def tenant_file(tenant: str, filename: Optional[str]) -> Optional[str]:
+    """Where `tenant` keeps `filename`: TENANT_DATA_DIR/<tenant>/, except for the default bot."""
+    if filename is None or tenant == DEFAULT_TENANT:
+        return filename
+    directory = os.path.join(TENANT_DATA_DIR, tenant)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(filename))
+
+
+def tenant_context(tenant: str) -> contextvars.Context:
+    """A fresh context (no update trace or deadline) that still belongs to `tenant`."""
+    context = contextvars.Context()
+    context.run(current_tenant.set, tenant)
+    return context
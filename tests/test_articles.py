@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from article_server import start_server
+from articles import Article, ArticleFetcher
+from metrics import metrics
+
+TIMEOUT = 0.5
+
+
+@pytest.fixture(scope='module')
+def base():
+    server = start_server(slow_seconds=TIMEOUT * 4)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def fetch(url, allow_private=True):
+    async def main():
+        fetcher = ArticleFetcher(2, TIMEOUT, 1024 * 1024, 300, ttl=60, max_entries=10)
+        fetcher.allow_private = allow_private
+        try:
+            return await fetcher.get(url)
+        finally:
+            await fetcher.close()
+
+    return asyncio.run(main())
+
+
+def counter(name):
+    return metrics.counters.get(name, 0)
+
+
+def test_article_is_extracted_through_a_redirect(base):
+    article = fetch(f"{base}/redirect/3")
+    assert article.excerpt.startswith("en: Story number 3\n")
+
+
+def test_missing_page_is_a_fetch_error(base):
+    errors = counter('articles.fetch_errors')
+    assert fetch(f"{base}/missing/1").excerpt is None
+    assert counter('articles.fetch_errors') == errors + 1
+
+
+def test_non_html_page_gives_no_excerpt(base):
+    errors = counter('articles.fetch_errors')
+    assert fetch(f"{base}/file/1").excerpt is None
+    assert counter('articles.fetch_errors') == errors
+
+
+def test_slow_page_times_out(base):
+    errors = counter('articles.fetch_errors')
+    assert fetch(f"{base}/slow/1").excerpt is None
+    assert counter('articles.fetch_errors') == errors + 1
+
+
+def test_loopback_address_is_refused(base):
+    blocked = counter('articles.blocked')
+    assert fetch(f"{base}/article/1", allow_private=False).excerpt is None
+    assert counter('articles.blocked') == blocked + 1
+
+
+def test_failed_excerpt_translation_is_retried():
+    article = Article("http://example.com/", "Some excerpt.")
+    results = iter([None, "[vi] Some excerpt."])
+
+    async def translate(text, language):
+        return next(results)
+
+    async def main():
+        first = await article.translated('vi', translate)
+        second = await article.translated('vi', translate)
+        return first, second
+
+    assert asyncio.run(main()) == (None, "[vi] Some excerpt.")
+    assert 'vi' in article.translations
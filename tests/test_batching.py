@@ -0,0 +1,63 @@
+import asyncio
+
+from batching import BatchDispatcher
+
+
+class RecordingSend:
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    async def __call__(self, key, texts):
+        self.calls.append((key, list(texts)))
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        return [f"{key}:{text}" for text in texts]
+
+
+def test_texts_within_the_window_share_one_call():
+    send = RecordingSend()
+    batcher = BatchDispatcher(send, window=0.05, max_size=10, max_chars=1000)
+
+    async def scenario():
+        results = await asyncio.gather(
+            batcher.submit('vi', "a"), batcher.submit('vi', "b"), batcher.submit('vi', "a"),
+            batcher.submit('ja', "a"),
+        )
+        assert len(batcher) == 0
+        return results
+
+    assert asyncio.run(scenario()) == ["vi:a", "vi:b", "vi:a", "ja:a"]
+    # Duplicates share a slot; different keys never share a call
+    assert sorted(send.calls) == [('ja', ["a"]), ('vi', ["a", "b"])]
+
+
+def test_full_batches_are_sent_before_the_window_ends():
+    send = RecordingSend()
+    batcher = BatchDispatcher(send, window=10, max_size=2, max_chars=8)
+
+    async def scenario():
+        by_size = asyncio.gather(batcher.submit('vi', "a"), batcher.submit('vi', "b"))
+        assert await asyncio.wait_for(by_size, 1) == ["vi:a", "vi:b"]
+        # "cccc" would not fit beside "dddddddd", which fills a batch on its own
+        by_chars = asyncio.gather(batcher.submit('vi', "cccc"), batcher.submit('vi', "dddddddd"))
+        await asyncio.wait_for(by_chars, 1)
+
+    asyncio.run(scenario())
+    assert send.calls == [('vi', ["a", "b"]), ('vi', ["cccc"]), ('vi', ["dddddddd"])]
+
+
+def test_a_failed_call_reaches_every_waiter():
+    send = RecordingSend(error=RuntimeError("backend down"))
+    batcher = BatchDispatcher(send, window=0.01, max_size=10, max_chars=1000)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.submit('vi', "a"), batcher.submit('vi', "a"), batcher.submit('vi', "b"),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+    assert len(send.calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
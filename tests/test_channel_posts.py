@@ -0,0 +1,201 @@
+import asyncio
+import time
+
+from telegram import Update
+
+from admission import DEFER_BULK, NORMAL
+import handlers
+from fakes import FakeBotAPI, FakeTranslator, build_application, channel_id_for
+
+CHANNEL = channel_id_for("@news")
+
+
+class RecordingBotAPI(FakeBotAPI):
+    """FakeBotAPI that keeps the text of every message sent and edited, in order."""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+        self.edited = []
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        params = request_data.parameters if request_data else {}
+        if url.endswith('/sendMessage'):
+            self.sent.append(params.get('text'))
+        elif url.endswith('/editMessageText'):
+            self.edited.append(params.get('text'))
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+class SlowTranslator(FakeTranslator):
+    """Detects at once, takes seconds to translate."""
+
+    def translate(self, text, dest='en', src='auto'):
+        time.sleep(2.0)
+        return super().translate(text, dest, src)
+
+
+def channel_post(update_id, message_id, text, edited=False):
+    return {'update_id': update_id, 'edited_channel_post' if edited else 'channel_post': {
+        'message_id': message_id, 'date': int(time.time()),
+        'chat': {'id': CHANNEL, 'type': 'channel', 'title': 'News'}, 'text': text
+    }}
+
+
+async def settle(handler):
+    while handler.background_tasks:
+        await asyncio.gather(*handler.background_tasks, return_exceptions=True)
+
+
+def run_bot(scenario, subscribers, send_rate=None):
+    api = RecordingBotAPI()
+
+    async def main():
+        application, handler = build_application(api, FakeTranslator(), send_rate=send_rate)
+        for uid in range(1, subscribers + 1):
+            handler.storage.update_user_preferences(uid, target_language='vi')
+            handler.storage.add_channel_subscription(uid, str(CHANNEL))
+        await application.initialize()
+
+        async def process(data):
+            await application.process_update(Update.de_json(data, application.bot))
+
+        try:
+            await scenario(handler, process)
+            await settle(handler)
+        finally:
+            await application.shutdown()
+            handler.translator.executor.shutdown()
+
+    asyncio.run(main())
+    return api
+
+
+def test_edit_during_fan_out_reaches_every_subscriber(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario(handler, process):
+        await process(channel_post(1, 10, "en: original"))
+        # Sends are paced at 200/s, so the fan-out is still going
+        await asyncio.sleep(0.2)
+        await process(channel_post(2, 10, "en: corrected", edited=True))
+
+    api = run_bot(scenario, subscribers=100, send_rate=200)
+    assert len(api.sent) == 100
+    assert len(api.edited) == 100
+    assert all("corrected" in text for text in api.edited)
+
+
+def test_two_edits_apply_in_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario(handler, process):
+        await process(channel_post(1, 10, "en: first"))
+        await process(channel_post(2, 10, "en: second", edited=True))
+        await process(channel_post(3, 10, "en: third", edited=True))
+
+    api = run_bot(scenario, subscribers=20, send_rate=500)
+    assert len(api.edited) == 40
+    assert all("third" in text for text in api.edited[-20:])
+
+
+def test_channel_posts_are_delivered_in_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    backend = FakeTranslator(latency=0.2)
+
+    async def scenario(handler, process):
+        handler.translator.translator = backend
+        # The second post's translation is cached, so it would be ready first
+        handler.translator.cache.put('t', 'en', 'vi', "en: B", "[vi] en: B")
+        handler.translator.cache.put('s', 'en', 'vi', "en: B", "[vi] en: B")
+        await process(channel_post(1, 10, "en: A first"))
+        await process(channel_post(2, 11, "en: B"))
+
+    api = run_bot(scenario, subscribers=1)
+    assert [text.rsplit('\n', 1)[-1] for text in api.sent] == ['[vi] en: A first', '[vi] en: B']
+
+
+def test_parked_posts_keep_their_edits_and_channel_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario(handler, process):
+        handler.admission.level = DEFER_BULK
+        await process(channel_post(1, 10, "en: A"))
+        await process(channel_post(2, 10, "en: A edited", edited=True))
+        handler.admission.level = NORMAL
+        # Arrives after the overload is over, but its channel still has a parked post
+        await process(channel_post(3, 11, "en: B"))
+        assert list(handler.deferred_posts) == [(str(CHANNEL), 10), (str(CHANNEL), 11)]
+
+        monkeypatch.setattr(handler.admission, 'update', lambda: NORMAL)
+        resume = asyncio.create_task(handler.run_admission_loop())
+        await asyncio.sleep(1.2)
+        resume.cancel()
+        assert not handler.deferred_posts
+
+    api = run_bot(scenario, subscribers=1)
+    assert [text.rsplit('\n', 1)[-1] for text in api.sent] == ['[vi] en: A edited', '[vi] en: B']
+    assert api.edited == []
+
+
+def test_progressive_delivery_stops_waiting_for_a_late_translation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(handlers, 'PROGRESSIVE_TRANSLATION_TIMEOUT', 0.2)
+    backend = SlowTranslator()
+
+    async def scenario(handler, process):
+        handler.translator.translator = backend
+        handler.storage.update_user_preferences(1, progressive_enabled=True)
+        start = time.monotonic()
+        await process(channel_post(1, 10, "en: breaking"))
+        await settle(handler)
+        assert time.monotonic() - start < 1.5
+
+    api = run_bot(scenario, subscribers=1)
+    assert [text.rsplit('\n', 1)[-1] for text in api.sent] == ["en: breaking"]
+    assert api.edited == []
+
+
+def test_progressive_subscriber_in_the_post_language_gets_the_original(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario(handler, process):
+        handler.storage.update_user_preferences(1, target_language='en', progressive_enabled=True)
+        await process(channel_post(1, 10, "en: hello"))
+
+    api = run_bot(scenario, subscribers=2)
+    # Subscriber 2 reads Vietnamese and gets the translation; subscriber 1
+    # reads English and only gets the original, which needs no edit
+    assert sorted(text.rsplit('\n', 1)[-1] for text in api.sent) == ["[vi] en: hello", "en: hello"]
+    assert api.edited == []
+
+
+class SourceRecordingTranslator(FakeTranslator):
+    """Keeps the source language every translate call was given."""
+
+    def __init__(self):
+        super().__init__()
+        self.sources = []
+
+    def translate(self, text, dest='en', src='auto'):
+        self.sources.append(src)
+        return super().translate(text, dest, src)
+
+
+def test_guessed_source_language_is_left_to_the_backend(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    backend = SourceRecordingTranslator()
+
+    async def scenario(handler, process):
+        handler.translator.translator = backend
+        # The profile is sure the channel posts English, but this post is French
+        for _ in range(handler.language_profiles.min_samples):
+            handler.language_profiles.record(str(CHANNEL), 'en')
+        await process(channel_post(1, 10, "fr: bonjour"))
+        await settle(handler)
+        await process(channel_post(2, 10, "fr: bonjour\nfr: le monde", edited=True))
+
+    api = run_bot(scenario, subscribers=1)
+    assert backend.calls['detect'] == 0
+    assert backend.sources and all(src == 'auto' for src in backend.sources)
+    assert len(api.sent) == 1 and len(api.edited) == 1
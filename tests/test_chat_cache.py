@@ -0,0 +1,77 @@
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+from telegram.error import BadRequest
+
+from chat_cache import ChatCache, ChatInfo
+from storage import Storage
+
+CHATS = {'@news': (-100, 'News', 'news'), '-100': (-100, 'News', 'news'), '@sport': (-200, 'Sport', 'Sport')}
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = Counter()
+
+    async def get_chat(self, chat_ref):
+        self.calls[str(chat_ref)] += 1
+        await asyncio.sleep(0.01)
+        # Usernames are case-insensitive
+        if str(chat_ref).lower() not in CHATS:
+            raise BadRequest("Chat not found")
+        chat_id, title, username = CHATS[str(chat_ref).lower()]
+        return SimpleNamespace(id=chat_id, title=title, username=username)
+
+
+def test_lookups_share_one_call_and_hit_by_id_or_username():
+    bot = FakeBot()
+    cache = ChatCache(ttl=60, max_entries=10)
+
+    async def scenario():
+        first, second = await asyncio.gather(cache.resolve(bot, '@News'), cache.resolve(bot, '@news'))
+        assert first is second
+        assert await cache.resolve(bot, -100) is first
+        return first
+
+    info = asyncio.run(scenario())
+    assert (info.id, info.title, info.username) == (-100, 'News', '@news')
+    assert sum(bot.calls.values()) == 1
+
+
+def test_expired_entries_are_fetched_again():
+    bot = FakeBot()
+    cache = ChatCache(ttl=60, max_entries=10)
+    info = ChatInfo(-100, 'News', 'news')
+    info.fetched -= 120
+    cache.put(info)
+    assert cache.get('@news') is None
+
+    asyncio.run(cache.resolve(bot, '@news'))
+    assert bot.calls['@news'] == 1
+
+
+def test_resolve_many_maps_failures_to_none():
+    bot = FakeBot()
+    cache = ChatCache(ttl=60, max_entries=10)
+    results = asyncio.run(cache.resolve_many(bot, ['@news', '@sport', '@gone'], concurrency=2))
+    assert results['@news'].id == -100
+    assert results['@sport'].username == '@Sport'
+    assert results['@gone'] is None
+
+
+def test_rename_channel_moves_subscriptions_in_one_step(tmp_path):
+    storage = Storage(str(tmp_path / 'users.json'), str(tmp_path / 'channels.json'), save_delay=0)
+    storage.add_channel_subscription(1, '@news')
+    storage.add_channel_subscription(1, '-100')
+    storage.add_channel_subscription(2, '@news')
+    storage.add_channel_subscription(3, '@sport')
+    assert sorted(storage.legacy_channel_refs()) == ['@news', '@sport']
+
+    assert storage.rename_channel('@news', '-100') == 2
+    # Already subscribed under the new id: no duplicate entry
+    assert storage.get_subscribed_channels(1) == ['-100']
+    assert storage.get_subscribed_channels(2) == ['-100']
+    assert storage.get_channel_subscribers('-100') == {1, 2}
+    assert storage.legacy_channel_refs() == ['@sport']
+    assert storage.rename_channel('@missing', '-300') == 0
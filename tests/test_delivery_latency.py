@@ -0,0 +1,18 @@
+from delivery_latency import DeliveryLatency, PostTimeline
+from metrics import metrics
+
+
+def test_time_before_fan_out_is_queue_time_not_detection():
+    metrics.histograms.clear()
+    latency = DeliveryLatency(max_channels=10, samples=100)
+    # Received at 101, parked until 105, detected at 105.5, translated 105.5-106
+    timeline = PostTimeline('-100', 1, published=100.0, received=101.0, started=105.0)
+    timeline.detected = 105.5
+    latency.record(timeline, 'vi', translating=105.5, translated=106.0, sends=[(106.0, 106.25)])
+
+    summary = metrics.snapshot()['histograms']
+    assert summary['delivery.stage.receive']['max'] == 1.0
+    assert summary['delivery.stage.detect']['max'] == 0.5
+    assert summary['delivery.stage.translate']['max'] == 0.5
+    assert summary['delivery.stage.queue']['max'] == 4.0
+    assert summary['delivery.stage.send']['max'] == 0.25
@@ -0,0 +1,52 @@
+from digest import MAX_MESSAGE_LENGTH, DigestBuffer, DigestPost, group_recipients, split_message
+
+
+def post(n):
+    return DigestPost('-100', 'News', f"post {n}", False)
+
+
+def test_posts_are_stored_once_and_users_hold_keys():
+    digest = DigestBuffer(max_posts_per_user=10, max_posts=10)
+    for uid in (1, 2, 3):
+        digest.add(('-100', 1), post(1), uid)
+    digest.add(('-100', 2), post(2), 1)
+
+    assert len(digest.posts) == 2
+    assert len(digest) == 3
+    assert list(digest.pending[1]) == [('-100', 1), ('-100', 2)]
+
+    posts, pending = digest.drain()
+    assert set(posts) == {('-100', 1), ('-100', 2)} and set(pending) == {1, 2, 3}
+    assert not digest.posts and not digest.pending
+
+
+def test_limits_drop_the_oldest_posts():
+    digest = DigestBuffer(max_posts_per_user=2, max_posts=3)
+    for n in range(1, 5):
+        digest.add(('-100', n), post(n), 1)
+
+    # Oldest post dropped from the shared store and from the user's queue
+    assert list(digest.posts) == [('-100', 2), ('-100', 3), ('-100', 4)]
+    assert list(digest.pending[1]) == [('-100', 3), ('-100', 4)]
+    assert digest.dropped == 3
+
+
+def test_users_with_the_same_language_and_posts_share_a_digest():
+    pending = {1: [('-100', 1), ('-100', 2)], 2: [('-100', 1), ('-100', 2)],
+               3: [('-100', 1)], 4: [('-100', 1), ('-100', 2)]}
+    languages = {1: 'vi', 2: 'vi', 3: 'vi', 4: 'ja'}
+
+    groups = group_recipients(pending, languages)
+    assert groups == {
+        ('vi', (('-100', 1), ('-100', 2))): [1, 2],
+        ('vi', (('-100', 1),)): [3],
+        ('ja', (('-100', 1), ('-100', 2))): [4],
+    }
+
+
+def test_split_message_respects_the_length_limit():
+    entries = ["x" * 1500 for _ in range(5)] + ["y" * (MAX_MESSAGE_LENGTH * 2)]
+    messages = split_message(entries, "Digest")
+    assert all(len(message) <= MAX_MESSAGE_LENGTH for message in messages)
+    assert all(message.startswith("Digest\n\n") for message in messages)
+    assert sum(message.count("x" * 1500) for message in messages) == 5
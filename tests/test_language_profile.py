@@ -0,0 +1,46 @@
+from language_profile import ChannelLanguageProfiles
+from metrics import metrics
+from storage import Storage
+
+
+def make_profiles(tmp_path, spot_check_every=3):
+    storage = Storage(str(tmp_path / 'users.json'), str(tmp_path / 'channels.json'), save_delay=0)
+    storage.add_channel_subscription(1, '-100')
+    return ChannelLanguageProfiles(storage, window=5, min_samples=3, confidence=0.8,
+                                   spot_check_every=spot_check_every)
+
+
+def test_language_is_trusted_once_enough_detections_agree(tmp_path):
+    profiles = make_profiles(tmp_path)
+    for _ in range(2):
+        profiles.record('-100', 'en')
+    assert profiles.dominant('-100') is None
+
+    profiles.record('-100', 'en')
+    assert profiles.dominant('-100') == 'en'
+
+    # One dissenting sample out of four is below the confidence bar
+    mismatches = metrics.counters.get('language_profile.mismatches', 0)
+    profiles.record('-100', 'fr')
+    assert metrics.counters['language_profile.mismatches'] == mismatches + 1
+    assert profiles.dominant('-100') is None
+
+
+def test_every_nth_guess_is_a_spot_check(tmp_path):
+    profiles = make_profiles(tmp_path, spot_check_every=3)
+    for _ in range(3):
+        profiles.record('-100', 'en')
+
+    assert [profiles.guess('-100') for _ in range(6)] == ['en', 'en', None, 'en', 'en', None]
+    assert profiles.guess('-200') is None
+
+
+def test_window_keeps_the_latest_detections_of_subscribed_channels(tmp_path):
+    profiles = make_profiles(tmp_path)
+    profiles.record('-200', 'en')
+    assert profiles.storage.get_channel_languages('-200') == []
+
+    for language in ['en'] * 5 + ['fr'] * 4:
+        profiles.record('-100', language)
+    assert profiles.storage.get_channel_languages('-100') == ['en'] + ['fr'] * 4
+    assert profiles.dominant('-100') == 'fr'
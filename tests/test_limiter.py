@@ -0,0 +1,47 @@
+from limiter import FAILED, OK, SERVER_ERROR, THROTTLED, TIMEOUT, AdaptiveLimit, classify
+
+
+def test_status_codes_are_classified():
+    assert [classify(status) for status in (200, 429, 503, 400, None)] == [
+        OK, THROTTLED, SERVER_ERROR, FAILED, TIMEOUT
+    ]
+
+
+def test_a_round_of_successes_raises_the_limit_by_about_one():
+    limit = AdaptiveLimit(initial=10, minimum=2, maximum=12)
+    for _ in range(10):
+        limit.observe(200, 0.1)
+    assert limit.limit == 10 and limit._limit > 10.9
+    for _ in range(100):
+        limit.observe(200, 0.1)
+    assert limit.limit == 12
+
+
+def test_overload_backs_off_once_per_round():
+    limit = AdaptiveLimit(initial=10, minimum=2, maximum=20, backoff=0.5)
+    # A burst of requests that were all in flight before the first failure
+    assert limit.observe(429, 1.0) == THROTTLED
+    limit.observe(503, 1.0)
+    limit.observe(None, 1.0)
+    assert limit.limit == 5
+
+    # A request started after the decrease can cause the next one
+    limit.observe(503, 0.0)
+    assert limit.limit == 2
+    limit.observe(503, 0.0)
+    assert limit.limit == 2
+
+    # Failures that say nothing about capacity leave the limit alone
+    limit.observe(400, 0.0)
+    assert limit.limit == 2
+
+
+def test_slow_responses_back_off_gently():
+    limit = AdaptiveLimit(initial=10, minimum=2, maximum=20, backoff=0.5, slow_backoff=0.9)
+    for _ in range(20):
+        limit.observe(200, 0.1)
+    before = limit._limit
+    # Ten times the usual latency: successful, but the backend is queueing
+    for _ in range(3):
+        assert limit.observe(200, 1.0) == OK
+    assert abs(limit._limit - before * 0.9) < 1e-9
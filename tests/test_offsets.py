@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop
+
+from metrics import metrics
+from offsets import OffsetTracker
+
+USER = {'id': 1, 'is_bot': False, 'first_name': 'user'}
+
+
+def message_update(update_id, sent_at):
+    return Update.de_json({'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': int(sent_at), 'chat': {'id': 1, 'type': 'private'}, 'from': USER,
+        'text': 'hello'
+    }}, None)
+
+
+def button_update(update_id, keyboard_sent_at):
+    # The callback's message is the bot's own, sent whenever the keyboard was
+    return Update.de_json({'update_id': update_id, 'callback_query': {
+        'id': str(update_id), 'chat_instance': 'x', 'from': USER, 'data': 'settings',
+        'message': {'message_id': 1, 'date': int(keyboard_sent_at), 'chat': {'id': 1, 'type': 'private'},
+                    'text': 'Settings'}
+    }}, None)
+
+
+def context(running=True):
+    return SimpleNamespace(application=SimpleNamespace(running=running))
+
+
+def gate(tracker, update, running=True):
+    asyncio.run(tracker.gate(update, context(running)))
+
+
+def write_state(path, last_update_id, age=0.0):
+    path.write_text(json.dumps({'last_update_id': last_update_id, 'pending_updates': []}))
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_only_messages_sent_while_down_are_paced(tmp_path):
+    tracker = OffsetTracker(str(tmp_path / 'state.json'))
+    hour_ago = time.time() - 3600
+    catchup = metrics.counters.get('updates.catchup', 0)
+
+    gate(tracker, button_update(1, hour_ago))
+    gate(tracker, message_update(2, time.time()))
+    assert metrics.counters.get('updates.catchup', 0) == catchup
+
+    gate(tracker, message_update(3, hour_ago))
+    assert metrics.counters['updates.catchup'] == catchup + 1
+
+
+def test_processed_updates_are_dropped_and_late_ones_set_aside(tmp_path):
+    path = tmp_path / 'state.json'
+    write_state(path, last_update_id=50)
+    tracker = OffsetTracker(str(path))
+
+    with pytest.raises(ApplicationHandlerStop):
+        gate(tracker, message_update(50, time.time()))
+    gate(tracker, message_update(51, time.time()))
+
+    with pytest.raises(ApplicationHandlerStop):
+        gate(tracker, message_update(52, time.time()), running=False)
+    assert [data['update_id'] for data in tracker.pending] == [52]
+
+
+def test_offset_older_than_a_week_is_forgotten(tmp_path):
+    path = tmp_path / 'state.json'
+    write_state(path, last_update_id=50, age=6 * 24 * 3600)
+    assert OffsetTracker(str(path)).last_update_id == 50
+
+    write_state(path, last_update_id=50, age=8 * 24 * 3600)
+    tracker = OffsetTracker(str(path))
+    assert tracker.last_update_id == 0
+    # Update ids restarted lower: not mistaken for duplicates
+    gate(tracker, message_update(7, time.time()))
+
+
+def test_state_round_trips(tmp_path):
+    path = tmp_path / 'state.json'
+    tracker = OffsetTracker(str(path))
+    asyncio.run(tracker.mark_done(message_update(9, time.time()), context()))
+    tracker.set_aside({'update_id': 10})
+    tracker.save()
+
+    reloaded = OffsetTracker(str(path))
+    assert reloaded.last_update_id == 9
+    assert reloaded.pending == [{'update_id': 10}]
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from scheduler import BULK, LaneScheduler
+from tenants import current_tenant
+
+
+async def wait_for_slot(lanes, tenant, granted):
+    current_tenant.set(tenant)
+    async with lanes.slot(BULK):
+        granted.append(tenant)
+
+
+def test_waiter_cancelled_as_the_slot_is_freed():
+    lanes = LaneScheduler(1, 0)
+    granted = []
+
+    async def scenario():
+        async with lanes.slot(BULK):
+            cancelled = asyncio.create_task(wait_for_slot(lanes, 'a', granted))
+            queued = asyncio.create_task(wait_for_slot(lanes, 'b', granted))
+            await asyncio.sleep(0)
+            assert lanes.queued(BULK) == 2
+            # Same loop pass: the freed slot is handed out past the cancelled waiter
+            cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await queued
+
+    asyncio.run(scenario())
+    assert granted == ['b']
+    assert lanes.queued(BULK) == 0
+    assert lanes.in_use[BULK] == 0
+    assert lanes.waiters[BULK] == {}
+    assert not lanes._turns[BULK]
+
+
+def test_tenant_turns_are_cleared_when_its_last_waiter_is_cancelled_during_wake():
+    lanes = LaneScheduler(1, 0)
+    granted = []
+
+    async def scenario():
+        async with lanes.slot(BULK):
+            cancelled = asyncio.create_task(wait_for_slot(lanes, 'a', granted))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        # The tenant's turn is gone, so new work for it starts straight away
+        await asyncio.wait_for(wait_for_slot(lanes, 'a', granted), 1.0)
+
+    asyncio.run(scenario())
+    assert granted == ['a']
+    assert lanes.queued(BULK) == 0
+    assert lanes.waiters[BULK] == {}
+    assert not lanes._turns[BULK]
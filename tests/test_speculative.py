@@ -0,0 +1,57 @@
+import asyncio
+
+from speculative import SpeculativeCache
+
+
+async def value(result, delay=0.0):
+    await asyncio.sleep(delay)
+    return result
+
+
+def test_take_hands_over_the_task_once():
+    cache = SpeculativeCache(max_entries=10, ttl=5)
+
+    async def scenario():
+        cache.start('a', value("A"))
+        task = cache.take('a')
+        assert await task == "A"
+        assert cache.take('a') is None
+        assert cache.take('b') is None
+
+    asyncio.run(scenario())
+    assert (cache.hits, cache.lookups) == (1, 3)
+    assert len(cache) == 0
+
+
+def test_unused_entries_expire_and_are_cancelled():
+    cache = SpeculativeCache(max_entries=10, ttl=0.05)
+
+    async def scenario():
+        cache.start('a', value("A", delay=1.0))
+        task = cache.entries['a'][0]
+        await asyncio.sleep(0.1)
+        assert len(cache) == 0
+        assert cache.take('a') is None
+        await asyncio.sleep(0)
+        assert task.cancelled()
+
+    asyncio.run(scenario())
+
+
+def test_full_cache_evicts_the_oldest_and_restart_replaces():
+    cache = SpeculativeCache(max_entries=2, ttl=5)
+
+    async def scenario():
+        cache.start('a', value("A", delay=1.0))
+        first = cache.entries['a'][0]
+        cache.start('a', value("A2"))
+        cache.start('b', value("B"))
+        cache.start('c', value("C"))
+        await asyncio.sleep(0)
+        assert first.cancelled()
+        assert list(cache.entries) == ['b', 'c']
+        assert await cache.take('c') == "C"
+        cache.cancel('b')
+        assert len(cache) == 0
+
+    asyncio.run(scenario())
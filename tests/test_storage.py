@@ -0,0 +1,61 @@
+import json
+
+from storage import Storage, UserRecord
+
+
+def make_storage(tmp_path, users=None):
+    users_file = tmp_path / 'users.json'
+    if users is not None:
+        users_file.write_text(json.dumps(users))
+    return Storage(str(users_file), str(tmp_path / 'channels.json'), save_delay=0)
+
+
+def test_legacy_json_is_loaded_into_records_and_the_subscriber_index(tmp_path):
+    storage = make_storage(tmp_path, {
+        '1': {'target_language': 'vi', 'subscribed_channels': ['-100', '-200', '-100']},
+        '2': {'target_language': 'ja', 'subscribed_channels': ['-200'], 'notifications_enabled': False},
+        '3': {},
+    })
+
+    assert storage.get_user(1).subscribed_channels == ('-100', '-200')
+    assert storage.get_channel_subscribers('-200') == {1, 2}
+    assert storage.get_channel_subscribers('-100') == {1}
+    assert storage.get_user(2).notifications_enabled is False
+    # Missing fields get the defaults
+    assert storage.get_user_preferences(3) == UserRecord().to_dict()
+    assert storage.get_target_language(4) == 'en'
+
+
+def test_subscriptions_keep_the_index_in_step(tmp_path):
+    storage = make_storage(tmp_path)
+    storage.add_channel_subscription(1, '-100')
+    storage.add_channel_subscription(1, '-100')
+    storage.add_channel_subscription(2, '-100')
+    assert storage.get_subscribed_channels(1) == ['-100']
+    assert storage.is_subscribed(2, '-100')
+
+    storage.remove_channel_subscription(1, '-100')
+    storage.remove_channel_subscription(2, '-100')
+    assert not storage.is_subscribed(1, '-100')
+    assert '-100' not in storage.subscribers
+
+    # Replacing preferences reindexes the channels that were dropped and added
+    storage.set_user_preferences(3, {'subscribed_channels': ['-100', '-200']})
+    storage.update_user_preferences(3, subscribed_channels=['-200', '-300'])
+    assert storage.get_channel_subscribers('-100') == frozenset()
+    assert storage.get_channel_subscribers('-300') == {3}
+
+
+def test_saved_file_round_trips_in_the_legacy_layout(tmp_path):
+    storage = make_storage(tmp_path)
+    storage.update_user_preferences(1, target_language='ko', digest_enabled=True)
+    storage.add_channel_subscription(1, '-100')
+    storage.flush()
+
+    saved = json.loads((tmp_path / 'users.json').read_text())
+    assert saved['1']['subscribed_channels'] == ['-100']
+    assert saved['1']['digest_enabled'] is True
+
+    reloaded = make_storage(tmp_path)
+    assert reloaded.get_target_language(1) == 'ko'
+    assert reloaded.get_channel_subscribers('-100') == {1}
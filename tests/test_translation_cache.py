@@ -0,0 +1,53 @@
+import time
+
+from metrics import metrics
+from translation_cache import DETECT, TRANSLATE, TranslationCache, read_snapshot, write_snapshot
+
+
+def filled_cache():
+    cache = TranslationCache(max_entries=10, max_chars=1000, ttl=3600)
+    for n, hits in enumerate([1, 3, 0, 2]):
+        cache.put(TRANSLATE, 'en', 'vi', f"text {n}", f"văn bản {n}")
+        for _ in range(hits):
+            cache.get(TRANSLATE, 'en', 'vi', f"text {n}")
+    cache.put(DETECT, None, None, "stale", "en")
+    cache.entries[(DETECT, None, None, "stale")].created -= 7200
+    return cache
+
+
+def test_hot_set_lists_live_entries_most_used_first():
+    rows = filled_cache().hot_set(3)
+    assert [row[3] for row in rows] == ["text 1", "text 3", "text 0"]
+    assert rows[0][:6] == [TRANSLATE, 'en', 'vi', "text 1", "văn bản 1", 3]
+
+
+def test_snapshot_round_trips_and_is_read_within_limits(tmp_path):
+    path = str(tmp_path / 'cache.jsonl.gz')
+    rows = filled_cache().hot_set(10)
+    write_snapshot(path, rows)
+
+    assert read_snapshot(path, max_rows=10, max_chars=1000, deadline=time.monotonic() + 5) == (rows, True)
+    partial, complete = read_snapshot(path, max_rows=2, max_chars=1000, deadline=time.monotonic() + 5)
+    assert partial == rows[:2] and not complete
+    assert read_snapshot(path, max_rows=10, max_chars=1000, deadline=time.monotonic()) == ([], False)
+
+
+def test_loaded_entries_count_as_warm_and_never_evict_live_ones():
+    rows = filled_cache().hot_set(10)
+    cache = TranslationCache(max_entries=3, max_chars=1000, ttl=3600)
+    cache.put(TRANSLATE, 'en', 'vi', "text 3", "fresh")
+    expired = [TRANSLATE, 'en', 'vi', "old", "cũ", 9, round(time.time()) - 7200]
+
+    # Room for two more entries; the existing key and the expired row are skipped
+    assert cache.load([expired] + rows) == 2
+    assert cache.get(TRANSLATE, 'en', 'vi', "text 3") == "fresh"
+    assert cache.get(TRANSLATE, 'en', 'vi', "old") is None
+
+    warm_hits = metrics.counters.get('translate_cache.t.warm_hits', 0)
+    assert cache.get(TRANSLATE, 'en', 'vi', "text 1") == "văn bản 1"
+    assert metrics.counters['translate_cache.t.warm_hits'] == warm_hits + 1
+
+    # Warm entries sit at the least recently used end
+    cache.put(TRANSLATE, 'en', 'vi', "new", "mới")
+    assert cache.get(TRANSLATE, 'en', 'vi', "text 0") is None
+    assert len(cache) == 3
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from fakes import FakeTranslator
+from deadline import Deadline, _current_deadline
+from metrics import metrics
+from scheduler import BULK, INTERACTIVE
+from translator import TranslationService
+
+
+class FailingTranslator(FakeTranslator):
+    def translate(self, text, dest='en', src='auto'):
+        self.calls['translate'] += 1
+        raise ConnectionError("backend down")
+
+
+class BlockingTranslator(FakeTranslator):
+    """Holds every call until `release` is set (checked from the worker thread)."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = False
+
+    def translate(self, text, dest='en', src='auto'):
+        while not self.release:
+            time.sleep(0.01)
+        return super().translate(text, dest, src)
+
+
+def make_service(translator):
+    service = TranslationService()
+    service.translator = translator
+    return service
+
+
+def test_cached_translation_keeps_the_update_deadline():
+    service = make_service(FailingTranslator())
+    skipped = metrics.counters.get("deadline.retries_skipped", 0)
+
+    async def handle():
+        _current_deadline.set(Deadline('message', 0.5))
+        return await service.translate_text_async("hello", 'vi')
+
+    start = time.monotonic()
+    assert asyncio.run(handle()) is None
+    # One attempt: the 1s backoff before a retry would not fit in the budget
+    assert service.translator.calls['translate'] == 1
+    assert metrics.counters["deadline.retries_skipped"] == skipped + 1
+    assert time.monotonic() - start < 1.0
+    service.executor.shutdown()
+
+
+def test_coalescing_is_per_lane_and_stops_when_every_caller_left():
+    translator = BlockingTranslator()
+    service = make_service(translator)
+
+    async def scenario():
+        bulk = asyncio.ensure_future(service.translate_text_async("hello", 'vi', lane=BULK))
+        joined = asyncio.ensure_future(service.translate_text_async("hello", 'vi', lane=BULK))
+        await asyncio.sleep(0.05)
+        assert len(service._inflight) == 1
+        interactive = asyncio.ensure_future(service.translate_text_async("hello", 'vi', lane=INTERACTIVE))
+        await asyncio.sleep(0.05)
+        # An interactive caller does not join the bulk request
+        assert len(service._inflight) == 2
+
+        bulk.cancel()
+        await asyncio.sleep(0.05)
+        bulk_fetch = service._inflight[('t', 'auto', 'vi', "hello", BULK)].task
+        assert not bulk_fetch.cancelled()
+        joined.cancel()
+        await asyncio.sleep(0.05)
+        assert bulk_fetch.cancelled()
+
+        translator.release = True
+        assert await interactive == "[vi] hello"
+        assert not service._inflight
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        translator.release = True
+        service.executor.shutdown()
+
+
+def test_backend_slot_is_held_until_the_worker_thread_finishes():
+    translator = BlockingTranslator()
+    service = make_service(translator)
+
+    async def scenario():
+        call = asyncio.ensure_future(service.translate_text_async("hello", 'vi', lane=BULK))
+        await asyncio.sleep(0.05)
+        assert service.lanes.in_use[BULK] == 1
+        call.cancel()
+        await asyncio.sleep(0.05)
+        # The caller gave up, but the backend call is still running on its thread
+        assert call.cancelled()
+        assert service.lanes.in_use[BULK] == 1
+
+        translator.release = True
+        for _ in range(100):
+            if not service.lanes.in_use[BULK]:
+                break
+            await asyncio.sleep(0.01)
+        assert service.lanes.in_use[BULK] == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        translator.release = True
+        service.executor.shutdown()
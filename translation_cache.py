@@ -0,0 +1,139 @@
+import gzip
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Entry kinds: detected language of a text, translation of a text, and
+# translation of a text's lines (translate_segments)
+DETECT = 'd'
+TRANSLATE = 't'
+SEGMENTS = 's'
+
+
+class _Entry:
+    __slots__ = ('value', 'hits', 'created', 'chars', 'warm')
+
+    def __init__(self, value: str, created: float, chars: int, warm: bool = False):
+        self.value = value
+        self.hits = 0
+        # Wall-clock time, so the age survives a snapshot and restart
+        self.created = created
+        self.chars = chars
+        # Loaded from a snapshot at startup rather than fetched by this process
+        self.warm = warm
+
+
+class TranslationCache:
+    """LRU cache of translations and detected languages, bounded by entries and characters.
+
+    Keys are (kind, source language, target language, text). Entries expire
+    after `ttl` seconds. The most used entries can be written to a snapshot
+    and loaded back after a restart, so the first posts and messages after a
+    deploy do not all go to the backend at once. Hits on entries loaded that
+    way are counted separately as warm hits.
+    """
+
+    def __init__(self, max_entries: int, max_chars: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self.entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self.chars = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, kind: str, src: Optional[str], dest: Optional[str], text: str) -> Optional[str]:
+        key = (kind, src, dest, text)
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry.created > self.ttl:
+            self._remove(key)
+            entry = None
+        if entry is None:
+            metrics.incr(f"translate_cache.{kind}.misses")
+            return None
+        self.entries.move_to_end(key)
+        entry.hits += 1
+        metrics.incr(f"translate_cache.{kind}.hits")
+        if entry.warm:
+            metrics.incr(f"translate_cache.{kind}.warm_hits")
+        return entry.value
+
+    def put(self, kind: str, src: Optional[str], dest: Optional[str], text: str, value: str) -> None:
+        chars = len(text) + len(value)
+        if chars > self.max_chars:
+            return
+        key = (kind, src, dest, text)
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = _Entry(value, time.time(), chars)
+        self.chars += chars
+        while len(self.entries) > self.max_entries or self.chars > self.max_chars:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key: Hashable) -> None:
+        self.chars -= self.entries.pop(key).chars
+
+    def hot_set(self, limit: int) -> List[list]:
+        """Up to `limit` live entries, most used first, as snapshot rows."""
+        now = time.time()
+        live = [(key, entry) for key, entry in self.entries.items() if now - entry.created <= self.ttl]
+        live.sort(key=lambda item: item[1].hits, reverse=True)
+        return [[*key, entry.value, entry.hits, round(entry.created)] for key, entry in live[:limit]]
+
+    def load(self, rows: List[list]) -> int:
+        """Add snapshot rows, hottest first, without evicting entries this process made.
+
+        Returns the number of entries added.
+        """
+        now = time.time()
+        added = 0
+        for kind, src, dest, text, value, _, created in rows:
+            key = (kind, src, dest, text)
+            chars = len(text) + len(value)
+            if key in self.entries or now - created > self.ttl:
+                continue
+            if len(self.entries) >= self.max_entries or self.chars + chars > self.max_chars:
+                break
+            self.entries[key] = _Entry(value, created, chars, warm=True)
+            # Least recently used end: live traffic decides what stays
+            self.entries.move_to_end(key, last=False)
+            self.chars += chars
+            added += 1
+        metrics.incr("translate_cache.warm_loaded", added)
+        return added
+
+
+def write_snapshot(path: str, rows: List[list]) -> None:
+    """Write snapshot rows as gzipped JSON lines, replacing `path` atomically."""
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+            f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str, max_rows: int, max_chars: int, deadline: float) -> Tuple[List[list], bool]:
+    """Read snapshot rows until `max_rows`, `max_chars` or the monotonic `deadline` is reached.
+
+    Returns the rows and whether the whole file was read.
+    """
+    rows = []
+    chars = 0
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if len(rows) >= max_rows or chars >= max_chars or time.monotonic() >= deadline:
+                return rows, False
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            chars += len(row[3]) + len(row[4])
+            rows.append(row)
+    return rows, True
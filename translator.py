@@ -1,8 +1,27 @@
-from googletrans import Translator, LANGUAGES
-from typing import Optional, Tuple
+from googletrans import Translator, LANGUAGES, urls
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 import logging
+import os
+import threading
 import time
-from functools import wraps
+from functools import partial, wraps
+from urllib.parse import urlsplit
+from config import (
+    TRANSLATION_WORKERS, TRANSLATION_INTERACTIVE_RESERVED, TRANSLATE_SERVICE_URL, TRANSLATE_TIMEOUT,
+    TRANSLATION_MIN_WORKERS, TRANSLATION_MAX_WORKERS, TRANSLATION_BACKOFF, TRANSLATION_LATENCY_TOLERANCE,
+    TRANSLATE_BATCH_WINDOW, TRANSLATE_BATCH_MAX_SIZE, TRANSLATE_BATCH_MAX_CHARS,
+    TRANSLATE_CACHE_MAX_ENTRIES, TRANSLATE_CACHE_MAX_CHARS, TRANSLATE_CACHE_TTL
+)
+from batching import BatchDispatcher
+from deadline import remaining
+from limiter import AdaptiveLimit
+from metrics import metrics
+from scheduler import LaneScheduler, INTERACTIVE, BULK
+from tenants import current_tenant
+from translation_cache import TranslationCache, DETECT, TRANSLATE, SEGMENTS, read_snapshot, write_snapshot
 
 def retry_on_error(retries=3, delay=1):
     def decorator(func):
@@ -14,18 +33,268 @@ def retry_on_error(retries=3, delay=1):
                     return func(*args, **kwargs)
                 except Exception as e:
                     last_error = e
-                    logging.warning(f"Translation attempt {i+1} failed: {str(e)}")
+                    logging.warning("Translation attempt %s failed: %s", i+1, e)
                     if i < retries - 1:
+                        # Do not retry past the deadline of the update being handled
+                        left = remaining()
+                        if left is not None and left <= delay * (i + 1):
+                            metrics.incr("deadline.retries_skipped")
+                            break
                         time.sleep(delay * (i + 1))  # Exponential backoff
-            logging.error(f"All translation attempts failed: {str(last_error)}")
+            logging.error("All translation attempts failed: %s", last_error)
             return None
         return wrapper
     return decorator
 
+def create_translator() -> Translator:
+    """googletrans client, pointed at TRANSLATE_SERVICE_URL instead of Google when that is set."""
+    if not TRANSLATE_SERVICE_URL:
+        return Translator(timeout=TRANSLATE_TIMEOUT)
+    endpoint = urlsplit(TRANSLATE_SERVICE_URL)
+    # googletrans hard-codes https in its URL template; a local stand-in speaks plain http
+    urls.TRANSLATE_RPC = f"{endpoint.scheme}://{{host}}/_/TranslateWebserverUi/data/batchexecute"
+    return Translator(service_urls=[endpoint.netloc], timeout=TRANSLATE_TIMEOUT)
+
+class _Fetch:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
 class TranslationService:
     def __init__(self):
-        self.translator = Translator()
         self.logger = logging.getLogger(__name__)
+        # Requests in flight are capped by an adaptive limit that backs off on
+        # 429/5xx/timeouts and slow responses, and probes upwards otherwise
+        self.limit = AdaptiveLimit(
+            TRANSLATION_WORKERS, TRANSLATION_MIN_WORKERS, TRANSLATION_MAX_WORKERS,
+            backoff=TRANSLATION_BACKOFF, latency_tolerance=TRANSLATION_LATENCY_TOLERANCE
+        )
+        self._attempt = threading.local()
+        self.translator = create_translator()
+        self._watch_requests(self.translator)
+        # googletrans is blocking, so backend calls run on a worker pool whose
+        # slots are shared between the interactive and bulk lanes
+        self.executor = ThreadPoolExecutor(max_workers=TRANSLATION_MAX_WORKERS, thread_name_prefix='translate')
+        self.lanes = LaneScheduler(self.limit.limit, TRANSLATION_INTERACTIVE_RESERVED)
+        self._applied_limit = self.limit.limit
+        # Texts with a known source language going to the same target within a
+        # short window share one backend request
+        self.batcher = None
+        if TRANSLATE_BATCH_MAX_SIZE > 1:
+            self.batcher = BatchDispatcher(
+                self._send_batch, TRANSLATE_BATCH_WINDOW, TRANSLATE_BATCH_MAX_SIZE, TRANSLATE_BATCH_MAX_CHARS
+            )
+        self.cache = None
+        if TRANSLATE_CACHE_MAX_ENTRIES:
+            self.cache = TranslationCache(TRANSLATE_CACHE_MAX_ENTRIES, TRANSLATE_CACHE_MAX_CHARS, TRANSLATE_CACHE_TTL)
+        # Cache misses being fetched, per cache key and lane; callers (from any
+        # bot) asking for the same meanwhile wait for that request instead of
+        # making their own
+        self._inflight: Dict[Hashable, _Fetch] = {}
+        self.latency_ewma = 0.0
+        self._latency_updated = 0.0
+
+    def _watch_requests(self, translator) -> None:
+        # Every HTTP attempt (retries included) is reported to the limit
+        client = getattr(translator, 'client', None)
+        if client is not None:
+            client.event_hooks = {'request': [self._on_request], 'response': [self._on_response]}
+
+    def _on_request(self, request) -> None:
+        self._report_unanswered()
+        self._attempt.started = time.monotonic()
+
+    def _on_response(self, response) -> None:
+        started = getattr(self._attempt, 'started', None)
+        self._attempt.started = None
+        if started is not None:
+            self.limit.observe(response.status_code, time.monotonic() - started)
+
+    def _report_unanswered(self) -> None:
+        # A request that got no response before the next one (or the end of the
+        # call) timed out or lost its connection
+        started = getattr(self._attempt, 'started', None)
+        if started is not None:
+            self._attempt.started = None
+            self.limit.observe(None, time.monotonic() - started)
+
+    def _call(self, func, *args, **kwargs):
+        # Runs on a worker thread
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._report_unanswered()
+
+    async def _run(self, lane: str, func, *args, **kwargs):
+        await self.lanes.acquire(lane)
+        metrics.incr(f"tenant.{current_tenant.get()}.backend_calls")
+        start = time.monotonic()
+        try:
+            # The copied context carries the update's deadline into the worker thread
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, partial(contextvars.copy_context().run, self._call, func, *args, **kwargs)
+            )
+        except BaseException:
+            self.lanes.release(lane)
+            raise
+        # The worker thread cannot be stopped, so the slot stays taken until the
+        # call really ends, even when the caller is cancelled (e.g. its deadline)
+        future.add_done_callback(partial(self._finished, lane, start))
+        return await asyncio.shield(future)
+
+    def _finished(self, lane: str, start: float, future: asyncio.Future) -> None:
+        if not future.cancelled():
+            # Retrieved so an abandoned call's error is not logged as unhandled
+            future.exception()
+        elapsed = time.monotonic() - start
+        self.latency_ewma += 0.2 * (elapsed - self.latency_ewma)
+        self._latency_updated = start + elapsed
+        self.lanes.release(lane)
+        if self.limit.limit != self._applied_limit:
+            self._applied_limit = self.limit.limit
+            self.lanes.set_capacity(self._applied_limit)
+
+    def queue_depth(self) -> int:
+        return self.lanes.queued(INTERACTIVE) + self.lanes.queued(BULK)
+
+    def recent_latency(self, max_age: float = 30.0) -> float:
+        # An idle backend has no fresh measurements; do not keep reporting old latency
+        if time.monotonic() - self._latency_updated > max_age:
+            return 0.0
+        return self.latency_ewma
+
+    async def _cached(self, kind: str, src: Optional[str], dest: Optional[str], text: str, lane: str,
+                      fetch: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        value = self.cache.get(kind, src, dest, text)
+        if value is not None:
+            return value
+        # Per lane, so interactive callers never wait behind a bulk request
+        key = (kind, src, dest, text, lane)
+        shared = self._inflight.get(key)
+        if shared is None:
+            # The fetch runs in a copy of the first caller's context: its tenant
+            # and deadline (so retries stop when that update runs out of time)
+            task = asyncio.get_running_loop().create_task(
+                self._fetch(kind, src, dest, text, fetch), context=contextvars.copy_context()
+            )
+            shared = self._inflight[key] = _Fetch(task)
+            task.add_done_callback(partial(self._forget_inflight, key))
+        else:
+            metrics.incr(f"translate_cache.{kind}.coalesced")
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            shared.waiters -= 1
+            if not shared.waiters and not shared.task.done():
+                # Every caller has given up
+                shared.task.cancel()
+
+    async def _fetch(self, kind: str, src: Optional[str], dest: Optional[str], text: str,
+                     fetch: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        value = await fetch()
+        if value:
+            self.cache.put(kind, src, dest, text, value)
+        return value
+
+    def _forget_inflight(self, key: Hashable, task: asyncio.Task) -> None:
+        shared = self._inflight.get(key)
+        if shared is not None and shared.task is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Every caller may have given up already; do not log it as unretrieved
+            task.exception()
+
+    async def detect_language_async(self, text: str, lane: str = INTERACTIVE) -> Optional[str]:
+        if self.cache is None or not text:
+            return await self._run(lane, self.detect_language, text)
+        return await self._cached(
+            DETECT, None, None, text, lane, partial(self._run, lane, self.detect_language, text)
+        )
+
+    async def translate_text_async(self, text: str, target_lang: str = 'en', source_lang: str = None,
+                                   lane: str = INTERACTIVE) -> Optional[str]:
+        if self.cache is None or not text:
+            return await self._translate_text_uncached(text, target_lang, source_lang, lane)
+        return await self._cached(
+            TRANSLATE, source_lang or 'auto', target_lang, text, lane,
+            partial(self._translate_text_uncached, text, target_lang, source_lang, lane)
+        )
+
+    async def _translate_text_uncached(self, text: str, target_lang: str, source_lang: Optional[str],
+                                       lane: str) -> Optional[str]:
+        # Auto-detection works on the whole request, so only texts with a known
+        # source language can share one
+        if self.batcher is not None and source_lang and text and text.strip():
+            # Batches stay per bot, so the scheduler can take turns between them
+            return await self.batcher.submit((source_lang, target_lang, lane, current_tenant.get()), text)
+        return await self._run(lane, self.translate_text, text, target_lang, source_lang)
+
+    async def translate_segments_async(self, segments: List[str], target_lang: str = 'en',
+                                       source_lang: str = None, lane: str = INTERACTIVE) -> Optional[List[str]]:
+        if self.cache is None:
+            return await self._translate_segments_uncached(segments, target_lang, source_lang, lane)
+        translated = await self._cached(
+            SEGMENTS, source_lang or 'auto', target_lang, '\n'.join(segments), lane,
+            partial(self._joined_segments, segments, target_lang, source_lang, lane)
+        )
+        return translated.split('\n') if translated is not None else None
+
+    async def _joined_segments(self, segments: List[str], target_lang: str, source_lang: Optional[str],
+                               lane: str) -> Optional[str]:
+        result = await self._translate_segments_uncached(segments, target_lang, source_lang, lane)
+        return '\n'.join(result) if result is not None else None
+
+    async def _translate_segments_uncached(self, segments: List[str], target_lang: str,
+                                           source_lang: Optional[str], lane: str) -> Optional[List[str]]:
+        if self.batcher is not None and source_lang:
+            translated = await self._translate_text_uncached('\n'.join(segments), target_lang, source_lang, lane)
+            if translated is not None and translated.count('\n') == len(segments) - 1:
+                return translated.split('\n')
+        return await self._run(lane, self.translate_segments, segments, target_lang, source_lang)
+
+    async def save_cache(self, path: str, limit: int) -> None:
+        """Write the `limit` most used cache entries to `path`."""
+        if self.cache is None:
+            return
+        rows = self.cache.hot_set(limit)
+        await asyncio.to_thread(write_snapshot, path, rows)
+        self.logger.info("Saved %d translation cache entries to %s", len(rows), path)
+
+    async def warm_cache(self, path: str, seconds: float, max_entries: int) -> None:
+        """Load a snapshot written by save_cache, within `seconds` and up to `max_entries`."""
+        if self.cache is None or not os.path.exists(path):
+            return
+        start = time.monotonic()
+        try:
+            rows, complete = await asyncio.to_thread(
+                read_snapshot, path, max_entries, self.cache.max_chars, start + seconds
+            )
+        except (OSError, ValueError) as e:
+            self.logger.warning("Could not read translation cache snapshot %s: %s", path, e)
+            return
+        added = self.cache.load(rows)
+        self.logger.info(
+            "Warmed translation cache with %d of %d entries from %s in %.2fs%s", added, len(rows), path,
+            time.monotonic() - start, "" if complete else " (stopped at the time or size budget)"
+        )
+
+    async def run_cache_snapshots(self, path: str, interval: float, limit: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.save_cache(path, limit)
+            except Exception as e:
+                self.logger.error("Error saving translation cache: %s", e)
+
+    async def _send_batch(self, key: Tuple[str, str, str, str], texts: List[str]) -> List[Optional[str]]:
+        source_lang, target_lang, lane, tenant = key
+        # Runs in a context of its own (see BatchDispatcher._flush)
+        current_tenant.set(tenant)
+        return await self._run(lane, self.translate_batch, texts, target_lang, source_lang)
 
     def _is_valid_language(self, lang_code: str) -> bool:
         return lang_code.lower() in LANGUAGES
@@ -39,16 +308,16 @@ class TranslationService:
 
             # Validate target language
             if not self._is_valid_language(target_lang):
-                self.logger.error(f"Invalid target language code: {target_lang}")
+                self.logger.error("Invalid target language code: %s", target_lang)
                 return None
 
             # Validate source language if provided
             if source_lang and not self._is_valid_language(source_lang):
-                self.logger.error(f"Invalid source language code: {source_lang}")
+                self.logger.error("Invalid source language code: %s", source_lang)
                 return None
 
-            self.logger.info(f"Attempting to translate text to {target_lang}")
-            self.logger.debug(f"Text to translate: {text[:50]}...")  # Log first 50 chars
+            self.logger.debug("Attempting to translate text to %s", target_lang)
+            self.logger.debug("Text to translate: %s...", text[:50])  # Log first 50 chars
 
             translation = self.translator.translate(
                 text,
@@ -56,14 +325,12 @@ class TranslationService:
                 src=source_lang if source_lang else 'auto'
             )
 
-            self.logger.info(
-                f"Translation successful. Source language detected: {translation.src}"
-            )
-            self.logger.debug(f"Translated text: {translation.text[:50]}...")
+            self.logger.debug("Translation successful. Source language detected: %s", translation.src)
+            self.logger.debug("Translated text: %s...", translation.text[:50])
             return translation.text
 
         except Exception as e:
-            self.logger.error(f"Translation error: {str(e)}")
+            self.logger.error("Translation error: %s", e)
             raise
 
     @retry_on_error(retries=3)
@@ -73,16 +340,82 @@ class TranslationService:
                 self.logger.warning("Empty text provided for language detection")
                 return None
 
-            self.logger.info("Attempting to detect language")
+            self.logger.debug("Attempting to detect language")
             detection = self.translator.detect(text)
 
             if detection and self._is_valid_language(detection.lang):
-                self.logger.info(f"Language detection successful: {detection.lang}")
+                self.logger.debug("Language detection successful: %s", detection.lang)
                 return detection.lang
             else:
-                self.logger.warning(f"Invalid or unsupported language detected: {detection.lang if detection else 'None'}")
+                self.logger.warning(
+                    "Invalid or unsupported language detected: %s", detection.lang if detection else 'None'
+                )
                 return None
 
         except Exception as e:
-            self.logger.error(f"Language detection error: {str(e)}")
-            raise
\ No newline at end of file
+            self.logger.error("Language detection error: %s", e)
+            raise
+
+    def translate_batch(self, texts: List[str], target_lang: str = 'en',
+                        source_lang: str = None) -> List[Optional[str]]:
+        """Translate several texts in one request, one result per text.
+
+        The texts' lines are sent as one text, like translate_segments does
+        for a single text. If the backend does not return one line per line
+        sent, each text is translated on its own.
+        """
+        lines = [text.split('\n') for text in texts]
+        flat = [line for text_lines in lines for line in text_lines]
+        indices = [i for i, line in enumerate(flat) if line.strip()]
+        translated = self.translate_text(
+            '\n'.join(flat[i] for i in indices), target_lang=target_lang, source_lang=source_lang
+        )
+        if translated is None:
+            return [None] * len(texts)
+
+        parts = translated.split('\n')
+        if len(parts) != len(indices):
+            metrics.incr("translate.batch_fallbacks")
+            self.logger.debug("Line count changed in batched translation, translating %d texts one by one", len(texts))
+            return [self.translate_text(text, target_lang=target_lang, source_lang=source_lang) for text in texts]
+
+        for i, part in zip(indices, parts):
+            flat[i] = part
+        results = []
+        start = 0
+        for text_lines in lines:
+            results.append('\n'.join(flat[start:start + len(text_lines)]))
+            start += len(text_lines)
+        return results
+
+    def translate_segments(self, segments: List[str], target_lang: str = 'en',
+                           source_lang: str = None) -> Optional[List[str]]:
+        """Translate line segments in one request, keeping their positions.
+
+        Blank segments are kept as they are. If the backend does not return
+        one line per segment, each segment is translated on its own.
+        """
+        indices = [i for i, segment in enumerate(segments) if segment.strip()]
+        result = list(segments)
+        if not indices:
+            return result
+
+        translated = self.translate_text(
+            '\n'.join(segments[i] for i in indices), target_lang=target_lang, source_lang=source_lang
+        )
+        if translated is None:
+            return None
+
+        parts = translated.split('\n')
+        if len(parts) != len(indices):
+            self.logger.debug("Segment count changed in translation, translating %d segments one by one", len(indices))
+            parts = []
+            for i in indices:
+                part = self.translate_text(segments[i], target_lang=target_lang, source_lang=source_lang)
+                if part is None:
+                    return None
+                parts.append(part)
+
+        for i, part in zip(indices, parts):
+            result[i] = part
+        return result
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from config import UPDATE_CONCURRENCY, UPDATE_MAX_PENDING
+from metrics import metrics
+from tenants import DEFAULT_TENANT, current_tenant
+
+
+def chat_key(update: object) -> Optional[int]:
+    """What updates are ordered by: the chat, else the user, else nothing."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Handles up to `concurrency` updates at once, one chat at a time.
+
+    Handler calls for updates from the same chat (a channel's posts, a
+    user's messages and button presses) run in the order they arrived;
+    updates from different chats run concurrently. An update waiting for its
+    chat's turn does not take a handler slot, so a busy channel cannot hold
+    up everyone else. Work a handler hands to a background task is not
+    covered and must keep its own order (channel fan-out does, see
+    CommandHandler._spawn_fan_out).
+    Handlers run as `tenant`, the bot this processor belongs to.
+    """
+
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY, max_pending: int = UPDATE_MAX_PENDING,
+                 tenant: str = DEFAULT_TENANT):
+        # The base class bound limits updates in progress, waiting ones included
+        super().__init__(max(max_pending, concurrency, 2))
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        # chat -> future completed when the latest update queued for it is done
+        self._tails: Dict[int, asyncio.Future] = {}
+        self.running = 0
+        self.tenant = tenant
+
+    def __len__(self) -> int:
+        return len(self._tails)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        # Each update runs in a task of its own, so this does not leak into other updates
+        current_tenant.set(self.tenant)
+        metrics.incr(f"tenant.{self.tenant}.updates")
+        start = time.perf_counter()
+        try:
+            await self._process(update, coroutine)
+        finally:
+            metrics.observe(f"tenant.{self.tenant}.update", time.perf_counter() - start)
+
+    async def _process(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = chat_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        previous = self._tails.get(key)
+        done = asyncio.get_running_loop().create_future()
+        self._tails[key] = done
+        try:
+            if previous is not None:
+                metrics.incr("updates.chat_waits")
+                try:
+                    await previous
+                except asyncio.CancelledError:
+                    coroutine.close()
+                    raise
+            await self._run(coroutine)
+        finally:
+            done.set_result(None)
+            if self._tails.get(key) is done:
+                del self._tails[key]
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        try:
+            await self._slots.acquire()
+        except asyncio.CancelledError:
+            coroutine.close()
+            raise
+        self.running += 1
+        metrics.set_gauge("updates.running", self.running)
+        try:
+            await coroutine
+        finally:
+            self.running -= 1
+            metrics.set_gauge("updates.running", self.running)
+            self._slots.release()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -1,68 +1,181 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import threading
+from collections import OrderedDict, deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from typing import Optional
 from telegram import Update
 from telegram.ext import ContextTypes
+from config import (
+    ADMIN_USER_IDS, LOG_DIR, LOG_FILE, LOG_LEVEL, LOG_FORMAT, LOG_ROTATION, LOG_MAX_BYTES,
+    LOG_ROTATE_WHEN, LOG_BACKUP_COUNT, LOG_QUEUE_SIZE, LOG_SAMPLE_BURST, LOG_SAMPLE_WINDOW,
+    RATE_LIMIT_MAX_USERS
+)
 import time
 
 class RateLimiter:
-    def __init__(self, max_requests: int, time_window: int = 60):
+    """Sliding-window limiter whose memory is bounded by the users active in the window.
+
+    Users are kept in last-seen order, so idle users are evicted from the
+    front as soon as their last request leaves the window; `max_users` is a
+    hard cap on top of that. Checks are serialised by a lock, so concurrent
+    updates cannot both take a user's last request.
+    """
+
+    def __init__(self, max_requests: int, time_window: int = 60, max_users: int = RATE_LIMIT_MAX_USERS):
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests = {}
+        self.max_users = max_users
+        self.requests: "OrderedDict[int, deque]" = OrderedDict()
+        self._lock = threading.Lock()
 
-    async def check_rate_limit(self, user_id: int) -> bool:
-        current_time = time.time()
-        user_requests = self.requests.get(user_id, [])
+    def __len__(self) -> int:
+        return len(self.requests)
 
-        # Remove old requests
-        user_requests = [req for req in user_requests 
-                        if current_time - req < self.time_window]
+    def _evict_idle(self, current_time: float) -> None:
+        while self.requests:
+            user_id, oldest_user = next(iter(self.requests.items()))
+            if len(self.requests) <= self.max_users and current_time - oldest_user[-1] < self.time_window:
+                break
+            del self.requests[user_id]
 
-        if len(user_requests) >= self.max_requests:
+    async def check_rate_limit(self, user_id: int) -> bool:
+        with self._lock:
+            current_time = time.monotonic()
+            user_requests = self.requests.get(user_id)
+            if user_requests is None:
+                user_requests = self.requests[user_id] = deque(maxlen=self.max_requests)
+            else:
+                self.requests.move_to_end(user_id)
+
+            # Remove old requests
+            while user_requests and current_time - user_requests[0] >= self.time_window:
+                user_requests.popleft()
+
+            if len(user_requests) >= self.max_requests:
+                return False
+
+            user_requests.append(current_time)
+            self._evict_idle(current_time)
+            return True
+
+# Pass as extra= on per-subscriber / per-item records so they are rate-limited
+SAMPLED = {'sampled': True}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Lets through at most `burst` SAMPLED records per message template per window.
+
+    The number of records dropped is reported on the next one that passes.
+    """
+
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, window: float = LOG_SAMPLE_WINDOW):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        # (logger name, message template) -> [window start, emitted, suppressed]
+        self.state = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False):
+            return True
+
+        key = (record.name, record.msg)
+        state = self.state.get(key)
+        if state is None or record.created - state[0] >= self.window:
+            suppressed = state[2] if state else 0
+            state = self.state[key] = [record.created, 0, suppressed]
+
+        if state[1] >= self.burst:
+            state[2] += 1
             return False
 
-        user_requests.append(current_time)
-        self.requests[user_id] = user_requests
+        state[1] += 1
+        if state[2]:
+            record.msg = f"{record.msg} (+%d similar suppressed)"
+            record.args = tuple(record.args or ()) + (state[2],)
+            state[2] = 0
         return True
 
-def setup_logging():
+class DroppingQueueHandler(QueueHandler):
+    """Non-blocking hand-off to the logging thread; drops records when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is deferred to the listener thread instead of the caller
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+def setup_logging() -> QueueListener:
     try:
         # Create logs directory if it doesn't exist
-        logs_dir = 'logs'
-        os.makedirs(logs_dir, exist_ok=True)
+        os.makedirs(LOG_DIR, exist_ok=True)
 
         # Configure logging format
-        log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        formatter = logging.Formatter(log_format)
-
-        # Set up file handler
-        file_handler = logging.FileHandler(os.path.join(logs_dir, 'telegram_bot.log'))
+        if LOG_FORMAT == 'json':
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+        # Set up rotating file handler
+        log_path = os.path.join(LOG_DIR, LOG_FILE)
+        if LOG_ROTATION == 'time':
+            file_handler = TimedRotatingFileHandler(
+                log_path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+            )
+        else:
+            file_handler = RotatingFileHandler(
+                log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+            )
         file_handler.setFormatter(formatter)
-        file_handler.setLevel(logging.INFO)
 
         # Set up console handler
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
-        console_handler.setLevel(logging.INFO)
+
+        # Handlers run on a background thread; the root logger only enqueues
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter())
+        listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
 
         # Configure root logger
         root_logger = logging.getLogger()
-        root_logger.setLevel(logging.INFO)
+        root_logger.setLevel(LOG_LEVEL)
 
         # Remove any existing handlers to avoid duplicates
         for handler in root_logger.handlers[:]:
             root_logger.removeHandler(handler)
 
-        root_logger.addHandler(file_handler)
-        root_logger.addHandler(console_handler)
+        root_logger.addHandler(queue_handler)
+        listener.start()
+        atexit.register(listener.stop)
 
-        # Set up specific loggers
-        for logger_name in ['translator', 'bot', 'handlers']:
-            logger = logging.getLogger(logger_name)
-            logger.setLevel(logging.INFO)
+        # httpx logs every Bot API request at INFO
+        logging.getLogger('httpx').setLevel(logging.WARNING)
 
         logging.info("Logging setup completed successfully")
+        return listener
 
     except Exception as e:
         print(f"Error setting up logging: {str(e)}")
@@ -72,11 +185,31 @@ def validate_channel_id(channel_id: str) -> bool:
     return (channel_id.startswith('@') and len(channel_id) > 1) or \
            (channel_id.startswith('-100') and channel_id[4:].isdigit())
 
+def get_forward_chat(message):
+    # Bot API 7.0 replaced forward_from_chat with forward_origin
+    origin = getattr(message, 'forward_origin', None)
+    if origin is not None:
+        return getattr(origin, 'chat', None) or getattr(origin, 'sender_chat', None)
+    return getattr(message, 'forward_from_chat', None)
+
+def is_admin(user_id: int) -> bool:
+    return user_id in ADMIN_USER_IDS
+
 async def send_error_message(update: Update, context: ContextTypes.DEFAULT_TYPE, message: str):
     try:
         if update.effective_message:
             await update.effective_message.reply_text(f"⚠️ Error: {message}")
         else:
-            logging.error(f"Could not send error message: no effective message")
+            logging.error("Could not send error message: no effective message")
     except Exception as e:
-        logging.error(f"Failed to send error message: {str(e)}")
\ No newline at end of file
+        logging.error("Failed to send error message: %s", e)
+
+async def send_timeout_message(update: Update):
+    # Fallback reply for an update that ran out of its deadline budget
+    message = update.callback_query.message if update.callback_query else update.effective_message
+    if message is None or update.channel_post or update.edited_channel_post:
+        return
+    await message.reply_text(
+        "⌛ Xử lý quá lâu, vui lòng thử lại sau\n"
+        "This took too long, please try again later"
+    )